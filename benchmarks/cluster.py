@@ -0,0 +1,143 @@
+"""Localhost clusters for benchmarks.
+
+Node 0 is the preferred master, the last node is the probe benchmarks emit on and
+subscribe to, so every measured event takes the full path through the
+master and back. With `processes` every node but the probe runs in its
+own process.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+import socket
+import time
+
+from eventer.eventer import Eventer
+
+
+HOST = 'localhost'
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _wait_port(port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((HOST, port,), timeout=0.1).close()
+            return
+
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+
+async def _wait_master(node: Eventer, master: tuple[str, int], timeout: float):
+    deadline = time.monotonic() + timeout
+    while node.master != master:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'{node.node_id} does not follow {master}')
+        await asyncio.sleep(0.01)
+
+
+def _run_node(workdir: str, port: int, nodes: list[tuple[str, int]],
+              master: tuple[str, int], options: dict, ready):
+    async def main():
+        node = Eventer(log_workdir=workdir, host=HOST, port=port,
+                       nodes=nodes, loop=asyncio.get_running_loop(), **options)
+        await node.serve()
+        await _wait_master(node, master, timeout=10)
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+class Cluster:
+
+    @property
+    def probe(self) -> Eventer:
+        return self._nodes[-1]
+
+    @property
+    def nodes(self) -> list[Eventer]:
+        return self._nodes
+
+    def __init__(
+            self, workdir: str, size: int, base_port: int,
+            processes: bool = False, **options) -> None:
+        self._workdir = workdir
+        self._ports = [base_port + i for i in range(size)]
+        self._processes = processes
+        self._options = {'preferred_master': (HOST, base_port,), **options}
+        self._nodes: list[Eventer] = []
+        self._children: list[multiprocessing.Process] = []
+
+    def _node_workdir(self, i: int) -> str:
+        return os.path.join(self._workdir, f'n{i}')
+
+    def _peers(self, port: int) -> list[tuple[str, int]]:
+        return [(HOST, p,) for p in self._ports if p != port]
+
+    def node(self, i: int) -> Eventer:
+        port = self._ports[i]
+        return Eventer(log_workdir=self._node_workdir(i), host=HOST, port=port,
+                       nodes=self._peers(port), loop=asyncio.get_running_loop(),
+                       **self._options)
+
+    async def start(self):
+        shutil.rmtree(self._workdir, ignore_errors=True)
+        for i in range(len(self._ports)):
+            os.makedirs(self._node_workdir(i))
+
+        master = (HOST, self._ports[0],)
+        context = multiprocessing.get_context('spawn')
+        readies = []
+        for i, port in enumerate(self._ports):
+            if self._processes and i < len(self._ports) - 1:
+                ready = context.Event()
+                child = context.Process(
+                    target=_run_node, daemon=True,
+                    args=(self._node_workdir(i), port, self._peers(port),
+                          master, self._options, ready,))
+                child.start()
+                self._children.append(child)
+                readies.append(ready)
+                await asyncio.to_thread(_wait_port, port, 10)
+            else:
+                node = self.node(i)
+                await node.serve()
+                self._nodes.append(node)
+
+        # The master is elected once a quorum is up.
+        for ready in readies:
+            await asyncio.to_thread(ready.wait, 10)
+        for node in self._nodes:
+            await _wait_master(node, master, timeout=10)
+
+    async def close(self):
+        for node in self._nodes:
+            await node.close()
+        self._nodes = []
+
+        for child in self._children:
+            child.terminate()
+            child.join()
+        self._children = []
+
+        shutil.rmtree(self._workdir, ignore_errors=True)
+
+    async def __aenter__(self) -> 'Cluster':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,80 @@
+"""Emit throughput, end-to-end callback latency and fan-out scaling.
+
+    python -m benchmarks.cluster_bench [--processes]
+
+Every event is emitted on the probe node, sequenced by the master,
+replicated to every follower and delivered back to the probe's callback.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.cluster import Cluster, percentile
+
+
+WORKDIR = './cluster_bench_db'
+BASE_PORT = 9790
+
+
+async def _measure(cluster: Cluster, events: int, window: int) -> dict:
+    loop = asyncio.get_running_loop()
+    latencies = []
+    done = loop.create_future()
+    slots = asyncio.Semaphore(window)
+
+    async def callback(sent: float):
+        latencies.append(time.perf_counter() - sent)
+        slots.release()
+        if len(latencies) == events and not done.done():
+            done.set_result(None)
+
+    cluster.probe.on('bench', callback)
+    started = time.perf_counter()
+    emits = []
+    for _ in range(events):
+        # A follower's emit waits for the master, keep `window` events in
+        # flight but no more, the probe measures latency, not queueing.
+        await slots.acquire()
+        emits.append(loop.create_task(
+            cluster.probe.emit('bench', sent=time.perf_counter())))
+    await asyncio.gather(*emits)
+    emitted = time.perf_counter() - started
+
+    await asyncio.wait_for(done, timeout=60)
+    delivered = time.perf_counter() - started
+
+    return {
+        'events': events,
+        'emit_per_s': events / emitted,
+        'delivered_per_s': events / delivered,
+        'p50_ms': percentile(latencies, 0.5) * 1e3,
+        'p99_ms': percentile(latencies, 0.99) * 1e3,
+    }
+
+
+async def _run(sizes: tuple[int, ...], events: int, window: int,
+               processes: bool) -> list[dict]:
+    results = []
+    for size in sizes:
+        async with Cluster(WORKDIR, size, BASE_PORT, processes=processes) as cluster:
+            result = await _measure(cluster, events, window)
+        results.append({'nodes': size, 'processes': processes, **result})
+
+    return results
+
+
+def run(sizes: tuple[int, ...] = (1, 2, 3, 5,), events: int = 5000,
+        window: int = 64, processes: bool = False) -> list[dict]:
+    return asyncio.run(_run(sizes, events, window, processes))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', action='store_true',
+                        help='run every node but the probe in its own process')
+    parser.add_argument('--events', type=int, default=5000)
+    args = parser.parse_args()
+    for result in run(events=args.events, processes=args.processes):
+        print(json.dumps(result))
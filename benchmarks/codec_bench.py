@@ -0,0 +1,81 @@
+"""Compare codecs on typical Message payloads.
+
+    python -m benchmarks.codec_bench
+"""
+
+from typing import Callable
+
+import json
+import timeit
+from collections import OrderedDict
+
+from eventer.codec import BinaryCodec, PickleCodec
+from eventer.compression import CompressedCodec, LzmaCompression, \
+    ZlibCompression, train_dictionary
+from eventer.messages import Event, EventBatch, MType, Message, \
+    decode_message, encode_event, decode_event
+
+
+def _dictionary() -> bytes:
+    codec = BinaryCodec()
+    return train_dictionary([
+        codec.encode(Event(name='orders.created',
+                           args=OrderedDict(order_id=i, user='alice', total=9.5)))
+        for i in range(1000, 1100)])
+
+
+CODECS = {
+    'pickle': PickleCodec(),
+    'binary': BinaryCodec(),
+    'binary+zlib': CompressedCodec(BinaryCodec()),
+    'binary+zlib+dict': CompressedCodec(
+        BinaryCodec(), ZlibCompression(dictionary=_dictionary())),
+    'binary+lzma': CompressedCodec(BinaryCodec(), LzmaCompression()),
+}
+
+
+def _payloads(codec) -> dict[str, tuple[Callable, Callable]]:
+    """Encode and decode of every payload, a batch with its events as a node handles it."""
+
+    events = [
+        Event(name='orders.created',
+              args=OrderedDict(order_id=i, user='alice', total=99.5))
+        for i in range(64)]
+    event = Message('localhost:9090', MType.EVENT, events[0])
+
+    def encode_batch() -> bytes:
+        batch = EventBatch(records=[encode_event(e, codec) for e in events])
+        return Message('localhost:9090', MType.EVENT_BATCH, batch).encode(codec)
+
+    def decode_batch(data: bytes) -> list[Event]:
+        message = decode_message(data, codec)
+        return [decode_event(r, codec) for r in message.data.records]
+
+    return {
+        'event': (lambda: event.encode(codec),
+                  lambda data: decode_message(data, codec)),
+        'batch': (encode_batch, decode_batch),
+    }
+
+
+def run(number: int = 2000) -> list[dict]:
+    results = []
+    for codec_name, codec in CODECS.items():
+        for payload_name, (encode, decode) in _payloads(codec).items():
+            data = encode()
+            encode_time = timeit.timeit(encode, number=number)
+            decode_time = timeit.timeit(lambda: decode(data), number=number)
+            results.append({
+                'codec': codec_name,
+                'payload': payload_name,
+                'bytes': len(data),
+                'encode_us': encode_time / number * 1e6,
+                'decode_us': decode_time / number * 1e6,
+            })
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print(json.dumps(result))
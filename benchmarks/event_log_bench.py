@@ -0,0 +1,92 @@
+"""EventLog append rate per durability and recovery time of large logs.
+
+    python -m benchmarks.event_log_bench
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+
+from eventer.event_log import Durability, EventLog
+from eventer.messages import Event
+
+
+WORKDIR = './event_log_bench_db'
+
+
+def _event(i: int) -> Event:
+    return Event(name='orders.created',
+                 args=OrderedDict(order_id=i, user='alice', total=99.5))
+
+
+def _reset():
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    os.makedirs(WORKDIR)
+
+
+async def _append(durability: Durability, events: int, batch: int) -> dict:
+    _reset()
+    event_log = EventLog(WORKDIR, max_size=events, segment_size=10000,
+                         durability=durability)
+    event_log.start(asyncio.get_running_loop())
+    started = time.perf_counter()
+    for i in range(0, events, batch):
+        event_log.append_batch([_event(j) for j in range(i, i + batch)])
+        await event_log.flush()
+    elapsed = time.perf_counter() - started
+    await event_log.stop()
+
+    return {
+        'benchmark': 'append',
+        'durability': durability.name,
+        'batch': batch,
+        'events': events,
+        'appends_per_s': events / elapsed,
+    }
+
+
+async def _recover(events: int) -> dict:
+    _reset()
+    event_log = EventLog(WORKDIR, max_size=events, segment_size=10000)
+    event_log.start(asyncio.get_running_loop())
+    for i in range(0, events, 1000):
+        event_log.append_batch([_event(j) for j in range(i, i + 1000)])
+    await event_log.stop()
+
+    started = time.perf_counter()
+    event_log = EventLog(WORKDIR, max_size=events, segment_size=10000)
+    elapsed = time.perf_counter() - started
+    assert event_log.next_offset == events
+
+    return {
+        'benchmark': 'recover',
+        'events': events,
+        'recover_s': elapsed,
+    }
+
+
+async def _run(events: int) -> list[dict]:
+    results = []
+    for durability in Durability:
+        # An fsync per event is slow, fewer events keep runs short.
+        n = events // 10 if durability == Durability.FSYNC else events
+        for batch in (1, 100,):
+            results.append(await _append(durability, n, batch))
+
+    for n in (events, events * 10, events * 100,):
+        results.append(await _recover(n))
+
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    return results
+
+
+def run(events: int = 10000) -> list[dict]:
+    return asyncio.run(_run(events))
+
+
+if __name__ == '__main__':
+    for result in run():
+        print(json.dumps(result))
@@ -0,0 +1,90 @@
+"""Bytes per retained event, before and after compact events.
+
+    python -m benchmarks.memory_bench
+"""
+
+import datetime
+import json
+import tracemalloc
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from eventer.codec import BinaryCodec
+from eventer.messages import Event
+
+
+@dataclass
+class LegacyEvent:
+    """Event as it was: instance dict, unshared name, OrderedDict args."""
+
+    timestamp: float = field(init=False)
+    name: str
+    args: OrderedDict
+    origin: str = ''
+    counter: int = 0
+    seq: int = -1
+
+    def __post_init__(self):
+        self.timestamp = datetime.datetime.now().timestamp()
+
+
+def _fields(i: int) -> tuple[str, dict]:
+    # Fresh strings for every event, as decoding a record produces them.
+    name = b'orders.created'.decode()
+    args = {
+        b'order_id'.decode(): i,
+        b'user'.decode(): b'alice'.decode(),
+        b'total'.decode(): 99.5,
+    }
+    return name, args
+
+
+def _legacy(i: int) -> LegacyEvent:
+    name, args = _fields(i)
+    return LegacyEvent(name=name, args=OrderedDict(args),
+                       origin='f' * 32, counter=i, seq=i)
+
+
+def _compact(i: int) -> Event:
+    name, args = _fields(i)
+    return Event(name=name, args=args, origin='f' * 32, counter=i, seq=i)
+
+
+def _decoded(codec: BinaryCodec):
+    def make(i: int) -> Event:
+        name, args = _fields(i)
+        return codec.decode(codec.encode(
+            Event(name=name, args=args, origin='f' * 32, counter=i, seq=i)))
+
+    return make
+
+
+def _measure(make, events: int) -> float:
+    retained = [None] * events
+    tracemalloc.start()
+    started, _ = tracemalloc.get_traced_memory()
+    for i in range(events):
+        retained[i] = make(i)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (current - started) / events
+
+
+def run(events: int = 100000) -> list[dict]:
+    representations = {
+        'legacy': _legacy,
+        'compact': _compact,
+        'compact_decoded': _decoded(BinaryCodec()),
+    }
+    return [
+        {
+            'representation': name,
+            'events': events,
+            'bytes_per_event': _measure(make, events),
+        }
+        for name, make in representations.items()]
+
+
+if __name__ == '__main__':
+    for result in run():
+        print(json.dumps(result))
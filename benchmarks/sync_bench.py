@@ -0,0 +1,83 @@
+"""Time for a lagging node to catch up with the master.
+
+    python -m benchmarks.sync_bench
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+
+from eventer.eventer import Eventer
+
+from benchmarks.cluster import HOST
+
+
+WORKDIR = './sync_bench_db'
+MASTER_PORT = 9890
+FOLLOWER_PORT = 9891
+
+
+def _node(i: int, port: int, nodes: list, **options) -> Eventer:
+    return Eventer(log_workdir=os.path.join(WORKDIR, f'n{i}'), host=HOST,
+                   port=port, nodes=nodes, loop=asyncio.get_running_loop(),
+                   **options)
+
+
+async def _sync(events: int, lag: int, chunk_size: int) -> dict:
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    os.makedirs(os.path.join(WORKDIR, 'n0'))
+    os.makedirs(os.path.join(WORKDIR, 'n1'))
+
+    # The follower is not a replication target, emits do not wait for it.
+    master = _node(0, MASTER_PORT, [], log_size=events)
+    await master.serve()
+
+    def follower() -> Eventer:
+        return _node(1, FOLLOWER_PORT, [(HOST, MASTER_PORT,)],
+                     log_size=events, sync_chunk_size=chunk_size)
+
+    for i in range(events - lag):
+        await master.emit('bench', i=i)
+    node = follower()
+    await node.serve()
+    await node.close()
+
+    for i in range(events - lag, events):
+        await master.emit('bench', i=i)
+    node = follower()
+    started = time.perf_counter()
+    await node.serve()
+    elapsed = time.perf_counter() - started
+    assert node._event_log.next_offset == events
+    await node.close()
+    await master.close()
+
+    return {
+        'events': events,
+        'lag': lag,
+        'chunk_size': chunk_size,
+        'sync_s': elapsed,
+        'events_per_s': lag / elapsed,
+    }
+
+
+async def _run(sizes: tuple[int, ...], chunk_size: int) -> list[dict]:
+    results = []
+    for events in sizes:
+        for lag in (events // 10, events,):
+            results.append(await _sync(events, lag, chunk_size))
+
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    return results
+
+
+def run(sizes: tuple[int, ...] = (1000, 10000, 100000,),
+        chunk_size: int = 1000) -> list[dict]:
+    return asyncio.run(_run(sizes, chunk_size))
+
+
+if __name__ == '__main__':
+    for result in run():
+        print(json.dumps(result))
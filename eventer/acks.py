@@ -0,0 +1,54 @@
+import asyncio
+import itertools
+
+
+class AckTracker:
+    """Cumulative acknowledgements of one follower.
+
+    A follower answers every batch with its next offset, which confirms
+    every event before it. A lost or late response is therefore covered
+    by any later one and many batches can be in flight at once.
+    """
+
+    @property
+    def acked_offset(self) -> int:
+        return self._acked_offset
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._event_loop = loop
+        self._acked_offset = 0
+        self._ids = itertools.count()
+        self._waiters: dict[int, tuple[int, asyncio.Future]] = {}
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    def ack(self, next_offset: int):
+        if next_offset <= self._acked_offset:
+            return
+
+        self._acked_offset = next_offset
+        for id, (offset, waiter) in list(self._waiters.items()):
+            if offset <= next_offset:
+                del self._waiters[id]
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def wait(self, offset: int, timeout: float) -> bool:
+        """Wait until every event before `offset` is acknowledged."""
+
+        if offset <= self._acked_offset:
+            return True
+
+        id = next(self._ids)
+        waiter = self._event_loop.create_future()
+        self._waiters[id] = (offset, waiter,)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+
+        except asyncio.TimeoutError:
+            return False
+
+        finally:
+            self._waiters.pop(id, None)
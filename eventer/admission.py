@@ -0,0 +1,160 @@
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+
+from .metrics import Metrics
+
+
+class Admission(IntEnum):
+
+    # Wait up to the timeout for a slot, backpressure reaches the caller.
+    BLOCK = 1
+    # Fail at once while every slot is taken.
+    REJECT = 2
+    # Wait like BLOCK, a full wait queue fails its lowest priority waiter.
+    SHED = 3
+
+
+class Overloaded(Exception):
+    """Work was not admitted, the caller should back off and retry."""
+
+
+class AdmissionControl:
+    """Bounds work in flight.
+
+    At most `limit` callers hold a slot at once. Callers without a slot
+    are handled according to `policy`, at most `queue_size` of them wait,
+    the highest priority first and in arrival order within a priority.
+    Waits, rejections and the queue depth are recorded in `metrics`.
+    """
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def __init__(
+            self, loop: asyncio.AbstractEventLoop, limit: int,
+            policy: Admission = Admission.BLOCK, timeout: float = 1.0,
+            queue_size: int = 1000, metrics: Metrics | None = None) -> None:
+        self._event_loop = loop
+        self._limit = limit
+        self._policy = policy
+        self._timeout = timeout
+        self._queue_size = queue_size
+        self._in_flight = 0
+        self._ids = itertools.count()
+        # Waiter id to its priority and future.
+        self._waiters: dict[int, tuple[int, asyncio.Future]] = {}
+
+        metrics = metrics or Metrics()
+        self._wait_time = metrics.histogram('admission_wait_seconds')
+        self._in_flight_gauge = metrics.gauge('admission_in_flight')
+        self._waiting_gauge = metrics.gauge('admission_waiting')
+        self._admitted = metrics.counter('admission_admitted_total')
+        self._rejected = metrics.counter('admission_rejected_total')
+        self._timed_out = metrics.counter('admission_timed_out_total')
+        self._shed = metrics.counter('admission_shed_total')
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            'in_flight': self._in_flight,
+            'waiting': len(self._waiters),
+            'admitted': self._admitted.value,
+            'rejected': self._rejected.value,
+            'timed_out': self._timed_out.value,
+            'shed': self._shed.value,
+            'wait_p50': self._wait_time.quantile(0.5),
+            'wait_p99': self._wait_time.quantile(0.99),
+        }
+
+    def _update_gauges(self):
+        self._in_flight_gauge.set(self._in_flight)
+        self._waiting_gauge.set(len(self._waiters))
+
+    def _make_room(self, priority: int):
+        if len(self._waiters) < self._queue_size:
+            return
+
+        if self._policy != Admission.SHED:
+            self._rejected.inc()
+            raise Overloaded(f'{len(self._waiters)} callers wait already')
+
+        # The latest of the lowest priority waiters goes first.
+        id = min(self._waiters, key=lambda id: (self._waiters[id][0], -id,))
+        if self._waiters[id][0] >= priority:
+            self._shed.inc()
+            raise Overloaded('Shed for higher priority work')
+
+        _, waiter = self._waiters.pop(id)
+        self._shed.inc()
+        waiter.set_exception(Overloaded('Shed for higher priority work'))
+
+    async def acquire(self, priority: int = 0):
+        """Take a slot, raises `Overloaded` if it is not admitted."""
+
+        if self._in_flight < self._limit and not self._waiters:
+            self._in_flight += 1
+            self._admitted.inc()
+            self._wait_time.observe(0.0)
+            self._update_gauges()
+            return
+
+        if self._policy == Admission.REJECT:
+            self._rejected.inc()
+            raise Overloaded(f'{self._in_flight} calls in flight')
+
+        self._make_room(priority)
+        id = next(self._ids)
+        waiter = self._event_loop.create_future()
+        self._waiters[id] = (priority, waiter,)
+        self._update_gauges()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self._timeout)
+
+        except asyncio.TimeoutError:
+            self._timed_out.inc()
+            raise Overloaded(
+                f'No slot within {self._timeout}s') from None
+
+        except BaseException:
+            if waiter.done() and not waiter.cancelled() \
+                    and waiter.exception() is None:
+                # The slot was handed over as the caller was cancelled.
+                self.release()
+            raise
+
+        finally:
+            self._waiters.pop(id, None)
+            self._update_gauges()
+
+        self._admitted.inc()
+        self._wait_time.observe(time.perf_counter() - started)
+
+    def release(self):
+        """Hand the slot to the next waiter, or free it."""
+
+        while self._waiters:
+            id = min(self._waiters, key=lambda id: (-self._waiters[id][0], id,))
+            _, waiter = self._waiters.pop(id)
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+
+        self._in_flight -= 1
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def admit(self, priority: int = 0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
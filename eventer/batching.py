@@ -0,0 +1,88 @@
+from typing import Awaitable, Callable
+
+import asyncio
+
+
+SendBatch = Callable[[list[bytes]], Awaitable[bool]]
+
+
+class Batcher:
+    """Coalesces records bound for one peer into batches.
+
+    A batch is sent `max_delay` seconds after its first record or as soon
+    as it holds `max_records` records or `max_bytes` bytes, whichever comes
+    first. Every caller of `add` gets the result of sending its batch.
+    """
+
+    def __init__(
+            self, send: SendBatch, loop: asyncio.AbstractEventLoop,
+            max_delay: float = 0.001, max_records: int = 256,
+            max_bytes: int = 64 * 1024) -> None:
+        self._send = send
+        self._event_loop = loop
+        self._max_delay = max_delay
+        self._max_records = max_records
+        self._max_bytes = max_bytes
+
+        self._records: list[bytes] = []
+        self._size = 0
+        self._result: asyncio.Future | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, records: list[bytes]) -> asyncio.Future:
+        if self._result is None:
+            self._result = self._event_loop.create_future()
+            self._timer = self._event_loop.call_later(
+                self._max_delay, self.flush)
+
+        result = self._result
+        self._records.extend(records)
+        self._size += sum(len(r) for r in records)
+        if len(self._records) >= self._max_records or self._size >= self._max_bytes:
+            self.flush()
+
+        return result
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._result is None:
+            return
+
+        records, self._records = self._records, []
+        result, self._result = self._result, None
+        self._size = 0
+
+        task = self._event_loop.create_task(self._run(records, result))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, records: list[bytes], result: asyncio.Future):
+        try:
+            ok = await self._send(records)
+        except asyncio.CancelledError:
+            result.cancel()
+            raise
+        except Exception as e:
+            if not result.done():
+                result.set_exception(e)
+        else:
+            if not result.done():
+                result.set_result(ok)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        for task in self._tasks:
+            task.cancel()
+
+        if self._result is not None:
+            self._result.cancel()
+            self._result = None
+        self._records = []
+        self._size = 0
@@ -0,0 +1,271 @@
+from typing import Callable
+
+import pickle
+import struct
+from collections.abc import Mapping
+
+
+class Codec:
+    """Serializes message payloads and EventLog records.
+
+    Every node of a cluster must use the same codec.
+    """
+
+    def encode(self, obj: any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> any:
+        raise NotImplementedError
+
+
+class PickleCodec(Codec):
+
+    def encode(self, obj: any) -> bytes:
+        return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes) -> any:
+        return pickle.loads(data)
+
+
+_NONE = 0x00
+_FALSE = 0x01
+_TRUE = 0x02
+_INT = 0x03
+_BIG_INT = 0x04
+_FLOAT = 0x05
+_STR = 0x06
+_BYTES = 0x07
+_LIST = 0x08
+_TUPLE = 0x09
+_DICT = 0x0A
+_RECORD = 0x0B
+_BYTES_LIST = 0x0C
+
+_U32 = struct.Struct('>I')
+_I64 = struct.Struct('>q')
+_F64 = struct.Struct('>d')
+# Tag and body of the most common values, packed at once.
+_TAGGED_U32 = struct.Struct('>BI')
+_TAGGED_I64 = struct.Struct('>Bq')
+_TAGGED_F64 = struct.Struct('>Bd')
+_RECORD_HEADER = struct.Struct('>BB')
+
+_I64_MIN = -(1 << 63)
+_I64_MAX = (1 << 63) - 1
+
+# Errors malformed input raises while it is decoded.
+_DECODE_ERRORS = (
+    IndexError, KeyError, TypeError, AttributeError, RecursionError,
+    OverflowError, struct.error,)
+
+
+class BinaryCodec(Codec):
+    """Compact tagged binary codec.
+
+    Values are written as a one byte tag followed by a struct-packed body.
+    Besides plain values only types registered with `register` or
+    `register_packed` are supported, so decoding untrusted input never
+    runs arbitrary code. Malformed input raises `ValueError`.
+    """
+
+    _records: dict[type, tuple[int, tuple[str, ...]]] = {}
+    _factories: dict[int, tuple[Callable, int]] = {}
+    _packers: dict[type, tuple[int, 'Pack']] = {}
+    _unpackers: dict[int, 'Unpack'] = {}
+
+    @classmethod
+    def register(
+            cls, tag: int, record_type: type,
+            fields: tuple[str, ...], factory: Callable | None = None):
+        """Encode `record_type` as the values of `fields`.
+
+        Decoding calls `factory` (`record_type` by default) with the field
+        values as positional arguments.
+        """
+
+        cls._records[record_type] = (tag, fields,)
+        cls._factories[tag] = (factory or record_type, len(fields),)
+
+    @classmethod
+    def register_packed(
+            cls, tag: int, record_type: type, pack: 'Pack', unpack: 'Unpack'):
+        """Encode `record_type` with a fixed layout of its own.
+
+        For hot types: `pack` appends the body of a record to `out`,
+        `unpack` returns the record at `position` and the position after
+        it. Values of no fixed size go through `encode_value` and
+        `decode_value`. Records encoded under an earlier `register` of
+        the type still decode.
+        """
+
+        cls._records.pop(record_type, None)
+        cls._packers[record_type] = (tag, pack,)
+        cls._unpackers[tag] = unpack
+
+    def encode(self, obj: any) -> bytes:
+        out = bytearray()
+        self.encode_value(obj, out)
+        return bytes(out)
+
+    def decode(self, data: bytes) -> any:
+        try:
+            if type(data) is not bytes:
+                data = memoryview(data).tobytes()
+            obj, position = self.decode_value(data, 0)
+        except _DECODE_ERRORS as e:
+            raise ValueError(f'Malformed data: {e!r}') from e
+        if position > len(data):
+            raise ValueError('Truncated data')
+        if position < len(data):
+            raise ValueError(f'{len(data) - position} trailing bytes')
+
+        return obj
+
+    def encode_value(self, obj: any, out: bytearray):
+        t = type(obj)
+        if t is str:
+            data = obj.encode('utf-8')
+            out += _TAGGED_U32.pack(_STR, len(data))
+            out += data
+
+        elif t is int:
+            if _I64_MIN <= obj <= _I64_MAX:
+                out += _TAGGED_I64.pack(_INT, obj)
+            else:
+                self._encode_sized(_BIG_INT, str(obj).encode('ascii'), out)
+
+        elif t is float:
+            out += _TAGGED_F64.pack(_FLOAT, obj)
+
+        elif obj is None:
+            out.append(_NONE)
+
+        elif t is bool:
+            out.append(_TRUE if obj else _FALSE)
+
+        elif t in self._packers:
+            tag, pack = self._packers[t]
+            out += _RECORD_HEADER.pack(_RECORD, tag)
+            pack(self, obj, out)
+
+        elif t in self._records:
+            tag, fields = self._records[t]
+            out += _RECORD_HEADER.pack(_RECORD, tag)
+            for name in fields:
+                self.encode_value(getattr(obj, name), out)
+
+        elif t is bytes or t is bytearray or t is memoryview:
+            self._encode_sized(_BYTES, obj, out)
+
+        elif t is list and obj and all(type(item) is bytes for item in obj):
+            # Batches of pre-encoded records, every size packed at once.
+            out += _TAGGED_U32.pack(_BYTES_LIST, len(obj))
+            out += struct.pack(f'>{len(obj)}I', *map(len, obj))
+            out += b''.join(obj)
+
+        elif t is list or t is tuple:
+            out += _TAGGED_U32.pack(_LIST if t is list else _TUPLE, len(obj))
+            for item in obj:
+                self.encode_value(item, out)
+
+        elif isinstance(obj, Mapping):
+            # Read-only mappings decode as dicts.
+            out += _TAGGED_U32.pack(_DICT, len(obj))
+            for key, value in obj.items():
+                self.encode_value(key, out)
+                self.encode_value(value, out)
+
+        else:
+            raise TypeError(f'BinaryCodec can\'t encode {t.__name__}')
+
+    def _encode_sized(self, tag: int, data: bytes, out: bytearray):
+        out += _TAGGED_U32.pack(tag, len(data))
+        out += data
+
+    def decode_value(self, data: bytes, position: int) -> tuple[any, int]:
+        tag = data[position]
+        position += 1
+
+        if tag == _STR:
+            size, = _U32.unpack_from(data, position)
+            position += 4
+            if position + size > len(data):
+                raise ValueError('Truncated value')
+            return data[position:position + size].decode('utf-8'), position + size
+
+        if tag == _INT:
+            return _I64.unpack_from(data, position)[0], position + 8
+
+        if tag == _FLOAT:
+            return _F64.unpack_from(data, position)[0], position + 8
+
+        if tag == _RECORD:
+            record_tag = data[position]
+            position += 1
+            if record_tag in self._unpackers:
+                return self._unpackers[record_tag](self, data, position)
+            if record_tag not in self._factories:
+                raise ValueError(f'Unknown record tag {record_tag}')
+            factory, size = self._factories[record_tag]
+            values = []
+            for _ in range(size):
+                value, position = self.decode_value(data, position)
+                values.append(value)
+            return factory(*values), position
+
+        if tag == _NONE:
+            return None, position
+
+        if tag == _FALSE or tag == _TRUE:
+            return tag == _TRUE, position
+
+        if tag == _BYTES or tag == _BIG_INT:
+            size, = _U32.unpack_from(data, position)
+            position += 4
+            raw = data[position:position + size]
+            if len(raw) < size:
+                raise ValueError('Truncated value')
+            position += size
+            if tag == _BYTES:
+                return raw, position
+            return int(raw), position
+
+        if tag == _LIST or tag == _TUPLE:
+            size, = _U32.unpack_from(data, position)
+            position += 4
+            items = []
+            for _ in range(size):
+                item, position = self.decode_value(data, position)
+                items.append(item)
+            return (items if tag == _LIST else tuple(items)), position
+
+        if tag == _BYTES_LIST:
+            size, = _U32.unpack_from(data, position)
+            position += 4
+            sizes = struct.unpack_from(f'>{size}I', data, position)
+            position += 4 * size
+            items = []
+            for item_size in sizes:
+                items.append(data[position:position + item_size])
+                position += item_size
+            if position > len(data):
+                raise ValueError('Truncated value')
+            return items, position
+
+        if tag == _DICT:
+            size, = _U32.unpack_from(data, position)
+            position += 4
+            items = {}
+            for _ in range(size):
+                key, position = self.decode_value(data, position)
+                items[key], position = self.decode_value(data, position)
+            return items, position
+
+        raise ValueError(f'Unknown value tag {tag}')
+
+
+Pack = Callable[[BinaryCodec, any, bytearray], None]
+Unpack = Callable[[BinaryCodec, bytes, int], tuple[any, int]]
+
+
+DEFAULT_CODEC = BinaryCodec()
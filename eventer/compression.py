@@ -0,0 +1,163 @@
+from collections import Counter
+
+import lzma
+import zlib
+
+from .codec import Codec
+from .framing import MAX_FRAME_SIZE
+from .metrics import Metrics
+
+
+_RAW = 0x00
+_COMPRESSED = 0x01
+
+
+class Compression:
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes, max_size: int = MAX_FRAME_SIZE) -> bytes:
+        """Decompress `data`, raises `ValueError` past `max_size` bytes of output."""
+
+        raise NotImplementedError
+
+
+def _check_consumed(eof: bool, unused_data: bytes, max_size: int):
+    if not eof:
+        raise ValueError(f'Truncated or larger than {max_size} bytes')
+    if unused_data:
+        raise ValueError(f'{len(unused_data)} bytes after the end')
+
+
+class ZlibCompression(Compression):
+    """Raw deflate, optionally primed with a shared dictionary.
+
+    Small events hardly compress on their own, a dictionary holding their
+    common keys and values lets even a single event refer back to it. See
+    `train_dictionary`. Every node must use the same dictionary.
+    """
+
+    def __init__(self, level: int = 6, dictionary: bytes | None = None) -> None:
+        self._level = level
+        self._dictionary = dictionary
+
+    def compress(self, data: bytes) -> bytes:
+        if self._dictionary is None:
+            c = zlib.compressobj(self._level, wbits=-15)
+        else:
+            c = zlib.compressobj(self._level, wbits=-15, zdict=self._dictionary)
+        return c.compress(data) + c.flush()
+
+    def decompress(self, data: bytes, max_size: int = MAX_FRAME_SIZE) -> bytes:
+        if self._dictionary is None:
+            d = zlib.decompressobj(wbits=-15)
+        else:
+            d = zlib.decompressobj(wbits=-15, zdict=self._dictionary)
+        decompressed = d.decompress(data, max_size)
+        _check_consumed(d.eof, d.unused_data, max_size)
+        return decompressed
+
+
+class LzmaCompression(Compression):
+    """Raw LZMA2, slower than zlib but smaller on large frames."""
+
+    def __init__(self, preset: int = 6) -> None:
+        self._filters = [{'id': lzma.FILTER_LZMA2, 'preset': preset}]
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, format=lzma.FORMAT_RAW, filters=self._filters)
+
+    def decompress(self, data: bytes, max_size: int = MAX_FRAME_SIZE) -> bytes:
+        d = lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=self._filters)
+        decompressed = d.decompress(data, max_size)
+        _check_consumed(d.eof, d.unused_data, max_size)
+        return decompressed
+
+
+def train_dictionary(
+        samples: list[bytes], size: int = 4096, length: int = 8) -> bytes:
+    """Build a zlib dictionary from typical encoded events.
+
+    Substrings of `length` bytes found in most samples are kept, the most
+    common last where deflate references them most cheaply.
+    """
+
+    occurrences = Counter()
+    for sample in samples:
+        occurrences.update(
+            {sample[i:i + length] for i in range(len(sample) - length + 1)})
+
+    dictionary = b''
+    for chunk, count in occurrences.most_common():
+        if count < 2 or len(dictionary) + length > size:
+            break
+        if chunk not in dictionary:
+            dictionary = chunk + dictionary
+
+    return dictionary
+
+
+class CompressedCodec(Codec):
+    """Compresses what `codec` encodes.
+
+    Used for messages it compresses every frame, used for the EventLog
+    every record, so records are replicated and stored as they were
+    compressed once on the emitting master. Payloads of types registered
+    with `passthrough`, batches of such records, are not compressed again.
+    Data shorter than `min_size`, or not shrinking, is left as it is.
+    Data decompressing to more than `max_size` bytes is rejected.
+
+    Encoded and compressed sizes are counted in `metrics`.
+    """
+
+    _passthrough: set[type] = set()
+
+    @classmethod
+    def passthrough(cls, payload_type: type):
+        cls._passthrough.add(payload_type)
+
+    @property
+    def saved_bytes(self) -> int:
+        return self._raw_bytes.value - self._compressed_bytes.value
+
+    def __init__(
+            self, codec: Codec, compression: Compression | None = None,
+            min_size: int = 32, max_size: int = MAX_FRAME_SIZE,
+            metrics: Metrics | None = None) -> None:
+        self._codec = codec
+        self._compression = compression or ZlibCompression()
+        self._min_size = min_size
+        self._max_size = max_size
+
+        metrics = metrics or Metrics()
+        self._raw_bytes = metrics.counter('codec_raw_bytes_total')
+        self._compressed_bytes = metrics.counter('codec_compressed_bytes_total')
+
+    def encode(self, obj: any) -> bytes:
+        data = self._codec.encode(obj)
+        if len(data) >= self._min_size and type(obj) not in self._passthrough:
+            compressed = self._compression.compress(data)
+            if len(compressed) < len(data):
+                self._raw_bytes.inc(len(data))
+                self._compressed_bytes.inc(len(compressed))
+                return bytes((_COMPRESSED,)) + compressed
+
+        return bytes((_RAW,)) + data
+
+    def decode(self, data: bytes) -> any:
+        if not data:
+            raise ValueError('Empty data')
+
+        if data[0] == _COMPRESSED:
+            try:
+                data = self._compression.decompress(data[1:], self._max_size)
+            except (zlib.error, lzma.LZMAError, ValueError) as e:
+                raise ValueError(f'Malformed compressed data: {e}') from e
+
+            return self._codec.decode(data)
+
+        if data[0] != _RAW:
+            raise ValueError(f'Unknown compression flag {data[0]}')
+
+        return self._codec.decode(data[1:])
@@ -0,0 +1,232 @@
+import asyncio
+
+from .messages import Message, MType, message_type
+from .codec import DEFAULT_CODEC, Codec
+from .framing import FrameError, read_frame, write_frame
+from .metrics import Metrics
+
+
+class PeerConnection:
+    """Long-lived multiplexed stream to a single peer.
+
+    Requests are tagged with a request id so up to `max_in_flight` of them
+    can be in flight at once. The stream is opened lazily, closed after
+    `idle_timeout` seconds without traffic and reopened with exponential
+    backoff after a failure.
+    """
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def __init__(
+            self, host: str, port: int,
+            loop: asyncio.AbstractEventLoop,
+            idle_timeout: float = 30.0,
+            backoff: float = 0.1, max_backoff: float = 5.0,
+            max_in_flight: int = 64,
+            codec: Codec = DEFAULT_CODEC,
+            metrics: Metrics | None = None) -> None:
+        self._host = host
+        self._port = port
+        self._event_loop = loop
+        self._idle_timeout = idle_timeout
+        self._min_backoff = backoff
+        self._max_backoff = max_backoff
+        self._codec = codec
+        self._metrics = metrics or Metrics()
+        self._failures = self._metrics.counter(
+            'eventer_connection_failures_total', peer=f'{host}:{port}')
+
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._read_task: asyncio.Task | None = None
+        self._idle_handle: asyncio.TimerHandle | None = None
+        self._connecting: asyncio.Future | None = None
+        self._last_request_id = 0
+        self._requests: dict[int, asyncio.Future] = {}
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def _connect(self, timeout: float):
+        if self._writer is not None:
+            return
+
+        if self._connecting is not None:
+            await asyncio.wait_for(asyncio.shield(self._connecting), timeout)
+            return
+
+        if self._event_loop.time() < self._retry_at:
+            raise ConnectionRefusedError(
+                f'{self._host}:{self._port} is backing off')
+
+        self._connecting = self._event_loop.create_future()
+        try:
+            f = asyncio.open_connection(self._host, self._port)
+            self._reader, self._writer = await asyncio.wait_for(f, timeout)
+
+        except (asyncio.TimeoutError, OSError) as e:
+            self._failures.inc()
+            self._backoff = min(
+                max(self._backoff * 2, self._min_backoff), self._max_backoff)
+            self._retry_at = self._event_loop.time() + self._backoff
+            self._connecting.set_exception(e)
+            self._connecting.exception()
+            raise
+
+        except BaseException:
+            # Cancelled, callers waiting for this attempt must not hang.
+            self._connecting.set_exception(ConnectionAbortedError(
+                f'Connecting to {self._host}:{self._port} was cancelled'))
+            self._connecting.exception()
+            raise
+
+        else:
+            self._backoff = 0.0
+            self._connecting.set_result(None)
+            self._read_task = self._event_loop.create_task(self._read())
+
+        finally:
+            self._connecting = None
+
+    async def _read(self):
+        reader = self._reader
+        try:
+            while True:
+                request_id, payload = await read_frame(reader)
+                m_type = message_type(payload)
+                self._metrics.counter('eventer_messages_in_total', type=m_type).inc()
+                self._metrics.counter('eventer_bytes_in_total', type=m_type).inc(len(payload))
+                f = self._requests.pop(request_id, None)
+                if f is not None and not f.done():
+                    f.set_result(payload)
+
+        except (asyncio.IncompleteReadError, FrameError, OSError):
+            pass
+
+        finally:
+            if self._reader is reader:
+                self._drop(ConnectionResetError(
+                    f'{self._host}:{self._port} closed connection'))
+
+    def _drop(self, exc: Exception):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+        if self._writer is not None:
+            self._writer.close()
+
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+
+        requests, self._requests = self._requests, {}
+        for f in requests.values():
+            if not f.done():
+                f.set_exception(exc)
+
+    def _touch(self):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        self._idle_handle = self._event_loop.call_later(
+            self._idle_timeout, self._on_idle)
+
+    def _on_idle(self):
+        self._idle_handle = None
+        if self._requests:
+            self._touch()
+        else:
+            self.close()
+
+    def _encode(self, message: Message) -> bytes:
+        data = message.encode(self._codec)
+        m_type = MType(message.m_type).name
+        self._metrics.counter('eventer_messages_out_total', type=m_type).inc()
+        self._metrics.counter('eventer_bytes_out_total', type=m_type).inc(len(data))
+        return data
+
+    def _next_request_id(self) -> int:
+        self._last_request_id = self._last_request_id % 0xFFFFFFFF + 1
+        return self._last_request_id
+
+    async def request(self, message: Message, timeout: float) -> bytes:
+        """Send `message` and wait for the peer's response payload."""
+
+        async def _request():
+            async with self._in_flight:
+                await self._connect(timeout)
+                request_id = self._next_request_id()
+                f = self._event_loop.create_future()
+                self._requests[request_id] = f
+                self._touch()
+                try:
+                    write_frame(self._writer, request_id, self._encode(message))
+                    await self._writer.drain()
+                    return await f
+
+                finally:
+                    self._requests.pop(request_id, None)
+
+        return await asyncio.wait_for(_request(), timeout)
+
+    async def send(self, message: Message, timeout: float):
+        """Send `message` without waiting for a response."""
+
+        await self._connect(timeout)
+        self._touch()
+        write_frame(self._writer, 0, self._encode(message))
+        await asyncio.wait_for(self._writer.drain(), timeout)
+
+    def close(self):
+        if self._read_task is not None:
+            self._read_task.cancel()
+        self._drop(ConnectionResetError(
+            f'{self._host}:{self._port} connection closed'))
+
+
+class ConnectionPool:
+
+    def __init__(
+            self, loop: asyncio.AbstractEventLoop,
+            idle_timeout: float = 30.0,
+            backoff: float = 0.1, max_backoff: float = 5.0,
+            max_in_flight: int = 64,
+            codec: Codec = DEFAULT_CODEC,
+            metrics: Metrics | None = None) -> None:
+        self._event_loop = loop
+        self._idle_timeout = idle_timeout
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._max_in_flight = max_in_flight
+        self._codec = codec
+        self._metrics = metrics
+        self._peers: dict[tuple[str, int], PeerConnection] = {}
+
+    def get(self, host: str, port: int) -> PeerConnection:
+        key = (host, port,)
+        if key not in self._peers:
+            self._peers[key] = PeerConnection(
+                host=host, port=port, loop=self._event_loop,
+                idle_timeout=self._idle_timeout,
+                backoff=self._backoff, max_backoff=self._max_backoff,
+                max_in_flight=self._max_in_flight, codec=self._codec,
+                metrics=self._metrics)
+
+        return self._peers[key]
+
+    async def request(
+            self, host: str, port: int,
+            message: Message, timeout: float) -> bytes:
+        return await self.get(host, port).request(message, timeout)
+
+    async def send(
+            self, host: str, port: int,
+            message: Message, timeout: float):
+        await self.get(host, port).send(message, timeout)
+
+    def close(self):
+        for peer in self._peers.values():
+            peer.close()
+        self._peers = {}
@@ -0,0 +1,163 @@
+from typing import Awaitable, Callable, Hashable
+
+import asyncio
+import itertools
+from enum import IntEnum
+
+from .messages import Event
+from .topics import ANY_SEGMENTS, TopicTrie
+
+
+Handler = Callable[[Event], Awaitable[None]]
+KeyFunc = Callable[[Event], Hashable]
+
+# Lanes of events whose name is not configured.
+DEFAULT_TOPIC = ANY_SEGMENTS
+
+
+class Overflow(IntEnum):
+
+    # Wait for room in the queue, backpressure reaches the caller.
+    BLOCK = 1
+    # Drop the incoming event.
+    DROP_NEWEST = 2
+    # Drop the oldest queued event to make room.
+    DROP_OLDEST = 3
+
+
+class _Topic:
+
+    def __init__(
+            self, concurrency: int, queue_size: int,
+            overflow: Overflow, key: KeyFunc | None) -> None:
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.key = key
+        self.lanes: list[asyncio.Queue] = []
+        self.workers: list[asyncio.Task] = []
+        self.next_lane = itertools.cycle(range(concurrency))
+        self.dropped = 0
+
+
+class Dispatcher:
+    """Runs event handlers off the replication path.
+
+    Every configured name or pattern gets `concurrency` lanes, each a
+    bounded queue with one worker, events of other names share the lanes
+    of `DEFAULT_TOPIC`. Lanes are created on first use, so their number is
+    bounded by the configuration and not by the names seen. Events with
+    the same `key` go to the same lane and are handled in order, without
+    a `key` lanes are picked round-robin. A full lane is handled according
+    to `overflow`.
+    """
+
+    def __init__(
+            self, handler: Handler, loop: asyncio.AbstractEventLoop,
+            concurrency: int = 1, queue_size: int = 1000,
+            overflow: Overflow = Overflow.BLOCK) -> None:
+        self._handler = handler
+        self._event_loop = loop
+        self._defaults = (concurrency, queue_size, overflow,)
+        self._options: dict[str, tuple] = {DEFAULT_TOPIC: (*self._defaults, None,)}
+        self._patterns: TopicTrie[str] = TopicTrie()
+        self._topics: dict[str, _Topic] = {}
+
+    def configure(
+            self, name: str, concurrency: int | None = None,
+            queue_size: int | None = None, overflow: Overflow | None = None,
+            key: KeyFunc | None = None):
+        """Give `name` its own lanes, applied to new topics only.
+
+        `name` may be a pattern, see `TopicTrie`. An event name matching
+        several patterns goes to the one configured first.
+        """
+
+        default_concurrency, default_queue_size, default_overflow = self._defaults
+        self._options[name] = (
+            concurrency or default_concurrency,
+            queue_size or default_queue_size,
+            overflow or default_overflow,
+            key,)
+        self._patterns.add(name, name, name)
+
+    def topic_of(self, name: str) -> str:
+        """The configured name or pattern whose lanes handle `name`."""
+
+        if name in self._options:
+            return name
+
+        patterns = self._patterns.match(name)
+        return patterns[0] if patterns else DEFAULT_TOPIC
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            name: {
+                'queued': sum(lane.qsize() for lane in topic.lanes),
+                'dropped': topic.dropped,
+            }
+            for name, topic in self._topics.items()}
+
+    def _topic(self, name: str) -> _Topic:
+        name = self.topic_of(name)
+        if name in self._topics:
+            return self._topics[name]
+
+        topic = _Topic(*self._options[name])
+        for _ in range(topic.concurrency):
+            lane = asyncio.Queue(topic.queue_size)
+            topic.lanes.append(lane)
+            topic.workers.append(self._event_loop.create_task(self._work(lane)))
+
+        self._topics[name] = topic
+        return topic
+
+    async def dispatch(self, event: Event):
+        topic = self._topic(event.name)
+        if topic.key is not None:
+            lane = topic.lanes[hash(topic.key(event)) % topic.concurrency]
+        else:
+            lane = topic.lanes[next(topic.next_lane)]
+
+        if not lane.full() or topic.overflow == Overflow.BLOCK:
+            await lane.put(event)
+
+        elif topic.overflow == Overflow.DROP_NEWEST:
+            topic.dropped += 1
+
+        else:
+            lane.get_nowait()
+            lane.task_done()
+            lane.put_nowait(event)
+            topic.dropped += 1
+
+    async def _work(self, lane: asyncio.Queue):
+        while True:
+            event = await lane.get()
+            try:
+                await self._handler(event)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                self._event_loop.call_exception_handler({
+                    'message': f'Handler of {event.name!r} failed',
+                    'exception': e,
+                })
+
+            finally:
+                lane.task_done()
+
+    async def join(self):
+        """Wait until every dispatched event is handled."""
+
+        for topic in list(self._topics.values()):
+            for lane in topic.lanes:
+                await lane.join()
+
+    def close(self):
+        for topic in self._topics.values():
+            for worker in topic.workers:
+                worker.cancel()
+        self._topics = {}
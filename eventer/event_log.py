@@ -1,95 +1,820 @@
+from typing import Iterator
 
 import os
-import pickle
+import asyncio
+import threading
+import bisect
+import itertools
+import time
+from collections import deque
+from enum import IntEnum
 
 from .messages import Event
+from .framing import RECORD_HEADER, encode_record
+from .codec import DEFAULT_CODEC, Codec
+from .idempotency import IdempotencyIndex
+from .segment import SEGMENT_SUFFIX, Segment
+from .metrics import Metrics
+
+
+class Durability(IntEnum):
+
+    # Written to the OS page cache, never fsync'ed.
+    BUFFERED = 1
+    # fsync'ed once per batch of `group_size` events or `group_delay` seconds.
+    GROUP = 2
+    # fsync'ed after every event.
+    FSYNC = 3
 
 
 class EventLog:
+    """Append-only event log.
+
+    Records are appended to rolling segment files named by the offset of
+    their first record. An event's offset in the log is its sequence
+    number. Truncation drops whole segments once every record in them has
+    left the retained window. The checkpoint of the idempotency index is
+    written every `checkpoint_interval` appends, records after it are
+    replayed on load.
+
+    Only the last `cache_size` events, and any not yet written, are kept
+    decoded in memory. Older ones are decoded on access from the segment
+    files, see `Segment`. On load only the last segment is validated.
+
+    Events named in `compaction_keys` are compacted: the latest event per
+    `(name, args[key])` is kept past the retained window, for at most
+    `compaction_limit` keys, the least recently updated key is dropped
+    beyond it. Every `snapshot_interval` appends the keys changed since
+    are appended to a delta file, the snapshot is rewritten whole once the
+    deltas outgrow it.
+
+    Once `start` is called appends are coalesced by a background writer
+    and `flush` waits until they are durable according to `durability`.
+    A failed write fails the log, every later `flush` raises its error
+    until the log is restored.
+
+    The log keeps the offset where the events of each master's term start,
+    see `epochs`. A follower whose log does not match its master's is
+    restored from a snapshot rather than extended.
+    """
 
     @property
-    def versions(self):
-        return self._versions
+    def versions(self) -> dict[str, list[int]]:
+        """State of the idempotency index."""
+
+        return self._index.state()
 
     @property
-    def log(self):
-        return self._log
+    def log(self) -> list[Event]:
+        return self.read(self._first_offset)
 
     @property
     def pick(self) -> Event:
-        return self._log[-1] if len(self._log) > 0 else None
+        if self._next_offset == self._first_offset:
+            return None
+
+        return self.get(self._next_offset - 1)
+
+    @property
+    def first_offset(self) -> int:
+        return self._first_offset
+
+    @property
+    def next_offset(self) -> int:
+        return self._next_offset
+
+    @property
+    def term(self) -> int:
+        """Term of the master that sequenced the last events, 0 before any."""
+
+        return self._epochs[-1][0] if self._epochs else 0
+
+    @property
+    def flushed_offset(self) -> int:
+        """Offset after the last event handed to the segments."""
 
-    def __init__(self, workdir: str, max_size: int = 1000):
+        return self._flushed_offset
+
+    def __init__(
+            self, workdir: str, max_size: int = 1000,
+            segment_size: int = 100, checkpoint_interval: int = 100,
+            durability: Durability = Durability.BUFFERED,
+            group_size: int = 100, group_delay: float = 0.002,
+            codec: Codec = DEFAULT_CODEC, idempotency_window: int = 1024,
+            cache_size: int = 256, index_interval: int = 16,
+            compaction_keys: dict[str, str] | None = None,
+            snapshot_interval: int = 1000, compaction_limit: int = 100_000,
+            metrics: Metrics | None = None):
         self._workdir = workdir
         self._versions_filepath = os.path.join(self._workdir, 'versions')
-        self._log_filepath = os.path.join(self._workdir, 'event.log')
+        self._snapshot_filepath = os.path.join(self._workdir, 'snapshot')
+        self._delta_filepath = os.path.join(self._workdir, 'snapshot.delta')
+        self._epochs_filepath = os.path.join(self._workdir, 'epochs')
 
         self._max_size = max_size
-        self._versions: dict[str, float] = {}
-        self._log: list[Event] = []
+        self._segment_size = segment_size
+        self._checkpoint_interval = checkpoint_interval
+        self._durability = durability
+        self._group_size = group_size
+        self._group_delay = group_delay
+        self._codec = codec
+        self._cache_size = cache_size
+        self._index_interval = index_interval
+        self._compaction_keys = compaction_keys or {}
+        self._snapshot_interval = snapshot_interval
+        self._compaction_limit = compaction_limit
 
-        if os.path.exists(self._versions_filepath) and os.path.exists(self._log_filepath):
-            try:
-                self._load()
-            except:
-                self._store()
+        metrics = metrics or Metrics()
+        self._append_time = metrics.histogram('eventlog_append_seconds')
+        self._commit_time = metrics.histogram('eventlog_commit_seconds')
+        self._fsync_time = metrics.histogram('eventlog_fsync_seconds')
+
+        self._index = IdempotencyIndex(window=idempotency_window)
+        self._first_offset = 0
+        self._next_offset = 0
+        # Decoded events from `_tail_offset` on, never trimmed past the
+        # flushed offset.
+        self._tail: deque[Event] = deque()
+        self._tail_offset = 0
+        self._pending: list[bytes] = []
+        self._flushed_offset = 0
+        self._checkpoint_offset = 0
+        self._force_checkpoint = False
+        # In update order, the least recently updated key first.
+        self._compacted: dict[tuple[str, any], Event] = {}
+        # Keys changed since the last snapshot, None for dropped ones.
+        self._changed: dict[tuple[str, any], Event | None] = {}
+        # Keys written to the delta file since the snapshot was rewritten.
+        self._delta_size = 0
+        self._snapshot_offset = 0
+        # `(term, offset)` of every term with events, in log order.
+        self._epochs: list[tuple[int, int]] = []
+        # Replaced rather than mutated, the writer thread rolls segments.
+        self._segments: list[Segment] = []
 
+        self._writer: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._group_full: asyncio.Event | None = None
+        self._waiters: deque[tuple[int, asyncio.Future]] = deque()
+        self._readers: list[asyncio.Future] = []
+        self._stopped = False
+        self._error: Exception | None = None
+        # Held by a commit, a restore waits for the one in flight. Batches
+        # taken before a restore belong to an older generation and are
+        # dropped.
+        self._commit_lock = threading.Lock()
+        self._generation = 0
+
+        # Only a new workdir starts empty, a log that fails to load is
+        # left on disk for the caller to look at.
+        if self._is_new():
+            self._reset()
         else:
-            self._store()
+            self._load()
+
+    def _is_new(self) -> bool:
+        for filepath in (self._versions_filepath, self._snapshot_filepath,
+                         self._delta_filepath,):
+            if os.path.exists(filepath):
+                return False
+
+        return not self._list_segments()
+
+    def _list_segments(self) -> list[int]:
+        segments = []
+        for filename in os.listdir(self._workdir):
+            if filename.endswith(SEGMENT_SUFFIX):
+                base = filename[:-len(SEGMENT_SUFFIX)]
+                if base.isdigit():
+                    segments.append(int(base))
+
+        return sorted(segments)
 
     def _load(self):
-        with open(self._versions_filepath, 'rb') as fp:
-            self._versions = pickle.load(fp)
+        if os.path.exists(self._epochs_filepath):
+            with open(self._epochs_filepath, 'rb') as fp:
+                self._epochs = [tuple(epoch) for epoch in self._codec.decode(fp.read())]
+
+        if os.path.exists(self._versions_filepath):
+            with open(self._versions_filepath, 'rb') as fp:
+                self._checkpoint_offset, versions = self._codec.decode(fp.read())
+                self._index.restore(versions)
 
-        with open(self._log_filepath, 'rb') as fp:
-            while True:
-                r_next_event_size = fp.read(2)
-                if r_next_event_size == b'':
+        replay_offset = self._checkpoint_offset
+        if self._compaction_keys:
+            self._load_snapshot()
+            replay_offset = min(replay_offset, self._snapshot_offset)
+
+        bases = self._list_segments()
+        segments = []
+        for i, base_offset in enumerate(bases):
+            segment = Segment(self._workdir, base_offset, self._index_interval)
+            if i + 1 < len(bases):
+                segment.load(count=bases[i + 1] - base_offset)
+            else:
+                segment.load()
+            segments.append(segment)
+
+        self._segments = segments
+        next_offset = segments[-1].next_offset if segments else 0
+        self._clear(bases[0] if bases else 0, next_offset)
+
+        # Replay the records after the checkpoint into the idempotency
+        # index and the ones after the snapshot into the compacted events.
+        offset = max(replay_offset, self._first_offset)
+        for r_record in self._records(offset, next_offset):
+            event = self._codec.decode(r_record)
+            if event.seq >= self._checkpoint_offset and event.counter > 0:
+                self._index.add(event.origin, event.counter)
+            if event.seq >= self._snapshot_offset:
+                self._compact(event)
+
+    def _load_snapshot(self):
+        if os.path.exists(self._snapshot_filepath):
+            with open(self._snapshot_filepath, 'rb') as fp:
+                self._snapshot_offset, compacted = self._codec.decode(fp.read())
+                for event in compacted:
+                    self._compact(event)
+
+        if os.path.exists(self._delta_filepath):
+            with open(self._delta_filepath, 'rb') as fp:
+                data = fp.read()
+
+            position = 0
+            while position + RECORD_HEADER.size <= len(data):
+                size, = RECORD_HEADER.unpack_from(data, position)
+                start = position + RECORD_HEADER.size
+                if start + size > len(data):
                     break
-                next_event_size = int.from_bytes(r_next_event_size, 'big')
-                r_event = fp.read(next_event_size)
-                event = pickle.loads(r_event)
-                self._log.append(event)
-
-    def restore(self, versions: dict[str, float], log: list[Event]):
-        self._versions = versions
-        self._log = log
-        self._store()
-
-    def _store(self):
-        with open(self._versions_filepath, 'wb') as fp:
-            pickle.dump(self._versions, fp)
-
-        with open(self._log_filepath, 'wb') as fp:
-            for event in self._log:
-                r_event = pickle.dumps(event)
-                next_event_size = len(r_event)
-                fp.write(next_event_size.to_bytes(2, 'big'))
-                fp.write(r_event)
-
-    def _append(self, event: Event):
-        with open(self._versions_filepath, 'wb') as fp:
-            pickle.dump(self._versions, fp)
-
-        with open(self._log_filepath, 'w+b') as fp:
-            fp.seek(0, 2)
-            r_event = pickle.dumps(event)
-            event_size = len(r_event)
-            fp.write(event_size.to_bytes(2, 'big'))
-            fp.write(r_event)
-
-    def append(self, node_id: str, event: Event) -> bool:
-        if node_id in self._versions and self._versions[node_id] == event.timestamp:
-            return False
-
-        self._versions[node_id] = event.timestamp
-        self._log.append(event)
-
-        if len(self._log) > self._max_size:
-            self._log = self._log[1:]
-            self._store()
 
+                offset, events, dropped = self._codec.decode(data[start:start + size])
+                position = start + size
+                # Deltas before a rewrite of the snapshot are in it already.
+                if offset <= self._snapshot_offset:
+                    continue
+
+                for event in events:
+                    self._compact(event)
+                for key in dropped:
+                    self._compacted.pop(key, None)
+                self._snapshot_offset = offset
+                self._delta_size += len(events) + len(dropped)
+
+            if position < len(data):
+                # Cut a torn append, later ones would follow it.
+                with open(self._delta_filepath, 'r+b') as fp:
+                    fp.truncate(position)
+
+        self._changed = {}
+
+    def _clear(self, first_offset: int, next_offset: int):
+        self._next_offset = next_offset
+        self._first_offset = max(first_offset, next_offset - self._max_size)
+        self._tail.clear()
+        self._tail_offset = next_offset
+        self._flushed_offset = next_offset
+
+    def _reset(self):
+        self._generation += 1
+        self.close()
+        for base_offset in self._list_segments():
+            Segment(self._workdir, base_offset).remove()
+
+        self._index.restore({})
+        self._compacted = {}
+        self._changed = {}
+        self._delta_size = 0
+        self._pending = []
+        self._error = None
+        self._segments = []
+        self._clear(0, 0)
+        self._checkpoint_offset = 0
+        self._checkpoint(0, {})
+        self._snapshot_offset = 0
+        self._epochs = []
+        for filepath in (self._snapshot_filepath, self._delta_filepath,
+                         self._epochs_filepath,):
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    def _replace_file(self, filepath: str, data: bytes):
+        tmp_filepath = filepath + '.tmp'
+        with open(tmp_filepath, 'wb') as fp:
+            fp.write(data)
+            if self._durability != Durability.BUFFERED:
+                os.fsync(fp.fileno())
+        os.replace(tmp_filepath, filepath)
+
+    def _checkpoint(self, offset: int, versions: dict[str, list[int]]):
+        self._replace_file(
+            self._versions_filepath, self._codec.encode((offset, versions,)))
+
+    def _snapshot(
+            self, offset: int, events: list[Event],
+            dropped: list[tuple[str, any]], rewrite: bool):
+        """Rewrite the snapshot with `events`, or append a delta to it."""
+
+        if rewrite:
+            self._replace_file(
+                self._snapshot_filepath, self._codec.encode((offset, events,)))
+            if os.path.exists(self._delta_filepath):
+                os.remove(self._delta_filepath)
+            return
+
+        with open(self._delta_filepath, 'ab') as fp:
+            fp.write(encode_record(
+                self._codec.encode((offset, events, dropped,))))
+            if self._durability != Durability.BUFFERED:
+                os.fsync(fp.fileno())
+
+    def epochs(self, offset: int = 0) -> list[tuple[int, int]]:
+        """`(term, offset)` where each term starts, from the one holding `offset` on.
+
+        A term's events run up to the start of the next one.
+        """
+
+        i = bisect.bisect_right(
+            self._epochs, offset, key=lambda epoch: epoch[1]) - 1
+        return self._epochs[max(i, 0):]
+
+    def matches(self, term: int, offset: int) -> bool:
+        """Whether a log ending at `offset` with events of `term` is a prefix of this one.
+
+        Only one master sequences events in a term, such a log matches if
+        this one holds events of `term` up to `offset`. Events from before
+        any term belong to term 0.
+        """
+
+        if offset == 0:
+            return True
+
+        epochs = [(0, 0,), *self._epochs]
+        for i, (t, start) in enumerate(epochs):
+            if t == term:
+                end = epochs[i + 1][1] if i + 1 < len(epochs) else self._next_offset
+                return start <= offset <= end
+
+        return False
+
+    def _begin_epoch(self, term: int, offset: int):
+        if term <= self.term:
+            return
+
+        self._epochs.append((term, offset,))
+        self._replace_file(self._epochs_filepath, self._codec.encode(self._epochs))
+
+    def _apply_epochs(self, epochs: list[tuple[int, int]], offset: int):
+        """Take the master's `epochs` for the events applied from `offset` on."""
+
+        for term, start in epochs:
+            start = max(start, offset)
+            if start == offset or start < self._next_offset:
+                self._begin_epoch(term, start)
+
+    def _compaction_key(self, event: Event) -> tuple[str, any] | None:
+        """The key `event` is compacted under, raises `ValueError` if it is unhashable."""
+
+        key = self._compaction_keys.get(event.name)
+        if key is None or key not in event.args:
+            return None
+
+        compacted_key = (event.name, event.args[key],)
+        try:
+            hash(compacted_key)
+        except TypeError:
+            raise ValueError(
+                f'{event.name} can not be compacted by {key}: '
+                f'{type(event.args[key]).__name__} is unhashable') from None
+
+        return compacted_key
+
+    def _check(self, events: list[Event]):
+        """Reject `events` before any of them changes the log."""
+
+        if self._compaction_keys:
+            for event in events:
+                self._compaction_key(event)
+
+    def _compact(self, event: Event):
+        compacted_key = self._compaction_key(event)
+        if compacted_key is None:
+            return
+
+        self._compacted.pop(compacted_key, None)
+        self._compacted[compacted_key] = event
+        self._changed[compacted_key] = event
+        if len(self._compacted) > self._compaction_limit:
+            dropped = next(iter(self._compacted))
+            del self._compacted[dropped]
+            self._changed[dropped] = None
+
+    def _open_segment(self) -> Segment:
+        if self._segments and len(self._segments[-1]) < self._segment_size:
+            return self._segments[-1]
+
+        self._close_segment()
+        if self._segments:
+            base_offset = self._segments[-1].next_offset
         else:
-            self._append(event)
+            base_offset = self._flushed_offset
+        segment = Segment(self._workdir, base_offset, self._index_interval)
+        self._segments = [*self._segments, segment]
+        return segment
+
+    def _close_segment(self):
+        if self._segments:
+            self._sync_segment()
+            self._segments[-1].close()
+
+    def _sync_segment(self):
+        if self._durability == Durability.BUFFERED:
+            self._segments[-1].sync()
+        else:
+            with self._fsync_time.time():
+                self._segments[-1].sync(fsync=True)
+
+    def _truncate(self):
+        segments = self._segments
+        while len(segments) > 1 and segments[1].base_offset <= self._first_offset:
+            segments[0].remove()
+            segments = segments[1:]
+        self._segments = segments
+
+    def _write(self, records: list[bytes]):
+        for r_record in records:
+            segment = self._open_segment()
+            segment.append(r_record)
+            if self._durability == Durability.FSYNC:
+                self._sync_segment()
+
+        if self._segments:
+            self._sync_segment()
+        self._flushed_offset += len(records)
+
+    def _take_batch(self) -> tuple[int, list[bytes], tuple | None, tuple | None]:
+        records, self._pending = self._pending, []
+        checkpoint = None
+        snapshot = None
+        next_offset = self._next_offset
+        if self._compaction_keys and (
+                self._force_checkpoint
+                or next_offset - self._snapshot_offset >= self._snapshot_interval):
+            self._snapshot_offset = next_offset
+            changed, self._changed = self._changed, {}
+            if self._delta_size + len(changed) > len(self._compacted):
+                # The deltas would outgrow the snapshot, rewrite it.
+                self._delta_size = 0
+                snapshot = (next_offset, list(self._compacted.values()), [], True,)
+            else:
+                self._delta_size += len(changed)
+                snapshot = (
+                    next_offset,
+                    [event for event in changed.values() if event is not None],
+                    [key for key, event in changed.items() if event is None],
+                    False,)
+
+        if self._force_checkpoint \
+                or next_offset - self._checkpoint_offset >= self._checkpoint_interval:
+            self._force_checkpoint = False
+            self._checkpoint_offset = next_offset
+            checkpoint = (next_offset, self._index.state(),)
+
+        return self._generation, records, checkpoint, snapshot
+
+    def _commit(
+            self, generation: int, records: list[bytes],
+            checkpoint: tuple | None, snapshot: tuple | None):
+        with self._commit_lock:
+            if generation != self._generation:
+                return
+
+            if self._error is not None:
+                raise self._error
+
+            started = time.perf_counter()
+            try:
+                self._write(records)
+                if checkpoint is not None:
+                    self._checkpoint(*checkpoint)
+                if snapshot is not None:
+                    self._snapshot(*snapshot)
+                self._truncate()
+
+            except Exception as e:
+                # The batch left `_pending` unwritten, later records would
+                # be written at its offsets.
+                self._error = e
+                raise
+
+            self._commit_time.observe(time.perf_counter() - started)
+
+    async def _run_writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            if self._durability == Durability.GROUP \
+                    and len(self._pending) < self._group_size:
+                try:
+                    await asyncio.wait_for(
+                        self._group_full.wait(), self._group_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            self._wakeup.clear()
+            self._group_full.clear()
+            batch = self._take_batch()
+            try:
+                await loop.run_in_executor(None, self._commit, *batch)
+            except Exception as e:
+                self._release_waiters(e)
+            else:
+                self._trim_tail()
+                self._release_waiters()
+
+    def _release_waiters(self, error: Exception | None = None):
+        while self._waiters and (
+                error is not None or self._waiters[0][0] <= self._flushed_offset):
+            _, waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(None)
+
+    def start(self, loop: asyncio.AbstractEventLoop | None = None):
+        """Move disk writes to a background writer.
+
+        Until `start` is called every append is written synchronously.
+        """
+
+        if self._writer is not None:
+            return
+
+        loop = loop or asyncio.get_event_loop()
+        self._stopped = False
+        self._wakeup = asyncio.Event()
+        self._group_full = asyncio.Event()
+        self._writer = loop.create_task(self._run_writer())
+        if self._pending:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Wait until every event appended so far is durable."""
+
+        if self._error is not None:
+            raise self._error
+
+        if self._flushed_offset >= self._next_offset:
+            return
+
+        if self._writer is None:
+            self._commit(*self._take_batch())
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((self._next_offset, waiter,))
+        self._wakeup.set()
+        await waiter
+
+    async def stop(self):
+        self._stopped = True
+        self._wake_readers(False)
+        if self._writer is None:
+            return
+
+        if self._error is None:
+            await self.flush()
+        self._writer.cancel()
+        self._writer = None
+        self.close()
+
+    async def wait(self, offset: int) -> bool:
+        """Wait until the event at `offset` is appended.
+
+        Returns False if the log is stopped first.
+        """
+
+        while self._next_offset <= offset:
+            reader = self.reader()
+            if reader is None or not await reader:
+                return False
 
         return True
+
+    def reader(self) -> asyncio.Future | None:
+        """A future resolved with True on the next append.
+
+        It is resolved with False when the log is stopped, None is
+        returned if it is stopped already.
+        """
+
+        if self._stopped:
+            return None
+
+        reader = asyncio.get_running_loop().create_future()
+        self._readers.append(reader)
+        return reader
+
+    def _wake_readers(self, result: bool = True):
+        readers, self._readers = self._readers, []
+        for reader in readers:
+            if not reader.done():
+                reader.set_result(result)
+
+    def _records(self, offset: int, stop: int) -> Iterator[bytes]:
+        segments = self._segments
+        i = bisect.bisect_right(
+            segments, offset, key=lambda segment: segment.base_offset) - 1
+        for segment in segments[max(i, 0):]:
+            if offset >= stop:
+                break
+
+            for r_record in segment.records(offset, stop - offset):
+                yield r_record
+                offset += 1
+
+    def get(self, offset: int) -> Event:
+        if offset < self._first_offset or offset >= self._next_offset:
+            raise IndexError(f'Offset {offset} is out of retained window')
+
+        if offset >= self._tail_offset:
+            return self._tail[offset - self._tail_offset]
+
+        for r_record in self._records(offset, offset + 1):
+            return self._codec.decode(r_record)
+
+        raise IndexError(f'Offset {offset} is missing from segments')
+
+    def read(self, offset: int, limit: int | None = None) -> list[Event]:
+        """Return retained events starting from `offset`.
+
+        Events no longer cached are decoded from the segment files.
+        """
+
+        offset = max(offset, self._first_offset)
+        stop = self._next_offset if limit is None \
+            else min(offset + limit, self._next_offset)
+
+        events = [
+            self._codec.decode(r_record)
+            for r_record in self._records(offset, min(stop, self._tail_offset))]
+        if stop > self._tail_offset:
+            events.extend(itertools.islice(
+                self._tail, max(offset - self._tail_offset, 0),
+                stop - self._tail_offset))
+
+        return events
+
+    def compacted(self, offset: int | None = None) -> list[Event]:
+        """Latest event per compaction key among the events before `offset`.
+
+        Keys whose latest event is at or after `offset` are left out, the
+        log carries them. Without `offset` every key is returned.
+        """
+
+        events = self._compacted.values()
+        if offset is not None:
+            events = (event for event in events if event.seq < offset)
+
+        return sorted(events, key=lambda event: event.seq)
+
+    def restore(
+            self, versions: dict[str, list[int]], log: list[Event],
+            offset: int = 0, compacted: list[Event] | None = None,
+            epochs: list[tuple[int, int]] | None = None):
+        """Replace the log with `log` starting at `offset`.
+
+        `compacted` are the compacted events before `offset`, `epochs` the
+        terms of the master's log from `offset` on. Waits for a commit in
+        flight, events not yet written are dropped and flushes waiting for
+        them return.
+        """
+
+        with self._commit_lock:
+            self._reset()
+
+        waiters, self._waiters = self._waiters, deque()
+        for _, waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+        self._index.restore(versions)
+        self._clear(offset, offset)
+        for event in compacted or []:
+            self._compact(event)
+        self._force_checkpoint = True
+        for event in log:
+            event.seq = self._next_offset
+            self._push(event)
+        self._apply_epochs(epochs or [], offset)
+        self._schedule_commit()
+
+    def extend(
+            self, events: list[Event],
+            records: list[bytes] | None = None,
+            epochs: list[tuple[int, int]] | None = None) -> list[Event]:
+        """Apply events sequenced by the master.
+
+        Events already in the log are skipped, applying stops at the first
+        gap. `records` are `events` as encoded by the master, they are
+        stored as they are. `epochs` are the terms of the master's log
+        holding `events`, see `epochs`. Returns the applied events.
+        """
+
+        self._check(events)
+        started = time.perf_counter()
+        applied = []
+        for i, event in enumerate(events):
+            if event.seq < self._next_offset:
+                continue
+            if event.seq > self._next_offset:
+                break
+
+            self._push(event, None if records is None else records[i])
+            applied.append(event)
+
+        if applied:
+            self._apply_epochs(epochs or [], applied[0].seq)
+            self._schedule_commit()
+
+        self._append_time.observe(time.perf_counter() - started)
+        return applied
+
+    def append(self, event: Event) -> bool:
+        return len(self.append_batch([event])) > 0
+
+    def append_batch(self, events: list[Event]) -> list[Event]:
+        """Sequence and append `events` in order.
+
+        Events whose `(origin, counter)` was already applied are dropped.
+        Returns the appended events, the whole batch is handed to the
+        writer at once. Raises `ValueError`, appending nothing, if an event
+        can not be compacted.
+        """
+
+        return [event for event, _ in self.append_encoded(events)]
+
+    def append_encoded(
+            self, events: list[Event], term: int = 0) -> list[tuple[Event, bytes]]:
+        """Like `append_batch`, also returns every appended event encoded.
+
+        The encoded events are what the log stores, replicating them saves
+        encoding every event twice. `term` is the term of the master
+        sequencing them.
+        """
+
+        self._check(events)
+        started = time.perf_counter()
+        appended = []
+        for event in events:
+            if event.counter > 0 and self._index.seen(event.origin, event.counter):
+                continue
+
+            if not appended:
+                self._begin_epoch(term, self._next_offset)
+            event.seq = self._next_offset
+            appended.append((event, self._push(event),))
+
+        if appended:
+            self._schedule_commit()
+
+        self._append_time.observe(time.perf_counter() - started)
+        return appended
+
+    def _push(self, event: Event, data: bytes | None = None) -> bytes:
+        if data is None:
+            data = self._codec.encode(event)
+        r_record = encode_record(data)
+        if event.counter > 0:
+            self._index.add(event.origin, event.counter)
+        if self._compaction_keys:
+            self._compact(event)
+        self._pending.append(r_record)
+        self._tail.append(event)
+        self._next_offset += 1
+        self._first_offset = max(
+            self._first_offset, self._next_offset - self._max_size)
+        self._trim_tail()
+        return data
+
+    def _trim_tail(self):
+        while len(self._tail) > self._cache_size \
+                and self._tail_offset < self._flushed_offset:
+            self._tail.popleft()
+            self._tail_offset += 1
+
+    def _schedule_commit(self):
+        self._wake_readers()
+        if self._writer is None:
+            self._commit(*self._take_batch())
+            self._trim_tail()
+        else:
+            self._wakeup.set()
+            if len(self._pending) >= self._group_size:
+                self._group_full.set()
+
+    def close(self):
+        self._close_segment()
+        for segment in self._segments:
+            segment.close()
@@ -4,15 +4,66 @@ from typing import Callable
 import asyncio
 import random
 import uuid
-from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import IntEnum
 
 
-from .messages import MType, NodeInfo, Ping, Event, Sync, Message, decode_message
-from .event_log import EventLog
+from .messages import MType, NodeInfo, Ping, Event, EventBatch, SyncRequest, \
+    Sync, Ack, Nack, NackReason, Heartbeat, Vote, Message, decode_message, \
+    encode_event, decode_event, message_type
+from .event_log import Durability, EventLog
+from .connection import ConnectionPool
+from .framing import FrameError, read_frame, write_frame
+from .batching import Batcher
+from .acks import AckTracker
+from .codec import DEFAULT_CODEC, Codec
+from .dispatch import Dispatcher, KeyFunc, Overflow
+from .executors import HandlerExecutor, PooledHandler
+from .topics import TopicTrie
+from .subscription import Subscription
+from .metrics import Exporter, Metrics, serve_metrics
+from .admission import Admission, AdmissionControl, Overloaded
 
 
 Callback = Callable[[any], None]
 
+# Payload type of every message type a node handles.
+_PAYLOADS = {
+    MType.PING: Ping,
+    MType.HEARTBEAT: Heartbeat,
+    MType.EVENT: Event,
+    MType.EVENT_BATCH: EventBatch,
+    MType.SYNC: SyncRequest,
+}
+
+
+def _address(node_id: str) -> tuple[str, int] | None:
+    """`(host, port)` of a node by its id, None for senders that are not nodes."""
+
+    host, _, port = node_id.rpartition(':')
+    return (host, int(port),) if host and port.isdigit() else None
+
+
+class AckPolicy(IntEnum):
+
+    # Do not wait for followers.
+    NONE = 1
+    # Wait until a majority of the cluster, master included, has the event.
+    QUORUM = 2
+    # Wait for every follower.
+    ALL = 3
+
+
+class DeliveryError(Exception):
+    """Events were not confirmed by as many nodes as `AckPolicy` requires.
+
+    The master keeps them, they may still reach the followers.
+    """
+
+
+class NoMaster(Exception):
+    """No master was elected within `master_timeout`, nothing was emitted."""
+
 
 class Eventer:
 
@@ -20,134 +71,757 @@ class Eventer:
     def node_id(self):
         return f'{self._host}:{self._port}'
 
+    @property
+    def quorum(self) -> int:
+        return (len(self._nodes) + 1) // 2 + 1
+
+    @property
+    def master(self) -> tuple[str, int] | None:
+        return self._master
+
     @property
     def is_master(self):
         return self._master == (self._host, self._port,) \
-            or len(self._nodes) == 0 \
-            or self._master is None
+            or len(self._nodes) == 0
 
     def __init__(
             self, log_workdir: str, host: str, port: int,
             nodes: list[tuple[str, int]],
-            loop: asyncio.AbstractEventLoop | None = None) -> None:
+            loop: asyncio.AbstractEventLoop | None = None,
+            durability: Durability = Durability.BUFFERED,
+            idle_timeout: float = 30.0,
+            ack_policy: AckPolicy = AckPolicy.NONE,
+            max_in_flight: int = 64,
+            batch_delay: float = 0.001,
+            batch_size: int = 256,
+            batch_bytes: int = 64 * 1024,
+            codec: Codec = DEFAULT_CODEC,
+            sync_chunk_size: int = 1000,
+            log_size: int = 1000,
+            compaction_keys: dict[str, str] | None = None,
+            lease_timeout: float = 1.0,
+            heartbeat_interval: float | None = None,
+            preferred_master: tuple[str, int] | None = None,
+            master_timeout: float | None = None,
+            dispatch_concurrency: int = 1,
+            dispatch_queue_size: int = 1000,
+            dispatch_overflow: Overflow = Overflow.BLOCK,
+            handler_threads: int | None = None,
+            handler_processes: int | None = None,
+            emit_limit: int | None = None,
+            emit_policy: Admission = Admission.BLOCK,
+            emit_timeout: float = 1.0,
+            emit_queue_size: int = 1000,
+            metrics: Metrics | None = None,
+            metrics_exporters: list[Exporter] | None = None,
+            metrics_interval: float = 10.0,
+            metrics_port: int | None = None) -> None:
 
         self._host = host
         self._port = port
         self._nodes = nodes
-        self._delay = random.uniform(0.0, 2.0)
+        # Timeout of replication requests.
+        self._delay = lease_timeout
+        # Sends of a batch before a follower counts as failed.
+        self._send_attempts = 2
         self._event_loop = loop or asyncio.get_event_loop()
+        self._ack_policy = ack_policy
+        self._batch_delay = batch_delay
+        self._batch_size = batch_size
+        self._batch_bytes = batch_bytes
+        self._codec = codec
+        self._sync_chunk_size = sync_chunk_size
+        self._lease_timeout = lease_timeout
+        self._heartbeat_interval = heartbeat_interval or lease_timeout / 3
+        self._preferred_master = preferred_master
+        self._master_timeout = master_timeout or lease_timeout * 3
+        self._handler_threads = handler_threads
+        self._handler_processes = handler_processes
+        self._metrics = metrics or Metrics()
+        self._metrics_exporters = metrics_exporters or []
+        self._metrics_interval = metrics_interval
+        self._metrics_port = metrics_port
+        self._emit_time = self._metrics.histogram('eventer_emit_seconds')
+        self._admission: AdmissionControl | None = None
+        if emit_limit is not None:
+            self._admission = AdmissionControl(
+                self._event_loop, emit_limit, policy=emit_policy,
+                timeout=emit_timeout, queue_size=emit_queue_size,
+                metrics=self._metrics)
+        self._priorities: dict[str, int] = {}
 
-        self._emit_locker: asyncio.Future | None = None
         self._master: tuple[str, int] | None = None
-        self._callbacks: dict[str, dict[uuid.UUID, Callback]] = {}
-        self._event_log = EventLog(log_workdir)
+        self._has_leader = asyncio.Event()
+        # Cleared while a hand-over drains writes, see `_hand_over`.
+        self._accepting = asyncio.Event()
+        self._accepting.set()
+        self._drain_until: float | None = None
+        self._term = 0
+        self._lease_until = 0.0
+        # When each node last took a request of this node's current term,
+        # the master holds its lease while a quorum did within
+        # `lease_timeout`.
+        self._contacted: dict[tuple[str, int], float] = {}
+        # Term of the master the log was last synced with, events of
+        # another master are applied once the log is checked against its.
+        self._synced_term = 0
+        self._origin = uuid.uuid4().hex
+        self._counter = 0
+        self._sync_task: asyncio.Task | None = None
+        self._callbacks: TopicTrie[Callback] = TopicTrie()
+        self._executors: dict[HandlerExecutor, Executor] = {}
+        self._dispatcher = Dispatcher(
+            handler=self._call_callbacks, loop=self._event_loop,
+            concurrency=dispatch_concurrency, queue_size=dispatch_queue_size,
+            overflow=dispatch_overflow)
+        self._event_log = EventLog(
+            log_workdir, max_size=log_size, durability=durability, codec=codec,
+            compaction_keys=compaction_keys, metrics=self._metrics)
+        self._pool = ConnectionPool(
+            loop=self._event_loop, idle_timeout=idle_timeout,
+            max_in_flight=max_in_flight, codec=codec, metrics=self._metrics)
+        self._batchers: dict[tuple[str, int, bool], Batcher] = {}
+        self._acks: dict[tuple[str, int], AckTracker] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._server: asyncio.AbstractServer | None = None
+        self._connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self._lease_task: asyncio.Task | None = None
+        self._metrics_task: asyncio.Task | None = None
+        self._metrics_server: asyncio.AbstractServer | None = None
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._metrics
 
     async def serve(self):
         """Start network message handling.
 
-        Find master. If master exists sync data with master.
-        Set `loop` delay more then master delay.
+        Find master. If master exists sync data with master,
+        otherwise stand for election.
 
-        Start loop
+        Start lease watch and metrics export.
         """
 
-        self._event_loop.create_task(asyncio.start_server(
-            self._handle, self._host, self._port))
+        self._server = await asyncio.start_server(
+            self._handle, self._host, self._port)
 
         ok = await self._find_master()
         if ok:
             await self._sync()
+        else:
+            # Stand for election soon, nodes started together spread out.
+            self._lease_until = self._event_loop.time() + self._standby() \
+                + random.uniform(0.0, self._heartbeat_interval)
+
+        self._event_log.start(self._event_loop)
+        self._lease_task = self._event_loop.create_task(self._watch_lease())
+
+        if self._metrics_exporters:
+            self._metrics_task = self._event_loop.create_task(
+                self._export_metrics())
+        if self._metrics_port is not None:
+            self._metrics_server = await serve_metrics(
+                self._metrics, self._host, self._metrics_port)
+
+    async def close(self):
+        """Stop network message handling and flush the event log."""
+
+        if self._lease_task is not None:
+            self._lease_task.cancel()
+            self._lease_task = None
+
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            self._metrics_task = None
+
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+            await self._metrics_server.wait_closed()
+            self._metrics_server = None
+
+        if self._server is not None:
+            self._server.close()
+            connections = list(self._connections.items())
+            for writer, _ in connections:
+                writer.close()
+            await asyncio.gather(
+                *(task for _, task in connections), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+        self._dispatcher.close()
+
+        for c in self._callbacks:
+            if isinstance(c, PooledHandler):
+                c.close()
+
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = {}
 
-        self._loop_task = self._event_loop.create_task(self._loop())
+        for batcher in self._batchers.values():
+            batcher.close()
+        self._batchers = {}
+
+        for task in list(self._tasks):
+            task.cancel()
+
+        self._pool.close()
+        await self._event_log.stop()
 
     async def emit(self, name: str, **kwargs):
-        if self._emit_locker is not None:
-            await self._emit_locker
-            self._emit_locker = None
+        """Emit event `name` with `kwargs` as its arguments.
+
+        With `emit_limit` at most that many emits are in flight on this
+        node, others wait or fail with `Overloaded` according to
+        `emit_policy`, see `AdmissionControl` and `configure_emit`. Events
+        forwarded by followers count against the master's limit too, a
+        follower whose events are not admitted fails with `Overloaded`. Raises
+        `DeliveryError` if the event is not confirmed as `ack_policy`
+        requires. Without a master the emit waits up to `master_timeout`
+        for an election, then fails with `NoMaster`.
+        """
+
+        if self._admission is not None:
+            priority = self._priorities.get(name, 0)
+            async with self._admission.admit(priority):
+                await self._emit_event(name, kwargs)
+        else:
+            await self._emit_event(name, kwargs)
+
+    async def _emit_event(self, name: str, args: dict):
+        self._counter += 1
+        event = Event(name=name, args=args,
+                      origin=self._origin, counter=self._counter)
+        with self._emit_time.time():
+            await self._handle_emit(events=[event])
+
+    def configure_emit(self, name: str, priority: int):
+        """Set the admission priority of emits of `name`, higher goes first."""
+
+        self._priorities[name] = priority
+
+    def emit_stats(self) -> dict[str, int | float]:
+        """In flight and waiting emits, admission counts and wait quantiles."""
+
+        if self._admission is None:
+            return {}
+
+        return self._admission.stats()
+
+    def on(
+            self, name: str, c: Callback,
+            executor: HandlerExecutor = HandlerExecutor.LOOP,
+            batch_size: int = 64, max_pending: int = 1000) -> uuid.UUID:
+        """Subscribe `c` to events matching `name`.
+
+        `name` may be a pattern, see `TopicTrie`. With `HandlerExecutor.LOOP`
+        `c` is a coroutine function awaited on the event loop. Otherwise `c`
+        is a plain function run in a shared thread or process pool, see
+        `PooledHandler`.
+        """
 
-        event = Event(name=name, args=OrderedDict(kwargs))
-        await self._handle_emit(node_id=self.node_id, event=event)
+        if executor != HandlerExecutor.LOOP:
+            c = PooledHandler(
+                c, self._executor(executor), loop=self._event_loop,
+                batch_size=batch_size, max_pending=max_pending)
 
-    def on(self, name: str, c: Callback) -> uuid.UUID:
-        if name not in self._callbacks:
-            self._callbacks[name] = {}
         id = uuid.uuid1()
-        self._callbacks[name][id] = c
+        self._callbacks.add(name, id, c)
         return id
 
     def remove(self, name: str, id: uuid.UUID):
-        if name in self._callbacks and id in self._callbacks[name]:
-            del self._callbacks[name][id]
+        c = self._callbacks.remove(name, id)
+        if isinstance(c, PooledHandler):
+            c.close()
+
+    def subscribe(
+            self, name: str, from_offset: int | None = None,
+            buffer_size: int = 100) -> Subscription:
+        """Iterate over events matching `name` with `async for`.
+
+        Replays retained events from `from_offset`, then follows new ones.
+        Without `from_offset` only new events are seen. Restart from the
+        `seq` of the last handled event plus one to resume.
+        """
+
+        if from_offset is None:
+            from_offset = self._event_log.next_offset
+
+        return Subscription(
+            self._event_log, name, from_offset, buffer_size=buffer_size)
+
+    def _executor(self, kind: HandlerExecutor) -> Executor:
+        if kind not in self._executors:
+            if kind == HandlerExecutor.THREAD:
+                self._executors[kind] = ThreadPoolExecutor(
+                    self._handler_threads, thread_name_prefix='eventer')
+            else:
+                self._executors[kind] = ProcessPoolExecutor(
+                    self._handler_processes)
+
+        return self._executors[kind]
+
+    def configure_dispatch(
+            self, name: str, concurrency: int | None = None,
+            queue_size: int | None = None, overflow: Overflow | None = None,
+            key: KeyFunc | None = None):
+        """Set how callbacks of `name` are queued, see `Dispatcher`."""
+
+        self._dispatcher.configure(
+            name, concurrency=concurrency, queue_size=queue_size,
+            overflow=overflow, key=key)
 
     async def _run_callbacks(self, event: Event):
-        if event.name in self._callbacks:
-            for _, c in self._callbacks[event.name].items():
+        if self._callbacks.match(event.name):
+            await self._dispatcher.dispatch(event)
+
+    async def _call_callbacks(self, event: Event):
+        with self._metrics.histogram(
+                'eventer_callback_seconds',
+                topic=self._dispatcher.topic_of(event.name)).time():
+            for c in self._callbacks.match(event.name):
                 await c(**event.args)
 
-    async def _emit(self, host: str, port: int, event: Event):
+    def _batcher(self, host: str, port: int, confirm: bool) -> Batcher:
+        key = (host, port, confirm,)
+        if key not in self._batchers:
+            async def send(records: list[bytes]) -> bool:
+                return await self._send_batch(host, port, records, confirm)
+
+            self._batchers[key] = Batcher(
+                send=send, loop=self._event_loop,
+                max_delay=self._batch_delay, max_records=self._batch_size,
+                max_bytes=self._batch_bytes)
+
+        return self._batchers[key]
+
+    def _ack_tracker(self, host: str, port: int) -> AckTracker:
+        key = (host, port,)
+        if key not in self._acks:
+            self._acks[key] = AckTracker(loop=self._event_loop)
+
+        return self._acks[key]
+
+    async def _send_batch(
+            self, host: str, port: int, records: list[bytes],
+            confirm: bool) -> bool:
+        """Send a batch, the response acknowledges it and everything before it.
+
+        Without `confirm` nobody waits for acknowledgements and the batch
+        is sent one-way.
+        """
+
         try:
-            message = Message(node_id=self.node_id,
-                              m_type=MType.EVENT, data=event)
-            await message.send(host=host, port=port, delay=self._delay)
+            started = self._event_loop.time()
+            message = Message(node_id=self.node_id, m_type=MType.EVENT_BATCH,
+                              data=EventBatch(records=records, term=self._term))
+            if not confirm:
+                await self._pool.send(
+                    host=host, port=port, message=message, timeout=self._delay)
+                return True
+
+            buffer = await self._pool.request(
+                host=host, port=port, message=message, timeout=self._delay)
+            resp = decode_message(buffer, self._codec)
+            if resp.m_type not in (MType.ACK, MType.NACK,) \
+                    or self._observe_term(resp.data.term):
+                return False
+            if resp.m_type == MType.NACK:
+                if resp.data.reason == NackReason.OVERLOADED:
+                    raise Overloaded(f'{host}:{port} did not admit the events')
+                return False
+
+            self._ack_tracker(host, port).ack(resp.data.next_offset)
+            self._contacted[(host, port,)] = started
+            return True
 
         except asyncio.CancelledError:
-            return
+            return False
 
         except asyncio.TimeoutError:
-            return
+            return False
+
+        except ConnectionError:
+            return False
+
+        except ValueError:
+            return False
+
+    async def _emit(
+            self, host: str, port: int, records: list[bytes],
+            confirm: bool = True) -> bool:
+        """Queue encoded events for `host`, returns whether their batch was acknowledged.
+
+        Without `confirm` the batch is sent one-way, see `_send_batch`.
+        """
+
+        result = self._batcher(host, port, confirm).add(records)
+        try:
+            return await asyncio.shield(result)
 
-        except ConnectionRefusedError:
+        except asyncio.CancelledError:
+            return False
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = self._event_loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _confirm(self, host: str, port: int, records: list[bytes], end: int) -> bool:
+        """Send `records` and wait until `host` acknowledged every event before `end`.
+
+        A failed send is retried at once while the timeout lasts, a
+        follower left with a gap resyncs on its own.
+        """
+
+        histogram = self._metrics.histogram(
+            'eventer_replicate_seconds', peer=f'{host}:{port}')
+        tracker = self._ack_tracker(host, port)
+        deadline = self._event_loop.time() + self._delay
+        with histogram.time():
+            for _ in range(self._send_attempts):
+                if await self._emit(host=host, port=port, records=records):
+                    return await tracker.wait(
+                        end, timeout=max(deadline - self._event_loop.time(), 0))
+                # A later batch may have covered the lost one.
+                if tracker.acked_offset >= end:
+                    return True
+                if self._event_loop.time() >= deadline:
+                    break
+
+            return False
+
+    async def _replicate(
+            self, events: list[Event], records: list[bytes] | None = None):
+        """Send `events` to every follower at once.
+
+        `records` are `events` encoded already. Returns as soon as
+        `ack_policy` is satisfied, the remaining sends keep running in the
+        background. Raises `DeliveryError` if it can not be satisfied.
+        """
+
+        if records is None:
+            records = [encode_event(event, self._codec) for event in events]
+        if self._ack_policy == AckPolicy.NONE:
+            for host, port in self._nodes:
+                self._spawn(self._emit(
+                    host=host, port=port, records=records, confirm=False))
             return
 
-    async def _handle_emit(self, node_id: str, event: Event):
-        if self.is_master:
-            ok = self._event_log.append(node_id=node_id, event=event)
+        end = events[-1].seq + 1
+        pending = {
+            self._spawn(self._confirm(host=host, port=port, records=records, end=end))
+            for host, port in self._nodes}
 
-            for node in self._nodes:
-                host = node[0]
-                port = node[1]
-                await self._emit(host=host, port=port, event=event)
+        required = len(pending)
+        if self._ack_policy == AckPolicy.QUORUM:
+            required = min(self.quorum - 1, required)
 
-            if ok:
-                await self._run_callbacks(event=event)
+        acks = 0
+        while pending and acks < required:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            acks += sum(1 for task in done if task.result())
+
+        if acks < required:
+            raise DeliveryError(f'{acks} of {required} followers confirmed')
+
+    async def _wait_for_master(self):
+        try:
+            await asyncio.wait_for(
+                self._has_leader.wait(), self._master_timeout)
+
+        except asyncio.TimeoutError:
+            raise NoMaster(
+                f'No master elected in {self._master_timeout}s') from None
+
+    async def _handle_emit(self, events: list[Event]):
+        if not self._accepting.is_set():
+            await self._accepting.wait()
+        if self.is_master and not self._holds_lease():
+            self._step_down()
+        if self._master is None and self._nodes:
+            await self._wait_for_master()
+
+        if self.is_master:
+            encoded = self._event_log.append_encoded(
+                events=events, term=self._term)
+            appended = [event for event, _ in encoded]
+            await self._event_log.flush()
+            try:
+                if appended:
+                    await self._replicate(
+                        events=appended, records=[data for _, data in encoded])
+
+            finally:
+                # The events are in the log whether or not they are confirmed.
+                for event in appended:
+                    await self._run_callbacks(event=event)
 
         else:
             host = self._master[0]
             port = self._master[1]
-            await self._emit(host=host, port=port, event=event)
-
-    async def _loop(self):
-        await asyncio.sleep(self._delay)
-        self._emit_locker = self._event_loop.create_future()
-        ok = True
-        ping = Ping(versions=self._event_log.versions,
-                    host=self._host, port=self._port)
-        message = Message(node_id=self.node_id, m_type=MType.PING, data=ping)
-        for node in self._nodes:
-            host = node[0]
-            port = node[1]
+            records = [encode_event(event, self._codec) for event in events]
+            if not await self._emit(host=host, port=port, records=records):
+                raise DeliveryError(f'Master {host}:{port} did not confirm')
+
+    def _renew_lease(self):
+        """Trust the current master for another lease.
+
+        The lease is jittered so followers of a failed master do not all
+        stand for election at once.
+        """
+
+        self._lease_until = self._event_loop.time() + self._standby() \
+            + self._lease_timeout * random.uniform(1.0, 1.5)
+
+    def _standby(self) -> float:
+        """Extra wait before standing for election, lets the preferred master stand first."""
+
+        preferred = self._preferred_master
+        if preferred is None or preferred == (self._host, self._port,):
+            return 0.0
+
+        return self._lease_timeout
+
+    def _has_master(self) -> bool:
+        """Whether a master is known to be alive."""
+
+        return self._master == (self._host, self._port,) \
+            or self._master is not None \
+            and self._event_loop.time() < self._lease_until
+
+    def _holds_lease(self) -> bool:
+        """Whether a quorum, this node included, took a request of its term within `lease_timeout`.
+
+        Followers trust a master for at least `lease_timeout` after its
+        last request, a master past its lease may have been replaced.
+        """
+
+        if self.quorum <= 1:
+            return True
+
+        contacted = sorted(
+            (self._contacted.get(node, float('-inf')) for node in self._nodes),
+            reverse=True)
+        return self._event_loop.time() \
+            < contacted[self.quorum - 2] + self._lease_timeout
+
+    def _step_down(self):
+        """Stop sequencing events, stand for election after another lease."""
+
+        self._set_master(None)
+        self._renew_lease()
+
+    def _observe_term(self, term: int) -> bool:
+        """Adopt a newer `term` seen in a response, a master of an older one steps down."""
+
+        if term <= self._term:
+            return False
+
+        self._term = term
+        if self._master == (self._host, self._port,):
+            self._step_down()
+        return True
+
+    async def _watch_lease(self):
+        """Lead or follow.
+
+        The master sends heartbeats every `heartbeat_interval`, a follower
+        stands for election once the master's lease expired. Emits never
+        wait for either. A failed round is reported to the loop's exception
+        handler and retried after `heartbeat_interval`.
+        """
+
+        while True:
             try:
-                reader, _ = await message.send(
-                    host=host, port=port, delay=self._delay)
-                buffer = await reader.read(2)
-                if not buffer.startswith(b'Ok'):
-                    ok = False
-                    break
+                if self._master == (self._host, self._port,):
+                    await self._heartbeat()
+                    await asyncio.sleep(self._heartbeat_interval)
+
+                elif self._event_loop.time() < self._lease_until:
+                    await asyncio.sleep(
+                        self._lease_until - self._event_loop.time())
+
+                else:
+                    await self._elect()
 
             except asyncio.CancelledError:
-                continue
+                raise
 
-            except asyncio.TimeoutError:
-                continue
+            except Exception as e:
+                self._event_loop.call_exception_handler({
+                    'message': 'Lease watch failed',
+                    'exception': e,
+                })
+                await asyncio.sleep(self._heartbeat_interval)
 
-            except ConnectionRefusedError:
-                continue
+    async def _export_metrics(self):
+        while True:
+            await asyncio.sleep(self._metrics_interval)
+            for exporter in self._metrics_exporters:
+                exporter.export(self._metrics)
 
-        if ok:
-            self._master = (self._host, self._port,)
+    async def _request_vote(
+            self, host: str, port: int, message: Message) -> Vote | None:
+        try:
+            buffer = await self._pool.request(
+                host=host, port=port, message=message,
+                timeout=self._heartbeat_interval)
+            resp = decode_message(buffer, self._codec)
+            return resp.data if resp.m_type == MType.VOTE else None
+
+        except asyncio.TimeoutError:
+            return None
+
+        except ConnectionError:
+            return None
+
+        except ValueError:
+            return None
+
+    async def _heartbeat(self):
+        """Renew the lease on followers not replicated to for `heartbeat_interval`.
+
+        The master steps down once it no longer holds its lease, or when a
+        follower is in a newer term.
+        """
+
+        now = self._event_loop.time()
+        nodes = [
+            node for node in self._nodes
+            if now - self._contacted.get(node, 0.0) >= self._heartbeat_interval]
+        heartbeat = Heartbeat(term=self._term, host=self._host, port=self._port,
+                              next_offset=self._event_log.next_offset)
+        message = Message(node_id=self.node_id,
+                          m_type=MType.HEARTBEAT, data=heartbeat)
+        votes = await asyncio.gather(
+            *(self._request_vote(host, port, message) for host, port in nodes))
+
+        term = max((vote.term for vote in votes if vote is not None), default=0)
+        if self._observe_term(term):
+            # A newer master was elected, follow it once it sends a heartbeat.
+            return
+
+        granted = set()
+        for node, vote in zip(nodes, votes):
+            if vote is not None and vote.granted:
+                granted.add(node)
+                self._contacted[node] = now
+                self._ack_tracker(*node).ack(vote.next_offset)
+
+        if not self._holds_lease():
+            # Cut off from a quorum, the others may elect a master.
+            self._step_down()
+            return
+
+        if self._hand_over(granted):
+            # Stop renewing the lease, the preferred master stands first
+            # once it expires.
+            self._step_down()
+            return
+
+        if self._ack_policy == AckPolicy.NONE:
+            # Followers do not acknowledge, their lag is unknown.
+            return
+
+        next_offset = self._event_log.next_offset
+        for host, port in self._nodes:
+            lag = next_offset - self._ack_tracker(host, port).acked_offset
+            self._metrics.gauge('eventer_peer_lag', peer=f'{host}:{port}').set(lag)
+
+    def _hand_over(self, granted: set[tuple[str, int]]) -> bool:
+        """Whether to step down for the preferred master.
+
+        Once the preferred master is alive new writes are held back, so it
+        catches up even under load, and the master steps down when it has
+        every event. A drain not done within `lease_timeout` is given up
+        and writes resume, the next one starts after another lease.
+        """
+
+        preferred = self._preferred_master
+        if preferred is None or preferred == (self._host, self._port,) \
+                or preferred not in self._nodes:
+            return False
+
+        now = self._event_loop.time()
+        alive = preferred in granted \
+            or now - self._contacted.get(preferred, 0.0) < self._heartbeat_interval
+        if not alive:
+            self._stop_draining()
+            return False
+
+        caught_up = self._ack_tracker(*preferred).acked_offset \
+            >= self._event_log.next_offset
+        if self._accepting.is_set():
+            if self._drain_until is not None and now < self._drain_until:
+                # Backing off after a drain was given up.
+                return caught_up
+            self._drain_until = now + self._lease_timeout
+            self._accepting.clear()
 
-        self._loop_task = self._event_loop.create_task(self._loop())
-        self._emit_locker.set_result(1)
+        if caught_up:
+            return True
+
+        if now >= self._drain_until:
+            self._accepting.set()
+            self._drain_until = now + self._lease_timeout
+        return False
+
+    def _stop_draining(self):
+        self._drain_until = None
+        self._accepting.set()
+
+    def _set_master(self, master: tuple[str, int] | None):
+        if master != self._master:
+            self._metrics.counter('eventer_master_changes_total').inc()
+        self._master = master
+        # Held writes go to the next master.
+        self._stop_draining()
+        if master is None:
+            self._has_leader.clear()
+        else:
+            self._has_leader.set()
+        self._metrics.gauge('eventer_term').set(self._term)
+
+    async def _elect(self):
+        """Ask every node for its vote in a new term.
+
+        The candidate wins with the votes of a quorum, its own included,
+        unreachable nodes count as refusals. A losing candidate waits out
+        another lease before trying again.
+        """
+
+        # The master's lease expired, it is presumed dead.
+        self._set_master(None)
+        self._term += 1
+        term = self._term
+        started = self._event_loop.time()
+        ping = Ping(next_offset=self._event_log.next_offset,
+                    host=self._host, port=self._port, term=term)
+        message = Message(node_id=self.node_id, m_type=MType.PING, data=ping)
+        votes = await asyncio.gather(
+            *(self._request_vote(host, port, message) for host, port in self._nodes))
+
+        granted = [
+            node for node, vote in zip(self._nodes, votes)
+            if vote is not None and vote.granted]
+        refused = [vote for vote in votes if vote is not None and not vote.granted]
+        if len(granted) + 1 < self.quorum or self._term != term \
+                or self._has_master():
+            if self._term == term:
+                # Nodes that refused stayed in the previous term, fall back
+                # so heartbeats of a live master are still accepted.
+                self._term = term - 1
+            self._term = max([self._term, *(vote.term for vote in refused)])
+            self._renew_lease()
+            return
+
+        for node in granted:
+            self._contacted[node] = started
+        self._set_master((self._host, self._port,))
 
     async def _find_master(self) -> bool:
         message = Message(node_id=self.node_id,
@@ -157,14 +831,14 @@ class Eventer:
             host = node[0]
             port = node[1]
             try:
-                reader, _ = await message.send(host=host, port=port, delay=1)
-                buffer = await reader.read(1024)
-                resp = decode_message(buffer)
+                buffer = await self._pool.request(
+                    host=host, port=port, message=message, timeout=1)
+                resp = decode_message(buffer, self._codec)
                 node_info: NodeInfo = resp.data
                 if node_info.is_master:
-                    self._master = node
-                    self._delay = random.uniform(
-                        node_info.delay, node_info.delay+1)
+                    self._term = max(self._term, node_info.term)
+                    self._set_master(node)
+                    self._renew_lease()
                     return True
 
             except asyncio.CancelledError:
@@ -173,84 +847,289 @@ class Eventer:
             except asyncio.TimeoutError:
                 continue
 
-            except ConnectionRefusedError:
+            except ConnectionError:
                 continue
 
         return False
 
-    async def _sync(self):
-        message = Message(node_id=self.node_id, m_type=MType.SYNC, data=None)
+    async def _sync(self, run_callbacks: bool = False):
+        """Catch up with the master.
+
+        Only events after the local log are requested, in chunks of
+        `sync_chunk_size`. The master answers with a snapshot of its
+        retained window and its compacted events if the local log fell
+        out of it. With `run_callbacks` events applied incrementally are
+        delivered to callbacks.
+        """
+
         host = self._master[0]
         port = self._master[1]
+        term = self._term
+        offset = self._event_log.next_offset
         try:
-            reader, _ = await message.send(host=host, port=port, delay=1)
-            buffer = await reader.read(1024 * 8)
-            resp = decode_message(buffer)
-            data: Sync = resp.data
-            self._event_log.restore(versions=data.versions, log=data.log)
+            while True:
+                request = SyncRequest(offset=offset, limit=self._sync_chunk_size,
+                                      term=self._event_log.term)
+                message = Message(node_id=self.node_id,
+                                  m_type=MType.SYNC, data=request)
+                buffer = await self._pool.request(
+                    host=host, port=port, message=message, timeout=1)
+                resp = decode_message(buffer, self._codec)
+                data: Sync = resp.data
+
+                if data.snapshot:
+                    self._event_log.restore(
+                        versions=data.versions, log=data.log, offset=data.offset,
+                        compacted=data.compacted, epochs=data.epochs)
+                else:
+                    applied = self._event_log.extend(
+                        events=data.log, epochs=data.epochs)
+                    if run_callbacks:
+                        for event in applied:
+                            await self._run_callbacks(event=event)
+
+                offset = data.offset + len(data.log)
+                if offset >= data.next_offset or len(data.log) == 0:
+                    break
+
+            if self._term == term and self._master == (host, port,):
+                self._synced_term = term
 
         except asyncio.TimeoutError:
             return
 
-    async def _on_node_info(self, writer: asyncio.StreamWriter):
-        node_info = NodeInfo(is_master=self.is_master, delay=self._delay)
+        except ConnectionError:
+            return
+
+        except ValueError:
+            return
+
+    def _resync(self):
+        """Catch up in the background after a gap in replicated events.
+
+        Also checks the log against a new master's, see `_on_sync`.
+        """
+
+        if self._sync_task is None and self._master is not None \
+                and not self.is_master:
+            self._sync_task = self._spawn(self._sync(run_callbacks=True))
+            self._sync_task.add_done_callback(self._on_sync_done)
+
+    def _on_sync_done(self, _: asyncio.Task):
+        self._sync_task = None
+
+    async def _on_node_info(self) -> bytes:
+        node_info = NodeInfo(is_master=self.is_master, term=self._term)
         message = Message(node_id=self.node_id,
                           m_type=MType.NODE_INFO_RESPONSE, data=node_info)
-        await message.response(writer=writer)
+        return message.encode(self._codec)
 
-    async def _on_ping(self, ping: Ping, writer: asyncio.StreamWriter):
-        if self._loop_task is not None:
-            self._loop_task.cancel()
+    def _vote(self, granted: bool) -> bytes:
+        vote = Vote(term=self._term, granted=granted,
+                    next_offset=self._event_log.flushed_offset)
+        message = Message(node_id=self.node_id, m_type=MType.VOTE, data=vote)
+        return message.encode(self._codec)
 
-        ok = True
-        for node_id, version in self._event_log.versions.items():
-            if node_id in ping.versions and version > ping.versions[node_id]:
-                ok = False
-                break
+    async def _on_ping(self, ping: Ping) -> bytes:
+        """Vote for a candidate.
 
-        if ok:
-            self._master = (ping.host, ping.port,)
-            writer.write(b'Ok')
-            await writer.drain()
+        A node votes once per term, only while it knows no live master and
+        only for a candidate whose log is not behind its own.
+        """
 
-        else:
-            writer.write(b'Failed')
-            await writer.drain()
+        candidate = (ping.host, ping.port,)
+        if ping.term <= self._term \
+                or self._has_master() and self._master != candidate:
+            return self._vote(False)
+
+        self._term = ping.term
+        granted = ping.next_offset >= self._event_log.next_offset
+        if granted:
+            self._set_master(candidate)
+            self._renew_lease()
+
+        return self._vote(granted)
 
-        self._loop_task = self._event_loop.create_task(self._loop())
+    async def _on_heartbeat(self, heartbeat: Heartbeat) -> bytes:
+        master = (heartbeat.host, heartbeat.port,)
+        if heartbeat.term < self._term:
+            return self._vote(False)
+
+        # Two masters of one term can only come from a partition, the
+        # lower node id yields.
+        if heartbeat.term == self._term \
+                and self._master == (self._host, self._port,) \
+                and self.node_id > f'{heartbeat.host}:{heartbeat.port}':
+            return self._vote(False)
+
+        self._term = heartbeat.term
+        self._set_master(master)
+        self._renew_lease()
+        self._metrics.gauge('eventer_follower_lag').set(
+            heartbeat.next_offset - self._event_log.next_offset)
+        if heartbeat.next_offset > self._event_log.next_offset \
+                or self._synced_term != self._term:
+            self._resync()
+
+        return self._vote(True)
+
+    def _ack(self) -> bytes:
+        # Only events written to the log are acknowledged.
+        ack = Ack(next_offset=self._event_log.flushed_offset, term=self._term)
+        message = Message(node_id=self.node_id, m_type=MType.ACK, data=ack)
+        return message.encode(self._codec)
+
+    async def _handle_forwarded(self, events: list[Event]):
+        """Emit events forwarded by a follower within `emit_limit`."""
+
+        if self._admission is None:
+            await self._handle_emit(events=events)
+            return
+
+        priority = max(
+            (self._priorities.get(event.name, 0) for event in events), default=0)
+        async with self._admission.admit(priority):
+            await self._handle_emit(events=events)
+
+    def _nack(self, reason: NackReason) -> bytes:
+        message = Message(node_id=self.node_id, m_type=MType.NACK,
+                          data=Nack(reason=int(reason), term=self._term))
+        return message.encode(self._codec)
 
     async def _on_event(
-            self, node_id: str, event: Event,
-            writer: asyncio.StreamWriter):
-        if self.is_master:
-            await self._handle_emit(node_id=node_id, event=event)
-        else:
-            ok = self._event_log.append(node_id=node_id, event=event)
-            if ok:
-                await self._run_callbacks(event=event)
+            self, events: list[Event],
+            records: list[bytes] | None = None, term: int | None = None,
+            sender: tuple[str, int] | None = None) -> bytes:
+        """Emit events forwarded by a follower, or apply events sequenced by `sender`.
+
+        Sequenced events are fenced by `term`: those of an older master are
+        refused, a newer master is followed, a master steps down for it.
+        """
+
+        if any(event.seq < 0 for event in events):
+            try:
+                await self._handle_forwarded(events=events)
+            except Overloaded:
+                return self._nack(NackReason.OVERLOADED)
+            except (DeliveryError, NoMaster, ValueError):
+                # ValueError rejects events the log can not compact.
+                return self._nack(NackReason.UNDELIVERED)
+            return self._ack()
+
+        if term is None:
+            # Sequenced by a sender that does not fence by term.
+            term = self._term
+        if term < self._term or term == self._term and self.is_master:
+            return self._nack(NackReason.STALE_TERM)
+
+        self._observe_term(term)
+        if sender is not None and self._master != sender:
+            self._set_master(sender)
+
+        # Only the master sequences events, they renew its lease.
+        self._renew_lease()
+        if self._synced_term != term:
+            # The log may hold events the new master never had, it is
+            # checked against the master's by a sync before applying any.
+            self._resync()
+            return self._ack()
+
+        applied = self._event_log.extend(
+            events=events, records=records, epochs=[(term, 0,)])
+        if events and events[-1].seq >= self._event_log.next_offset:
+            self._resync()
+
+        await self._event_log.flush()
+        for event in applied:
+            await self._run_callbacks(event=event)
+
+        return self._ack()
 
-        writer.write(b'Ok')
-        await writer.drain()
+    async def _on_sync(self, request: SyncRequest) -> bytes:
+        event_log = self._event_log
+        offset = request.offset
+        # A follower whose log diverged from this one starts over.
+        snapshot = offset < event_log.first_offset or offset > event_log.next_offset \
+            or not event_log.matches(request.term, offset)
+        if snapshot:
+            offset = event_log.first_offset
 
-    async def _on_sync(self, sync: Sync, writer: asyncio.StreamWriter):
-        sync = Sync(log=self._event_log.log, versions=self._event_log.versions)
+        sync = Sync(log=event_log.read(offset, request.limit),
+                    versions=event_log.versions if snapshot else {}, offset=offset,
+                    next_offset=event_log.next_offset, snapshot=snapshot,
+                    compacted=event_log.compacted(offset) if snapshot else [],
+                    epochs=event_log.epochs(offset))
         message = Message(node_id=self.node_id,
                           m_type=MType.SYNC_RESPONSE, data=sync)
-        await message.response(writer=writer)
+        return message.encode(self._codec)
+
+    async def _dispatch(self, request_id: int, buffer: bytes,
+                        writer: asyncio.StreamWriter):
+        try:
+            message = decode_message(buffer, self._codec)
+            m_type = MType(message.m_type).name
+            payload = _PAYLOADS.get(message.m_type)
+            if payload is not None and not isinstance(message.data, payload):
+                raise ValueError(f'Unexpected payload of {m_type}')
+            if message.m_type == MType.EVENT_BATCH:
+                events = [decode_event(r, self._codec)
+                          for r in message.data.records]
+
+        except ValueError:
+            # Malformed frames are dropped, the stream stays usable.
+            self._metrics.counter('eventer_malformed_messages_total').inc()
+            return
+
+        self._metrics.counter('eventer_messages_in_total', type=m_type).inc()
+        self._metrics.counter('eventer_bytes_in_total', type=m_type).inc(len(buffer))
+        response = None
+        if message.m_type == MType.PING:
+            response = await self._on_ping(ping=message.data)
+
+        elif message.m_type == MType.HEARTBEAT:
+            response = await self._on_heartbeat(heartbeat=message.data)
+
+        elif message.m_type == MType.EVENT:
+            response = await self._on_event(events=[message.data])
+
+        elif message.m_type == MType.EVENT_BATCH:
+            response = await self._on_event(
+                events=events, records=message.data.records,
+                term=message.data.term, sender=_address(message.node_id))
+
+        elif message.m_type == MType.NODE_INFO:
+            response = await self._on_node_info()
+
+        elif message.m_type == MType.SYNC:
+            response = await self._on_sync(request=message.data)
+
+        if request_id != 0 and response is not None and not writer.is_closing():
+            m_type = message_type(response)
+            self._metrics.counter('eventer_messages_out_total', type=m_type).inc()
+            self._metrics.counter('eventer_bytes_out_total', type=m_type).inc(len(response))
+            write_frame(writer, request_id, response)
+            await writer.drain()
 
     async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
-        buffer = await reader.read(1024 * 8)
+        """Serve frames of one peer connection until it is closed.
 
-        if len(buffer) > 0:
-            message = decode_message(buffer)
-            if message.m_type == MType.PING:
-                await self._on_ping(ping=message.data, writer=writer)
+        Frames are dispatched concurrently so a slow request does not hold
+        up the rest of the stream.
+        """
 
-            elif message.m_type == MType.EVENT:
-                await self._on_event(node_id=message.node_id, event=message.data, writer=writer)
+        tasks: set[asyncio.Task] = set()
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                request_id, buffer = await read_frame(reader)
+                task = self._event_loop.create_task(
+                    self._dispatch(request_id, buffer, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
 
-            elif message.m_type == MType.NODE_INFO:
-                await self._on_node_info(writer=writer)
+        except (asyncio.IncompleteReadError, FrameError, ConnectionError):
+            pass
 
-            elif message.m_type == MType.SYNC:
-                await self._on_sync(sync=message.data, writer=writer)
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
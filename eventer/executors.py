@@ -0,0 +1,88 @@
+from typing import Callable
+
+import asyncio
+from concurrent.futures import Executor
+from enum import IntEnum
+
+
+class HandlerExecutor(IntEnum):
+
+    # Coroutine handler awaited on the event loop.
+    LOOP = 1
+    # Plain function run in the Eventer's thread pool.
+    THREAD = 2
+    # Plain picklable function run in the Eventer's process pool.
+    PROCESS = 3
+
+
+def _run_batch(fn: Callable, batch: list[dict]) -> list[Exception]:
+    errors = []
+    for kwargs in batch:
+        try:
+            fn(**kwargs)
+        except Exception as e:
+            errors.append(e)
+
+    return errors
+
+
+class PooledHandler:
+    """Callback that runs a plain function in an executor.
+
+    Events are queued and handed off to the executor in batches of up to
+    `batch_size`, so a process pool pays one round trip per batch rather
+    than per event. At most `max_pending` events wait in the queue, then
+    the caller is blocked.
+    """
+
+    def __init__(
+            self, fn: Callable, executor: Executor,
+            loop: asyncio.AbstractEventLoop,
+            batch_size: int = 64, max_pending: int = 1000) -> None:
+        self._fn = fn
+        self._executor = executor
+        self._event_loop = loop
+        self._batch_size = batch_size
+        self._queue: asyncio.Queue = asyncio.Queue(max_pending)
+        self._worker: asyncio.Task | None = None
+
+    async def __call__(self, **kwargs):
+        if self._worker is None:
+            self._worker = self._event_loop.create_task(self._work())
+        await self._queue.put(kwargs)
+
+    async def _work(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                errors = await self._event_loop.run_in_executor(
+                    self._executor, _run_batch, self._fn, batch)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                errors = [e]
+
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            for e in errors:
+                self._event_loop.call_exception_handler({
+                    'message': f'Handler {self._fn!r} failed',
+                    'exception': e,
+                })
+
+    async def join(self):
+        """Wait until every queued event is handled."""
+
+        await self._queue.join()
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
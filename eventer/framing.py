@@ -0,0 +1,45 @@
+import asyncio
+import struct
+
+
+# Largest frame or record accepted, guards against corrupted length fields.
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Network frame header: payload size, request id.
+# Request id 0 marks a one-way frame that gets no response.
+FRAME_HEADER = struct.Struct('>II')
+
+# EventLog record header: record size.
+RECORD_HEADER = struct.Struct('>I')
+
+
+class FrameError(ValueError):
+    pass
+
+
+def _check_size(size: int, max_size: int):
+    if size > max_size:
+        raise FrameError(f'Frame of {size} bytes exceeds {max_size} bytes')
+
+
+async def read_frame(
+        reader: asyncio.StreamReader,
+        max_size: int = MAX_FRAME_SIZE) -> tuple[int, bytes]:
+    header = await reader.readexactly(FRAME_HEADER.size)
+    size, request_id = FRAME_HEADER.unpack(header)
+    _check_size(size, max_size)
+    payload = await reader.readexactly(size)
+    return (request_id, payload,)
+
+
+def write_frame(
+        writer: asyncio.StreamWriter, request_id: int, payload: bytes,
+        max_size: int = MAX_FRAME_SIZE):
+    _check_size(len(payload), max_size)
+    writer.write(FRAME_HEADER.pack(len(payload), request_id) + payload)
+
+
+def encode_record(record: bytes, max_size: int = MAX_FRAME_SIZE) -> bytes:
+    _check_size(len(record), max_size)
+    return RECORD_HEADER.pack(len(record)) + record
+
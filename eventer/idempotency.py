@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+
+class IdempotencyIndex:
+    """Bounded index of applied `(origin, counter)` pairs.
+
+    Every origin numbers its events with a counter starting from 1. Per
+    origin the index keeps a floor, every counter at or below it was
+    applied, and the set of applied counters above it. Counters falling
+    more than `window` behind the newest one are treated as applied and
+    only the `max_origins` most recently seen origins are remembered.
+    """
+
+    def __init__(self, window: int = 1024, max_origins: int = 4096) -> None:
+        self._window = window
+        self._max_origins = max_origins
+        self._origins: OrderedDict[str, tuple[int, set[int]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._origins)
+
+    def seen(self, origin: str, counter: int) -> bool:
+        if origin not in self._origins:
+            return False
+
+        floor, above = self._origins[origin]
+        return counter <= floor or counter in above
+
+    def add(self, origin: str, counter: int):
+        if origin in self._origins:
+            self._origins.move_to_end(origin)
+            floor, above = self._origins[origin]
+        else:
+            floor, above = 0, set()
+            if len(self._origins) >= self._max_origins:
+                self._origins.popitem(last=False)
+
+        if counter > floor:
+            above.add(counter)
+            while floor + 1 in above:
+                floor += 1
+                above.remove(floor)
+
+            if len(above) > self._window:
+                floor = max(above) - self._window
+                above = {c for c in above if c > floor}
+
+        self._origins[origin] = (floor, above,)
+
+    def state(self) -> dict[str, list[int]]:
+        """Plain representation, `[floor, *counters above floor]` per origin."""
+
+        return {
+            origin: [floor, *sorted(above)]
+            for origin, (floor, above) in self._origins.items()}
+
+    def restore(self, state: dict[str, list[int]]):
+        self._origins = OrderedDict(
+            (origin, (counters[0], set(counters[1:]),))
+            for origin, counters in state.items())
@@ -1,45 +1,404 @@
 
 import io
-import asyncio
-import pickle
+import sys
+import struct
 import datetime
-from collections import OrderedDict
+from collections.abc import Mapping
 from enum import IntEnum
 from dataclasses import field, dataclass
 
+from .codec import DEFAULT_CODEC, BinaryCodec, Codec
+from .compression import CompressedCodec
+
 
 @dataclass
 class NodeInfo:
 
     is_master: bool
-    delay: float
+    term: int
 
 
 @dataclass
 class Ping:
 
-    versions: dict[str, float]
+    # Next offset of the candidate's log.
+    next_offset: int
+    host: str
+    port: int
+    # Term the candidate asks votes for.
+    term: int = 0
+
+
+@dataclass
+class Heartbeat:
+
+    # Term of the sending master, renews its lease.
+    term: int
     host: str
     port: int
+    # Next offset of the master's log, a follower behind it catches up.
+    next_offset: int
 
 
 @dataclass
+class Vote:
+
+    # Current term of the responder to a Ping or Heartbeat.
+    term: int
+    granted: bool
+    # Next offset of the responder's log, acknowledges a heartbeat.
+    next_offset: int = 0
+
+
+# Argument names shared by events, bounded so arbitrary names can't grow it.
+_SHARED_NAMES: dict[tuple[str, ...], tuple[str, ...]] = {}
+_MAX_SHARED_NAMES = 4096
+
+
+def _share_names(names: tuple[str, ...]) -> tuple[str, ...]:
+    shared = _SHARED_NAMES.get(names)
+    if shared is None:
+        if len(_SHARED_NAMES) >= _MAX_SHARED_NAMES:
+            return names
+        shared = tuple(sys.intern(name) for name in names)
+        _SHARED_NAMES[shared] = shared
+
+    return shared
+
+
+class Args(Mapping):
+    """Immutable, ordered event arguments.
+
+    Events with the same argument names share one tuple of them, every
+    event only holds a tuple of values, a fraction of a dict.
+    """
+
+    __slots__ = ('_names', '_values',)
+
+    def __init__(self, names: tuple[str, ...], values: tuple) -> None:
+        self._names = _share_names(names)
+        self._values = values
+
+    @classmethod
+    def of(cls, args: Mapping) -> 'Args':
+        if type(args) is cls:
+            return args
+
+        return cls(tuple(args), tuple(args.values()))
+
+    def __getitem__(self, name: str) -> any:
+        try:
+            return self._values[self._names.index(name)]
+        except ValueError:
+            raise KeyError(name) from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def keys(self) -> tuple[str, ...]:
+        return self._names
+
+    def values(self) -> tuple:
+        return self._values
+
+    def items(self):
+        return zip(self._names, self._values)
+
+    def __eq__(self, other) -> bool:
+        if type(other) is Args:
+            return self._names == other._names and self._values == other._values
+        return super().__eq__(other)
+
+    def __reduce__(self):
+        return Args, (self._names, self._values,)
+
+    def __repr__(self) -> str:
+        return f'Args({dict(self.items())!r})'
+
+
+@dataclass(slots=True)
 class Event:
 
     timestamp: float = field(init=False)
+    # Interned, events of one name share it.
     name: str
-    args: OrderedDict
+    args: Args
+    # Emitting node incarnation, interned, and its per-origin event
+    # counter, counter 0 disables de-duplication.
+    origin: str = ''
+    counter: int = 0
+    # Log sequence number assigned by the master.
+    seq: int = -1
 
     def __post_init__(self):
         n = datetime.datetime.now()
         self.timestamp = n.timestamp()
+        self.name = sys.intern(self.name)
+        self.origin = sys.intern(self.origin)
+        self.args = Args.of(self.args)
+
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: dict):
+        # Also restores events pickled before they had slots.
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.name = sys.intern(self.name)
+        self.origin = sys.intern(self.origin)
+        self.args = Args.of(self.args)
+
+
+@dataclass
+class EventBatch:
+
+    # Events encoded with `encode_event`.
+    records: list[bytes]
+    # Term of the sender, followers drop batches of a deposed master.
+    term: int = 0
+
+
+@dataclass
+class SyncRequest:
+
+    # First offset the follower is missing.
+    offset: int
+    limit: int
+    # Term of the master that sequenced the follower's last events, a
+    # follower whose log diverged from the master's gets a snapshot.
+    term: int = 0
 
 
 @dataclass
 class Sync:
 
     log: list[Event]
-    versions: dict[str, float]
+    # Idempotency index state, sent with snapshots only.
+    versions: dict[str, list[int]]
+    # Offset of the first event in `log`.
+    offset: int = 0
+    # Master's next offset, the follower is caught up once it reaches it.
+    next_offset: int = 0
+    # The follower fell off the retained window and must reset its log.
+    snapshot: bool = True
+    # Latest events per compaction key before `offset`, sent with snapshots only.
+    compacted: list[Event] = field(default_factory=list)
+    # `(term, offset)` where each term of the master's log from `offset` on
+    # starts, see `EventLog.epochs`.
+    epochs: list[tuple[int, int]] = field(default_factory=list)
+
+
+@dataclass
+class Ack:
+
+    # Next offset of the follower's log, every event before it is durable.
+    next_offset: int
+    # Current term of the responder, a deposed master learns of its successor.
+    term: int = 0
+
+
+class NackReason(IntEnum):
+
+    # The master appended the events, but not as many nodes as its ack
+    # policy requires confirmed them.
+    UNDELIVERED = 1
+    # The batch came from a master of an older term.
+    STALE_TERM = 2
+    # The master's `emit_limit` did not admit the events.
+    OVERLOADED = 3
+
+
+@dataclass
+class Nack:
+
+    # Why the events were not confirmed, see `NackReason`.
+    reason: int
+    # Current term of the responder.
+    term: int = 0
+
+
+def _restore_event(
+        timestamp: float, name: str, args: dict,
+        origin: str, counter: int, seq: int) -> Event:
+    # Bypass __post_init__, the timestamp comes from the wire.
+    event = Event.__new__(Event)
+    event.timestamp = timestamp
+    event.name = sys.intern(name)
+    event.args = Args.of(args)
+    event.origin = sys.intern(origin)
+    event.counter = counter
+    event.seq = seq
+    return event
+
+
+# Numbers of an event and the sizes of its name, origin and argument names.
+_EVENT_LAYOUT = struct.Struct('>dqqHHH')
+_NAME_SIZE = struct.Struct('>H')
+_U32 = struct.Struct('>I')
+# Term and record count of a batch.
+_BATCH_HEADER = struct.Struct('>qI')
+
+# Argument names as encoded together, both ways. Bounded like
+# `_SHARED_NAMES`, long names are not kept.
+_ENCODED_NAMES: dict[tuple[str, ...], bytes] = {}
+_DECODED_NAMES: dict[bytes, tuple[str, ...]] = {}
+_MAX_KEPT_NAMES_SIZE = 1024
+
+
+def _encode_names(names: tuple[str, ...]) -> bytes:
+    data = _ENCODED_NAMES.get(names)
+    if data is None:
+        out = bytearray()
+        for name in names:
+            name = name.encode('utf-8')
+            out += _NAME_SIZE.pack(len(name))
+            out += name
+        data = bytes(out)
+        if len(_ENCODED_NAMES) < _MAX_SHARED_NAMES \
+                and len(data) <= _MAX_KEPT_NAMES_SIZE:
+            _ENCODED_NAMES[names] = data
+
+    return data
+
+
+def _decode_names(data: bytes) -> tuple[str, ...]:
+    names = _DECODED_NAMES.get(data)
+    if names is None:
+        decoded = []
+        position = 0
+        while position < len(data):
+            size, = _NAME_SIZE.unpack_from(data, position)
+            position += 2
+            decoded.append(data[position:position + size].decode('utf-8'))
+            position += size
+        if position != len(data):
+            raise ValueError('Truncated argument names')
+
+        names = _share_names(tuple(decoded))
+        if len(_DECODED_NAMES) < _MAX_SHARED_NAMES \
+                and len(data) <= _MAX_KEPT_NAMES_SIZE:
+            _DECODED_NAMES[data] = names
+
+    return names
+
+
+def _pack_event(codec: BinaryCodec, event: Event, out: bytearray):
+    name = event.name.encode('utf-8')
+    origin = event.origin.encode('utf-8')
+    names = _encode_names(event.args.keys())
+    out += _EVENT_LAYOUT.pack(
+        event.timestamp, event.counter, event.seq,
+        len(name), len(origin), len(names))
+    out += name
+    out += origin
+    out += names
+    for value in event.args.values():
+        codec.encode_value(value, out)
+
+
+def _unpack_event(
+        codec: BinaryCodec, data: bytes, position: int) -> tuple[Event, int]:
+    timestamp, counter, seq, name_size, origin_size, names_size = \
+        _EVENT_LAYOUT.unpack_from(data, position)
+    position += _EVENT_LAYOUT.size
+    name = data[position:position + name_size].decode('utf-8')
+    position += name_size
+    origin = data[position:position + origin_size].decode('utf-8')
+    position += origin_size
+    names = _decode_names(data[position:position + names_size])
+    position += names_size
+
+    values = []
+    for _ in names:
+        value, position = codec.decode_value(data, position)
+        values.append(value)
+
+    event = Event.__new__(Event)
+    event.timestamp = timestamp
+    event.name = sys.intern(name)
+    event.args = Args(names, tuple(values))
+    event.origin = sys.intern(origin)
+    event.counter = counter
+    event.seq = seq
+    return event, position
+
+
+def _pack_batch(codec: BinaryCodec, batch: EventBatch, out: bytearray):
+    records = batch.records
+    out += _BATCH_HEADER.pack(batch.term, len(records))
+    out += struct.pack(f'>{len(records)}I', *map(len, records))
+    out += b''.join(records)
+
+
+def _unpack_records(data: bytes, position: int, count: int) -> tuple[list[bytes], int]:
+    sizes = struct.unpack_from(f'>{count}I', data, position)
+    position += 4 * count
+    records = []
+    for size in sizes:
+        records.append(data[position:position + size])
+        position += size
+
+    return records, position
+
+
+def _unpack_batch(
+        codec: BinaryCodec, data: bytes, position: int) -> tuple[EventBatch, int]:
+    term, count = _BATCH_HEADER.unpack_from(data, position)
+    records, position = _unpack_records(
+        data, position + _BATCH_HEADER.size, count)
+    return EventBatch(records=records, term=term), position
+
+
+def _unpack_batch_without_term(
+        codec: BinaryCodec, data: bytes, position: int) -> tuple[EventBatch, int]:
+    count, = _U32.unpack_from(data, position)
+    records, position = _unpack_records(data, position + _U32.size, count)
+    return EventBatch(records=records), position
+
+
+BinaryCodec.register(1, NodeInfo, ('is_master', 'term',))
+BinaryCodec.register(2, Ping, ('next_offset', 'host', 'port', 'term',))
+BinaryCodec.register(
+    3, Event, ('timestamp', 'name', 'args', 'origin', 'counter', 'seq',),
+    _restore_event)
+BinaryCodec.register(4, EventBatch, ('records',))
+BinaryCodec.register(
+    5, Sync, ('log', 'versions', 'offset', 'next_offset', 'snapshot',
+              'compacted',))
+BinaryCodec.register(6, SyncRequest, ('offset', 'limit',))
+BinaryCodec.register(7, Ack, ('next_offset',))
+BinaryCodec.register(8, Heartbeat, ('term', 'host', 'port', 'next_offset',))
+BinaryCodec.register(9, Vote, ('term', 'granted', 'next_offset',))
+BinaryCodec.register(12, Nack, ('reason',))
+# Records of tags 5, 6, 7 and 12 from before the terms still decode.
+BinaryCodec.register(14, Ack, ('next_offset', 'term',))
+BinaryCodec.register(15, Nack, ('reason', 'term',))
+BinaryCodec.register(16, SyncRequest, ('offset', 'limit', 'term',))
+BinaryCodec.register(
+    17, Sync, ('log', 'versions', 'offset', 'next_offset', 'snapshot',
+               'compacted', 'epochs',))
+# Hot types, records of tags 3, 4 and 11 from before still decode.
+BinaryCodec.register_packed(10, Event, _pack_event, _unpack_event)
+BinaryCodec.register_packed(
+    11, EventBatch, _pack_batch, _unpack_batch_without_term)
+BinaryCodec.register_packed(13, EventBatch, _pack_batch, _unpack_batch)
+
+# Records of a batch are compressed already.
+CompressedCodec.passthrough(EventBatch)
+
+
+def encode_event(event: Event, codec: Codec = DEFAULT_CODEC) -> bytes:
+    return codec.encode(event)
+
+
+def decode_event(data: bytes, codec: Codec = DEFAULT_CODEC) -> Event:
+    return codec.decode(data)
 
 
 class MType(IntEnum):
@@ -50,6 +409,11 @@ class MType(IntEnum):
     PING = 4
     SYNC = 5
     SYNC_RESPONSE = 6
+    EVENT_BATCH = 7
+    ACK = 8
+    HEARTBEAT = 9
+    VOTE = 10
+    NACK = 11
 
 
 class Message:
@@ -63,17 +427,17 @@ class Message:
         return self._m_type
 
     @property
-    def data(self) -> Event | Ping | Sync | NodeInfo | None:
+    def data(self) -> Event | EventBatch | Ping | Heartbeat | Vote | SyncRequest | Sync | Ack | Nack | NodeInfo | None:
         return self._data
 
     def __init__(
             self, node_id: str, m_type: MType,
-            data: Event | Ping | Sync | NodeInfo | None) -> None:
+            data: Event | EventBatch | Ping | Heartbeat | Vote | SyncRequest | Sync | Ack | Nack | NodeInfo | None) -> None:
         self._node_id = node_id
         self._m_type = m_type
         self._data = data
 
-    def encode(self) -> bytes:
+    def encode(self, codec: Codec = DEFAULT_CODEC) -> bytes:
         buffer = io.BytesIO()
 
         r_node_id = bytes(self._node_id, encoding='ascii')
@@ -85,26 +449,26 @@ class Message:
         buffer.write(m_type.to_bytes(2, 'big'))
 
         if self._data:
-            r_data = pickle.dumps(self._data)
+            r_data = codec.encode(self._data)
             data_size = len(r_data)
-            buffer.write(data_size.to_bytes(2, 'big'))
+            buffer.write(data_size.to_bytes(4, 'big'))
             buffer.write(r_data)
 
         return buffer.getvalue()
 
-    async def send(self, host: str, port: int, delay: float):
-        f = asyncio.open_connection(host, port)
-        reader, writer = await asyncio.wait_for(f, delay)
-        writer.write(self.encode())
-        await writer.drain()
-        return (reader, writer,)
 
-    async def response(self, writer: asyncio.StreamWriter):
-        writer.write(self.encode())
-        await writer.drain()
+def message_type(data: bytes) -> str:
+    """Name of the MType of an encoded message, read from its header only."""
+
+    node_id_size = int.from_bytes(data[:2], 'big')
+    r_m_type = data[2 + node_id_size:4 + node_id_size]
+    try:
+        return MType(int.from_bytes(r_m_type, 'big')).name
+    except ValueError:
+        return 'UNKNOWN'
 
 
-def decode_message(data: bytes) -> Message:
+def decode_message(data: bytes, codec: Codec = DEFAULT_CODEC) -> Message:
     buffer = io.BytesIO(data)
 
     r_node_id_size = buffer.read(2)
@@ -112,12 +476,12 @@ def decode_message(data: bytes) -> Message:
     node_id = str(r_node_id, encoding='ascii')
 
     r_m_type = buffer.read(2)
-    r_data_size = buffer.read(2)
+    r_data_size = buffer.read(4)
 
     m_type = int.from_bytes(r_m_type, 'big')
     data_size = int.from_bytes(r_data_size, 'big')
 
     r_data = buffer.read(data_size)
-    _data = pickle.loads(r_data) if r_data != b'' else None
+    _data = codec.decode(r_data) if r_data != b'' else None
 
     return Message(node_id=node_id, m_type=m_type, data=_data)
@@ -0,0 +1,184 @@
+from typing import Iterator, TextIO
+
+import asyncio
+import bisect
+import sys
+import time
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds, the last bucket is unbounded.
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Counter:
+
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class Gauge:
+
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets."""
+
+    __slots__ = ('bounds', 'buckets', 'count', 'sum',)
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile."""
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            seen += count
+            if seen >= rank and seen > 0:
+                return bound
+
+        return float('inf') if self.count else 0.0
+
+
+def _labels(labels: dict[str, any]) -> Labels:
+    return tuple(sorted((key, str(value),) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """Registry of named metrics.
+
+    A metric is identified by its name and labels, asking for the same
+    pair again returns the same instance, so hot paths may keep it.
+    """
+
+    def __init__(self) -> None:
+        self._counters: dict[tuple[str, Labels], Counter] = {}
+        self._gauges: dict[tuple[str, Labels], Gauge] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+
+    def counter(self, name: str, **labels) -> Counter:
+        key = (name, _labels(labels),)
+        if key not in self._counters:
+            self._counters[key] = Counter()
+        return self._counters[key]
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        key = (name, _labels(labels),)
+        if key not in self._gauges:
+            self._gauges[key] = Gauge()
+        return self._gauges[key]
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        key = (name, _labels(labels),)
+        if key not in self._histograms:
+            self._histograms[key] = Histogram()
+        return self._histograms[key]
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        """Flat `(name, labels, value)` samples of every metric."""
+
+        for (name, labels), counter in list(self._counters.items()):
+            yield name, labels, counter.value
+
+        for (name, labels), gauge in list(self._gauges.items()):
+            yield name, labels, gauge.value
+
+        for (name, labels), histogram in list(self._histograms.items()):
+            cumulative = 0
+            for bound, count in zip(
+                    (*histogram.bounds, float('inf'),), histogram.buckets):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{name}_bucket', (*labels, ('le', le,),), cumulative
+            yield f'{name}_count', labels, histogram.count
+            yield f'{name}_sum', labels, histogram.sum
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+
+        return ''.join(
+            f'{name}{_format_labels(labels)} {value}\n'
+            for name, labels, value in self.samples())
+
+
+class Exporter:
+    """Ships metrics somewhere, called every export interval."""
+
+    def export(self, metrics: Metrics):
+        raise NotImplementedError
+
+
+class TextExporter(Exporter):
+
+    def __init__(self, stream: TextIO = sys.stderr) -> None:
+        self._stream = stream
+
+    def export(self, metrics: Metrics):
+        self._stream.write(metrics.render())
+        self._stream.flush()
+
+
+async def serve_metrics(
+        metrics: Metrics, host: str, port: int) -> asyncio.AbstractServer:
+    """Serve `metrics.render()` over HTTP on every path."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+            body = metrics.render().encode('utf-8')
+            writer.write(
+                b'HTTP/1.0 200 OK\r\n'
+                b'Content-Type: text/plain; version=0.0.4\r\n'
+                b'Content-Length: ' + str(len(body)).encode('ascii') + b'\r\n'
+                b'\r\n' + body)
+            await writer.drain()
+
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError):
+            pass
+
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,238 @@
+from typing import Iterable
+
+import asyncio
+import os
+import uuid
+import zlib
+from collections import OrderedDict
+
+from .eventer import Callback, DeliveryError, Eventer
+from .executors import HandlerExecutor
+from .admission import Overloaded
+from .messages import MType, Ack, Nack, NackReason, Event, EventBatch, \
+    Message, decode_message, encode_event, decode_event
+from .connection import ConnectionPool
+from .codec import DEFAULT_CODEC
+from .framing import read_frame, write_frame
+
+
+def partition_dirname(partition: int) -> str:
+    return f'p{partition:04d}'
+
+
+class PartitionedEventer:
+    """Event space split into partitions, each with its own master.
+
+    Every partition is an `Eventer` of its own, with its own log
+    directory under `log_workdir`, its own port `port + partition` and its
+    own election. Events are ordered within a partition only. An event
+    goes to the partition of its name, or of the value of its key
+    argument when `keys` maps its name to one, so events of one key stay
+    in order across names.
+
+    Partition `p` prefers the `p`-th node of the cluster, sorted by
+    address, as its master: other nodes stand for election later and a
+    master hands over once the preferred node has caught up. Writes are
+    spread across the cluster this way.
+
+    With `owned` only those partitions run here, events of the others are
+    forwarded to their port on this host, see `Supervisor`. With
+    `ingress_port` events sent to that port are forwarded to their
+    partition, the port may be shared by several processes through
+    SO_REUSEPORT. Ingress answers with the owner's ACK, or a NACK if a
+    partition did not take its events.
+    """
+
+    @property
+    def partitions(self) -> int:
+        return self._count
+
+    @property
+    def owned(self) -> list[int]:
+        return list(self._partitions)
+
+    def __init__(
+            self, log_workdir: str, host: str, port: int,
+            nodes: list[tuple[str, int]], partitions: int = 8,
+            keys: dict[str, str] | None = None,
+            owned: Iterable[int] | None = None,
+            ingress_port: int | None = None,
+            loop: asyncio.AbstractEventLoop | None = None, **options) -> None:
+        self._host = host
+        self._port = port
+        self._count = partitions
+        self._keys = keys or {}
+        self._ingress_port = ingress_port
+        self._event_loop = loop or asyncio.get_event_loop()
+        self._codec = options.get('codec', DEFAULT_CODEC)
+        # A forwarded event may wait for an election before it is emitted.
+        lease_timeout = options.get('lease_timeout', 1.0)
+        self._timeout = lease_timeout \
+            + (options.get('master_timeout') or lease_timeout * 3)
+
+        members = sorted([(host, port,), *nodes])
+        self._partitions: dict[int, Eventer] = {}
+        for p in range(partitions) if owned is None else owned:
+            workdir = os.path.join(log_workdir, partition_dirname(p))
+            os.makedirs(workdir, exist_ok=True)
+            preferred = members[p % len(members)]
+            self._partitions[p] = Eventer(
+                log_workdir=workdir, host=host, port=port + p,
+                nodes=[(h, n + p,) for h, n in nodes], loop=self._event_loop,
+                preferred_master=(preferred[0], preferred[1] + p,), **options)
+
+        self._ids: dict[uuid.UUID, list[tuple[int, uuid.UUID]]] = {}
+        self._origin = uuid.uuid4().hex
+        self._counter = 0
+        self._pool = ConnectionPool(loop=self._event_loop, codec=self._codec)
+        self._ingress: asyncio.AbstractServer | None = None
+        self._connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    def partition(self, p: int) -> Eventer:
+        return self._partitions[p]
+
+    def partition_of(self, name: str, args: dict) -> int:
+        key = self._keys.get(name)
+        value = name if key is None else args.get(key)
+        return zlib.crc32(str(value).encode('utf-8')) % self._count
+
+    async def serve(self):
+        await asyncio.gather(*(p.serve() for p in self._partitions.values()))
+
+        if self._ingress_port is not None:
+            self._ingress = await asyncio.start_server(
+                self._handle, self._host, self._ingress_port, reuse_port=True)
+
+    async def close(self):
+        if self._ingress is not None:
+            self._ingress.close()
+            connections = list(self._connections.items())
+            for writer, _ in connections:
+                writer.close()
+            await asyncio.gather(
+                *(task for _, task in connections), return_exceptions=True)
+            await self._ingress.wait_closed()
+            self._ingress = None
+
+        self._pool.close()
+        await asyncio.gather(*(p.close() for p in self._partitions.values()))
+
+    async def emit(self, name: str, **kwargs):
+        p = self.partition_of(name, kwargs)
+        if p in self._partitions:
+            await self._partitions[p].emit(name, **kwargs)
+            return
+
+        self._counter += 1
+        event = Event(name=name, args=OrderedDict(kwargs),
+                      origin=self._origin, counter=self._counter)
+        await self._forward(p, [encode_event(event, self._codec)])
+
+    async def _forward(self, p: int, records: list[bytes]) -> bytes:
+        """Hand encoded events to the process running partition `p`.
+
+        Returns the owner's ACK. Raises `Overloaded` if the owner did not
+        admit the events, `DeliveryError` if it did not take them.
+        """
+
+        message = Message(node_id=f'{self._host}:{self._port}',
+                          m_type=MType.EVENT_BATCH,
+                          data=EventBatch(records=records))
+        try:
+            buffer = await self._pool.request(
+                host=self._host, port=self._port + p, message=message,
+                timeout=self._timeout)
+        except (asyncio.TimeoutError, OSError) as e:
+            raise DeliveryError(f'Partition {p} did not answer: {e!r}') from e
+
+        resp = decode_message(buffer, self._codec)
+        if resp.m_type == MType.NACK and resp.data.reason == NackReason.OVERLOADED:
+            raise Overloaded(f'Partition {p} did not admit the events')
+        if resp.m_type != MType.ACK:
+            raise DeliveryError(f'Partition {p} did not confirm')
+        return buffer
+
+    async def _route(self, records: list[bytes]) -> list[bytes]:
+        """Forward encoded events to their partitions, keeping their origin.
+
+        Returns the ACK of every partition the events went to.
+        """
+
+        partitions: dict[int, list[bytes]] = {}
+        for r_record in records:
+            event = decode_event(r_record, self._codec)
+            p = self.partition_of(event.name, event.args)
+            partitions.setdefault(p, []).append(r_record)
+
+        return await asyncio.gather(
+            *(self._forward(p, records) for p, records in partitions.items()))
+
+    def _reply(self, m_type: MType, data: Ack | Nack) -> bytes:
+        message = Message(node_id=f'{self._host}:{self._port}',
+                          m_type=m_type, data=data)
+        return message.encode(self._codec)
+
+    async def _dispatch(self, request_id: int, buffer: bytes,
+                        writer: asyncio.StreamWriter):
+        message = decode_message(buffer, self._codec)
+        try:
+            if message.m_type == MType.EVENT:
+                acks = await self._route([encode_event(message.data, self._codec)])
+
+            elif message.m_type == MType.EVENT_BATCH:
+                acks = await self._route(message.data.records)
+
+            else:
+                return
+
+        except Overloaded:
+            response = self._reply(
+                MType.NACK, Nack(reason=int(NackReason.OVERLOADED)))
+
+        except DeliveryError:
+            response = self._reply(
+                MType.NACK, Nack(reason=int(NackReason.UNDELIVERED)))
+
+        else:
+            # Offsets of different partitions do not compare, only the ACK
+            # of a single partition is relayed.
+            response = acks[0] if len(acks) == 1 \
+                else self._reply(MType.ACK, Ack(next_offset=0))
+
+        if request_id != 0 and not writer.is_closing():
+            write_frame(writer, request_id, response)
+            await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve ingress frames of one producer connection in order."""
+
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                request_id, buffer = await read_frame(reader)
+                await self._dispatch(request_id, buffer, writer)
+
+        except (asyncio.IncompleteReadError, ValueError, ConnectionError):
+            # A malformed frame ends the producer's connection.
+            pass
+
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    def on(
+            self, name: str, c: Callback,
+            executor: HandlerExecutor = HandlerExecutor.LOOP,
+            batch_size: int = 64, max_pending: int = 1000) -> uuid.UUID:
+        """Subscribe `c` to events matching `name` in every partition run here."""
+
+        id = uuid.uuid1()
+        self._ids[id] = [
+            (p, partition.on(name, c, executor=executor, batch_size=batch_size,
+                             max_pending=max_pending))
+            for p, partition in self._partitions.items()]
+        return id
+
+    def remove(self, name: str, id: uuid.UUID):
+        for p, partition_id in self._ids.pop(id, []):
+            self._partitions[p].remove(name, partition_id)
@@ -0,0 +1,205 @@
+from typing import Iterator
+
+import os
+import bisect
+import mmap
+import struct
+
+from .framing import MAX_FRAME_SIZE, RECORD_HEADER, FrameError
+
+
+SEGMENT_SUFFIX = '.log'
+INDEX_SUFFIX = '.index'
+
+# Sparse index entry: number of the record in its segment, file position.
+INDEX_ENTRY = struct.Struct('>IQ')
+
+
+def segment_filename(base_offset: int, suffix: str = SEGMENT_SUFFIX) -> str:
+    return f'{base_offset:020d}{suffix}'
+
+
+class Segment:
+    """Segment file of an EventLog and its sparse offset index.
+
+    The file position of every `index_interval`-th record is appended to
+    an index file next to the segment. A record is looked up by jumping
+    to the closest indexed position and skipping record headers, reads go
+    through a read-only mmap so records are only copied and decoded when
+    accessed.
+
+    Appends and `sync` may run in a writer thread, reads only see records
+    synced before them.
+    """
+
+    @property
+    def base_offset(self) -> int:
+        return self._base_offset
+
+    @property
+    def next_offset(self) -> int:
+        return self._base_offset + self._count
+
+    def __init__(
+            self, workdir: str, base_offset: int, index_interval: int = 16,
+            max_size: int = MAX_FRAME_SIZE) -> None:
+        self._base_offset = base_offset
+        self._filepath = os.path.join(workdir, segment_filename(base_offset))
+        self._index_filepath = os.path.join(
+            workdir, segment_filename(base_offset, INDEX_SUFFIX))
+        self._index_interval = index_interval
+        self._max_size = max_size
+
+        # Entries after the implicit (0, 0).
+        self._index: list[tuple[int, int]] = []
+        self._count = 0
+        self._size = 0
+        self._synced = 0
+        self._fp = None
+        self._index_fp = None
+        self._map: mmap.mmap | None = None
+        self._map_count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def load(self, count: int | None = None):
+        """Open the segment files found on disk.
+
+        With `count` the segment is trusted to hold `count` records. Without
+        it the records after the last index entry are validated, a torn
+        record at the end is truncated and the index is completed.
+        """
+
+        self._size = os.path.getsize(self._filepath)
+        self._index = []
+        if os.path.exists(self._index_filepath):
+            with open(self._index_filepath, 'rb') as fp:
+                data = fp.read()
+            for i in range(len(data) // INDEX_ENTRY.size):
+                entry = INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size)
+                if entry[1] >= self._size:
+                    break
+                self._index.append(entry)
+
+        if count is not None:
+            self._count = count
+        else:
+            self._scan()
+
+        self._synced = self._count
+
+    def _scan(self):
+        count, position = self._index[-1] if self._index else (0, 0,)
+        with open(self._filepath, 'rb') as fp:
+            fp.seek(position)
+            while position + RECORD_HEADER.size <= self._size:
+                size, = RECORD_HEADER.unpack(fp.read(RECORD_HEADER.size))
+                end = position + RECORD_HEADER.size + size
+                if size > self._max_size or end > self._size:
+                    break
+
+                if count > 0 and count % self._index_interval == 0 \
+                        and (not self._index or self._index[-1][0] < count):
+                    self._index.append((count, position,))
+                fp.seek(end)
+                position = end
+                count += 1
+
+        self._count = count
+        if position < self._size:
+            # Drop a torn record left by a crash in the middle of a write.
+            os.truncate(self._filepath, position)
+            self._size = position
+
+        with open(self._index_filepath, 'wb') as fp:
+            fp.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in self._index))
+
+    def append(self, r_record: bytes):
+        if self._fp is None:
+            self._fp = open(self._filepath, 'ab')
+            self._index_fp = open(self._index_filepath, 'ab')
+
+        if self._count > 0 and self._count % self._index_interval == 0:
+            entry = (self._count, self._size,)
+            self._index.append(entry)
+            self._index_fp.write(INDEX_ENTRY.pack(*entry))
+
+        self._fp.write(r_record)
+        self._size += len(r_record)
+        self._count += 1
+
+    def sync(self, fsync: bool = False):
+        if self._fp is not None:
+            self._fp.flush()
+            self._index_fp.flush()
+            if fsync:
+                os.fsync(self._fp.fileno())
+        self._synced = self._count
+
+    def _mapped(self, offset: int) -> mmap.mmap:
+        if self._map is None or offset - self._base_offset >= self._map_count:
+            synced = self._synced
+            if offset - self._base_offset >= synced:
+                raise IndexError(f'Offset {offset} is not synced')
+
+            with open(self._filepath, 'rb') as fp:
+                self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map_count = synced
+
+        return self._map
+
+    def _position(self, data: mmap.mmap, offset: int) -> int:
+        number = offset - self._base_offset
+        i = bisect.bisect_right(self._index, number, key=lambda entry: entry[0]) - 1
+        skipped, position = self._index[i] if i >= 0 else (0, 0,)
+        for _ in range(number - skipped):
+            size, = RECORD_HEADER.unpack_from(data, position)
+            position += RECORD_HEADER.size + size
+
+        return position
+
+    def records(self, offset: int, limit: int | None = None) -> Iterator[bytes]:
+        """Yield records starting from `offset`, at most `limit` of them."""
+
+        if offset < self._base_offset or offset >= self.next_offset:
+            return
+
+        stop = self._base_offset + self._synced
+        if limit is not None:
+            stop = min(stop, offset + limit)
+        if offset >= stop:
+            return
+
+        data = self._mapped(stop - 1)
+        position = self._position(data, offset)
+        for _ in range(offset, stop):
+            size, = RECORD_HEADER.unpack_from(data, position)
+            start = position + RECORD_HEADER.size
+            position = start + size
+            if size > self._max_size or position > len(data):
+                raise FrameError(f'Corrupted record in {self._filepath}')
+            yield data[start:position]
+
+    def read(self, offset: int) -> bytes:
+        for r_record in self.records(offset, 1):
+            return r_record
+
+        raise IndexError(f'Offset {offset} is not in segment {self._base_offset}')
+
+    def close(self):
+        if self._fp is not None:
+            self.sync()
+            self._fp.close()
+            self._index_fp.close()
+            self._fp = None
+            self._index_fp = None
+
+        self._map = None
+        self._map_count = 0
+
+    def remove(self):
+        self.close()
+        for filepath in (self._filepath, self._index_filepath,):
+            if os.path.exists(filepath):
+                os.remove(filepath)
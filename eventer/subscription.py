@@ -0,0 +1,79 @@
+import asyncio
+from collections import deque
+
+from .event_log import EventLog
+from .messages import Event
+from .topics import TopicTrie
+
+
+class Subscription:
+    """Async iterator over events matching `pattern`, starting at `offset`.
+
+    Retained events are read from the EventLog in chunks of `buffer_size`,
+    then the subscription waits for new appends, so a consumer is never
+    more than one chunk ahead of what it handled. Events that left the
+    retained window before being read are skipped and counted in
+    `skipped`. Iteration ends when the log is stopped or `close` is
+    called.
+    """
+
+    @property
+    def offset(self) -> int:
+        """Offset of the next event to be read from the log."""
+
+        return self._offset
+
+    @property
+    def skipped(self) -> int:
+        return self._skipped
+
+    def __init__(
+            self, event_log: EventLog, pattern: str, offset: int,
+            buffer_size: int = 100) -> None:
+        self._event_log = event_log
+        self._topics: TopicTrie[bool] = TopicTrie()
+        self._topics.add(pattern, pattern, True)
+        self._offset = offset
+        self._buffer_size = buffer_size
+        self._buffer: deque[Event] = deque()
+        self._skipped = 0
+        self._closed = False
+        # Pending wait for the next append, resolved with False on close.
+        self._reader: asyncio.Future | None = None
+
+    def __aiter__(self) -> 'Subscription':
+        return self
+
+    async def __anext__(self) -> Event:
+        while True:
+            if not self._buffer and not await self._fill():
+                raise StopAsyncIteration
+
+            event = self._buffer.popleft()
+            if self._topics.match(event.name):
+                return event
+
+    async def _fill(self) -> bool:
+        while not self._closed:
+            first_offset = self._event_log.first_offset
+            if self._offset < first_offset:
+                self._skipped += first_offset - self._offset
+                self._offset = first_offset
+
+            events = self._event_log.read(self._offset, self._buffer_size)
+            if events:
+                self._buffer.extend(events)
+                self._offset += len(events)
+                return True
+
+            self._reader = self._event_log.reader()
+            if self._reader is None or not await self._reader:
+                return False
+
+        return False
+
+    def close(self):
+        self._closed = True
+        self._buffer.clear()
+        if self._reader is not None and not self._reader.done():
+            self._reader.set_result(False)
@@ -0,0 +1,152 @@
+"""Run one node as a group of worker processes.
+
+    python -m eventer.supervisor --workdir ./db --port 9000 \\
+        --node otherhost:9000 --partitions 32 --workers 32 \\
+        --ingress-port 8999 --setup myapp.handlers:setup
+"""
+
+from typing import Awaitable, Callable
+
+import argparse
+import asyncio
+import importlib
+import multiprocessing
+import os
+import signal
+import threading
+
+from .partitions import PartitionedEventer
+
+
+Setup = Callable[[PartitionedEventer], Awaitable[None] | None]
+
+
+def _load_setup(path: str) -> Setup:
+    module, _, name = path.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+
+async def _run_worker(
+        log_workdir: str, host: str, port: int, nodes: list[tuple[str, int]],
+        partitions: int, owned: list[int], setup: Setup | None,
+        options: dict):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT,):
+        loop.add_signal_handler(signum, stop.set)
+
+    eventer = PartitionedEventer(
+        log_workdir, host, port, nodes, partitions=partitions, owned=owned,
+        loop=loop, **options)
+    if setup is not None:
+        result = setup(eventer)
+        if asyncio.iscoroutine(result):
+            await result
+
+    await eventer.serve()
+    await stop.wait()
+    await eventer.close()
+
+
+def _worker(*args):
+    asyncio.run(_run_worker(*args))
+
+
+class Supervisor:
+    """Partitions of one node spread over `workers` processes.
+
+    Worker `k` runs every partition `p` with `p % workers == k`, each in
+    its own directory under `log_workdir` and on its own port `port + p`,
+    the layout of a single `PartitionedEventer`. Peers therefore see the
+    group as one node at `port`. With `ingress_port` every worker listens
+    on that port through SO_REUSEPORT, the kernel spreads producer
+    connections across workers and each forwards events to the worker
+    owning their partition.
+
+    `setup` is called with the `PartitionedEventer` of every worker before
+    it serves, to register callbacks. It must be importable by the
+    workers, like every option.
+    """
+
+    def __init__(
+            self, log_workdir: str, host: str, port: int,
+            nodes: list[tuple[str, int]], partitions: int | None = None,
+            workers: int | None = None, setup: Setup | None = None,
+            **options) -> None:
+        self._workers = workers or os.cpu_count() or 1
+        self._partitions = partitions or self._workers
+        self._args = (log_workdir, host, port, nodes, self._partitions,)
+        self._setup = setup
+        self._options = options
+        self._processes: list[multiprocessing.Process] = []
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        for k in range(self._workers):
+            owned = list(range(k, self._partitions, self._workers))
+            if not owned:
+                break
+
+            process = context.Process(
+                target=_worker, name=f'eventer-worker-{k}',
+                args=(*self._args, owned, self._setup, self._options,))
+            process.start()
+            self._processes.append(process)
+
+    def stop(self, timeout: float = 10.0):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+        self._processes = []
+
+    def run(self):
+        """Run workers until the supervisor is terminated or a worker exits."""
+
+        stopped = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT,):
+            signal.signal(signum, lambda *_: stopped.set())
+
+        self.start()
+        try:
+            while not stopped.wait(1.0):
+                if any(not process.is_alive() for process in self._processes):
+                    break
+
+        finally:
+            self.stop()
+
+
+def _parse_node(value: str) -> tuple[str, int]:
+    host, _, port = value.rpartition(':')
+    return (host, int(port),)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m eventer.supervisor')
+    parser.add_argument('--workdir', required=True)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--node', type=_parse_node, action='append', default=[],
+                        help='peer node as host:port, may be repeated')
+    parser.add_argument('--partitions', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--ingress-port', type=int)
+    parser.add_argument('--setup', type=_load_setup,
+                        help='module:function registering callbacks')
+    args = parser.parse_args()
+
+    Supervisor(
+        args.workdir, args.host, args.port, args.node,
+        partitions=args.partitions, workers=args.workers, setup=args.setup,
+        ingress_port=args.ingress_port).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+from typing import Generic, Hashable, Iterator, TypeVar
+
+import itertools
+
+
+T = TypeVar('T')
+
+SEPARATOR = '.'
+# Matches exactly one segment.
+ANY_SEGMENT = '*'
+# Matches zero or more segments.
+ANY_SEGMENTS = '#'
+
+
+class _Node(Generic[T]):
+
+    __slots__ = ('children', 'subscribers',)
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node[T]] = {}
+        self.subscribers: dict[Hashable, tuple[int, T]] = {}
+
+
+class TopicTrie(Generic[T]):
+    """Subscriptions keyed by dotted topic patterns.
+
+    Event names and patterns are split into segments on `.`. A pattern
+    segment `*` matches one segment of a name and `#` matches zero or more,
+    so `orders.*.created` matches `orders.eu.created` and `orders.#`
+    matches `orders` and everything below it. A pattern without wildcards
+    matches only the same name.
+
+    Matches are cached per name, the cache is dropped whenever a
+    subscription is added or removed.
+    """
+
+    def __init__(self, cache_size: int = 4096) -> None:
+        self._root: _Node[T] = _Node()
+        self._order = itertools.count()
+        self._cache: dict[str, tuple[T, ...]] = {}
+        self._cache_size = cache_size
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[T]:
+        nodes = [self._root]
+        while nodes:
+            node = nodes.pop()
+            for _, value in node.subscribers.values():
+                yield value
+            nodes.extend(node.children.values())
+
+    def add(self, pattern: str, id: Hashable, value: T):
+        node = self._root
+        for segment in pattern.split(SEPARATOR):
+            if segment not in node.children:
+                node.children[segment] = _Node()
+            node = node.children[segment]
+
+        if id not in node.subscribers:
+            self._size += 1
+        node.subscribers[id] = (next(self._order), value,)
+        self._cache.clear()
+
+    def remove(self, pattern: str, id: Hashable) -> T | None:
+        path = [self._root]
+        segments = pattern.split(SEPARATOR)
+        for segment in segments:
+            node = path[-1].children.get(segment)
+            if node is None:
+                return None
+            path.append(node)
+
+        if id not in path[-1].subscribers:
+            return None
+
+        _, value = path[-1].subscribers.pop(id)
+        self._size -= 1
+        self._cache.clear()
+
+        self._prune(path, segments)
+        return value
+
+    def _prune(self, path: list[_Node[T]], segments: list[str]):
+        """Drop the nodes of `path` left without subscribers or children."""
+
+        for i in range(len(segments), 0, -1):
+            node = path[i]
+            if node.subscribers or node.children:
+                break
+            del path[i - 1].children[segments[i - 1]]
+
+    def match(self, name: str) -> tuple[T, ...]:
+        """Values subscribed to patterns matching `name`, in subscription order."""
+
+        if name in self._cache:
+            return self._cache[name]
+
+        found: dict[Hashable, tuple[int, T]] = {}
+        self._collect(self._root, name.split(SEPARATOR), 0, found)
+        values = tuple(value for _, value in sorted(found.values(), key=lambda s: s[0]))
+
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[name] = values
+        return values
+
+    def _collect(
+            self, node: _Node[T], segments: list[str], position: int,
+            found: dict[Hashable, tuple[int, T]]):
+        any_segments = node.children.get(ANY_SEGMENTS)
+        if any_segments is not None:
+            for skip in range(position, len(segments) + 1):
+                self._collect(any_segments, segments, skip, found)
+
+        if position == len(segments):
+            found.update(node.subscribers)
+            return
+
+        for key in (segments[position], ANY_SEGMENT,):
+            child = node.children.get(key)
+            if child is not None:
+                self._collect(child, segments, position + 1, found)
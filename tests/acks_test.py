@@ -0,0 +1,32 @@
+import asyncio
+import unittest
+from eventer.acks import AckTracker
+
+
+class TestAckTracker(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cumulative(self):
+        acks = AckTracker(asyncio.get_running_loop())
+        first = asyncio.create_task(acks.wait(1, timeout=1))
+        second = asyncio.create_task(acks.wait(5, timeout=1))
+        await asyncio.sleep(0)
+
+        # One ack confirms every event before it.
+        acks.ack(5)
+        self.assertTrue(await first)
+        self.assertTrue(await second)
+        self.assertTrue(await acks.wait(3, timeout=0))
+        self.assertEqual(len(acks), 0)
+
+    async def test_stale_ack_and_timeout(self):
+        acks = AckTracker(asyncio.get_running_loop())
+        acks.ack(5)
+        acks.ack(2)
+        self.assertEqual(acks.acked_offset, 5)
+
+        self.assertFalse(await acks.wait(6, timeout=0.01))
+        self.assertEqual(len(acks), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
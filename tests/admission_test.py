@@ -0,0 +1,130 @@
+import asyncio
+import os
+import shutil
+import unittest
+from eventer.admission import Admission, AdmissionControl, Overloaded
+from eventer.eventer import Eventer
+from eventer.messages import Event, MType, NackReason, decode_message
+
+ADMISSION_TEST_DB = 'admission_test_db'
+
+
+class TestAdmissionControl(unittest.IsolatedAsyncioTestCase):
+
+    async def test_block(self):
+        admission = AdmissionControl(
+            asyncio.get_running_loop(), 1, policy=Admission.BLOCK, timeout=0.1)
+        await admission.acquire()
+
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(admission.waiting, 1)
+        admission.release()
+        await waiter
+        self.assertEqual(admission.in_flight, 1)
+
+        with self.assertRaises(Overloaded):
+            await admission.acquire()
+
+        stats = admission.stats()
+        self.assertEqual(stats['admitted'], 2)
+        self.assertEqual(stats['timed_out'], 1)
+        self.assertEqual(stats['waiting'], 0)
+
+    async def test_reject(self):
+        admission = AdmissionControl(
+            asyncio.get_running_loop(), 2, policy=Admission.REJECT)
+        async with admission.admit():
+            async with admission.admit():
+                with self.assertRaises(Overloaded):
+                    await admission.acquire()
+
+        self.assertEqual(admission.in_flight, 0)
+        self.assertEqual(admission.stats()['rejected'], 1)
+
+    async def test_shed_lowest_priority(self):
+        admission = AdmissionControl(
+            asyncio.get_running_loop(), 1, policy=Admission.SHED, queue_size=2)
+        await admission.acquire()
+
+        order = []
+
+        async def acquire(name: str, priority: int):
+            try:
+                await admission.acquire(priority)
+                order.append(name)
+                admission.release()
+            except Overloaded:
+                order.append(f'{name} shed')
+
+        tasks = [asyncio.create_task(acquire('low', 0))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(acquire('mid', 1)))
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(acquire('high', 2)))
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(acquire('lowest', -1)))
+        await asyncio.sleep(0)
+
+        admission.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(sorted(order[:2]), ['low shed', 'lowest shed'])
+        self.assertEqual(order[2:], ['high', 'mid'])
+        self.assertEqual(admission.stats()['shed'], 2)
+
+
+class TestEmitAdmission(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        os.makedirs(ADMISSION_TEST_DB)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(ADMISSION_TEST_DB)
+
+    async def test_emit_limit(self):
+        n = Eventer(log_workdir=ADMISSION_TEST_DB, host='localhost', port=9170,
+                    nodes=[], loop=asyncio.get_running_loop(),
+                    emit_limit=1, emit_policy=Admission.REJECT)
+        await n.serve()
+
+        results = await asyncio.gather(
+            *(n.emit('test', i=i) for i in range(3)), return_exceptions=True)
+        await n.close()
+
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], Overloaded)
+        self.assertEqual(n.emit_stats()['admitted'], 1)
+        self.assertEqual(n.emit_stats()['rejected'], 2)
+        self.assertEqual(n.emit_stats()['in_flight'], 0)
+
+    async def test_forwarded_events(self):
+        loop = asyncio.get_running_loop()
+        n1 = Eventer(log_workdir=ADMISSION_TEST_DB, host='localhost', port=9170,
+                     nodes=[], loop=loop,
+                     emit_limit=1, emit_policy=Admission.REJECT)
+        await n1.serve()
+        os.makedirs(os.path.join(ADMISSION_TEST_DB, 'n2'))
+        n2 = Eventer(log_workdir=os.path.join(ADMISSION_TEST_DB, 'n2'),
+                     host='localhost', port=9171, nodes=[('localhost', 9170,)],
+                     loop=loop)
+        n2._master = ('localhost', 9170,)
+
+        # An emit of the master holds the only slot.
+        await n1._admission.acquire()
+        resp = decode_message(await n1._on_event(events=[Event('test', {'i': 0})]))
+        self.assertEqual(resp.m_type, MType.NACK)
+        self.assertEqual(resp.data.reason, NackReason.OVERLOADED)
+
+        with self.assertRaises(Overloaded):
+            await n2.emit('test', i=1)
+        n1._admission.release()
+
+        await n2.emit('test', i=2)
+        await n2.close()
+        await n1.close()
+        self.assertEqual([e.args['i'] for e in n1._event_log.log], [2])
+        self.assertEqual(n1.emit_stats()['rejected'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
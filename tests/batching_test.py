@@ -0,0 +1,38 @@
+import asyncio
+import unittest
+from eventer.batching import Batcher
+
+
+class TestBatcher(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.batches = []
+
+        async def send(records: list[bytes]) -> bool:
+            self.batches.append(records)
+            return True
+
+        self.send = send
+
+    async def test_coalesce_within_delay(self):
+        b = Batcher(self.send, asyncio.get_running_loop(), max_delay=0.01)
+        results = [b.add([bytes([i])]) for i in range(3)]
+
+        self.assertEqual(await asyncio.gather(*results), [True, True, True])
+        self.assertEqual(self.batches, [[b'\x00', b'\x01', b'\x02']])
+
+    async def test_max_records(self):
+        b = Batcher(self.send, asyncio.get_running_loop(),
+                    max_delay=0.01, max_records=2)
+        results = [b.add([bytes([i])]) for i in range(3)]
+
+        await asyncio.gather(*results)
+        self.assertEqual(self.batches, [[b'\x00', b'\x01'], [b'\x02']])
+
+    async def test_max_bytes(self):
+        b = Batcher(self.send, asyncio.get_running_loop(),
+                    max_delay=0.01, max_bytes=4)
+        results = [b.add([b'abc']) for _ in range(3)]
+
+        await asyncio.gather(*results)
+        self.assertEqual(self.batches, [[b'abc', b'abc'], [b'abc']])
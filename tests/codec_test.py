@@ -0,0 +1,145 @@
+import unittest
+from collections import OrderedDict
+from eventer.codec import BinaryCodec, PickleCodec
+from eventer.compression import CompressedCodec, LzmaCompression, \
+    ZlibCompression, train_dictionary
+from eventer.messages import Args, Event, EventBatch, MType, Message, \
+    NodeInfo, Ping, Sync, decode_message, encode_event, decode_event
+
+
+class TestBinaryCodec(unittest.TestCase):
+
+    def test_values(self):
+        codec = BinaryCodec()
+        values = [
+            None, True, False, 0, -1, 2 ** 70, 1.5, '', 'привет', b'\x00',
+            [1, 'a', [None]], (1, 2,), {'a': {'b': [1.0]}}, [b'a', b'bc'],
+        ]
+        for value in values:
+            self.assertEqual(codec.decode(codec.encode(value)), value)
+            self.assertIs(type(codec.decode(codec.encode(value))), type(value))
+
+    def test_messages(self):
+        codec = BinaryCodec()
+        e = Event('test', OrderedDict(a=1, b='2'))
+        payloads = [
+            e,
+            EventBatch(records=[encode_event(e, codec)], term=3),
+            Ping(next_offset=3, host='localhost', port=9090, term=2),
+            Sync(log=[e], versions={'node_1': [1, 3]}),
+            NodeInfo(is_master=True, term=2),
+        ]
+        for payload in payloads:
+            m = Message('node_1', MType.EVENT, payload)
+            m2 = decode_message(m.encode(codec), codec)
+            self.assertEqual(m2.data, payload)
+
+        e2 = decode_event(encode_event(e, codec), codec)
+        self.assertEqual(e2.timestamp, e.timestamp)
+        self.assertIsInstance(e2.args, Args)
+
+    def test_previous_layout(self):
+        codec = BinaryCodec()
+        e = Event('test', OrderedDict(a=1, b='2'), origin='node_1', counter=2)
+        fields = (e.timestamp, e.name, e.args, e.origin, e.counter, e.seq,)
+        data = bytes((0x0B, 3,)) + b''.join(codec.encode(f) for f in fields)
+        self.assertEqual(codec.decode(data), e)
+
+        records = [codec.encode(e)]
+        data = bytes((0x0B, 11, 0, 0, 0, 1, 0, 0, 0, len(records[0]),)) + records[0]
+        self.assertEqual(codec.decode(data), EventBatch(records=records))
+
+    def test_malformed_input(self):
+        codec = BinaryCodec()
+        data = codec.encode(Event('test', OrderedDict(a=1)))
+        malformed = [
+            b'',
+            data[:-1],
+            data + b'\x00',
+            # An unhashable dict key.
+            bytes((0x0A, 0, 0, 0, 1,)) + codec.encode([1]) + codec.encode(1),
+            # Event arguments that are not a mapping.
+            bytes((0x0B, 3,)) + b''.join(
+                codec.encode(f) for f in (1.0, 'test', 1, '', 0, -1,)),
+        ]
+        for data in malformed:
+            with self.assertRaises(ValueError):
+                codec.decode(data)
+
+    def test_rejects_unknown_types(self):
+        codec = BinaryCodec()
+        with self.assertRaises(TypeError):
+            codec.encode(object())
+
+        # A pickled payload is not executed.
+        with self.assertRaises(ValueError):
+            codec.decode(PickleCodec().encode(Event('test', {})))
+
+    def test_smaller_than_pickle(self):
+        e = Event('test', OrderedDict(a=1, b='2'))
+        m = Message('node_1', MType.EVENT, e)
+
+        self.assertLess(len(m.encode(BinaryCodec())),
+                        len(m.encode(PickleCodec())))
+
+
+class TestCompressedCodec(unittest.TestCase):
+
+    def _event(self, i: int) -> Event:
+        return Event('orders.created',
+                     OrderedDict(order_id=i, user='alice', status='created'))
+
+    def test_round_trip(self):
+        for compression in (ZlibCompression(), LzmaCompression(),):
+            codec = CompressedCodec(BinaryCodec(), compression)
+            sync = Sync(log=[self._event(i) for i in range(20)], versions={})
+            m = Message('node_1', MType.SYNC_RESPONSE, sync)
+            data = m.encode(codec)
+            self.assertEqual(decode_message(data, codec).data, sync)
+            self.assertLess(len(data), len(m.encode(BinaryCodec())))
+            self.assertGreater(codec.saved_bytes, 0)
+
+        # Tiny payloads are not worth compressing.
+        codec = CompressedCodec(BinaryCodec())
+        self.assertEqual(codec.decode(codec.encode(1)), 1)
+        self.assertEqual(codec.saved_bytes, 0)
+
+    def test_bounded_decompression(self):
+        for compression in (ZlibCompression(), LzmaCompression(),):
+            codec = CompressedCodec(BinaryCodec(), compression, max_size=1000)
+            data = codec.encode(b'\x00' * 900)
+            self.assertEqual(codec.decode(data), b'\x00' * 900)
+
+            malformed = [
+                # Expands past `max_size`.
+                CompressedCodec(BinaryCodec(), compression).encode(b'\x00' * 10000),
+                data[:-1],
+                data + b'\x00',
+            ]
+            for data in malformed:
+                with self.assertRaises(ValueError):
+                    codec.decode(data)
+
+    def test_dictionary(self):
+        binary = BinaryCodec()
+        dictionary = train_dictionary(
+            [binary.encode(self._event(i)) for i in range(100)])
+        plain = CompressedCodec(binary)
+        primed = CompressedCodec(binary, ZlibCompression(dictionary=dictionary))
+
+        e = self._event(1000)
+        self.assertEqual(decode_event(encode_event(e, primed), primed), e)
+        self.assertLess(len(encode_event(e, primed)),
+                        len(encode_event(e, plain)))
+        self.assertLess(len(encode_event(e, primed)),
+                        len(encode_event(e, binary)) // 2)
+
+    def test_batches_are_not_recompressed(self):
+        codec = CompressedCodec(BinaryCodec())
+        records = [encode_event(self._event(i), codec) for i in range(20)]
+        saved = codec.saved_bytes
+
+        m = Message('node_1', MType.EVENT_BATCH, EventBatch(records=records))
+        self.assertEqual(decode_message(m.encode(codec), codec).data.records,
+                         records)
+        self.assertEqual(codec.saved_bytes, saved)
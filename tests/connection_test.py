@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+from eventer.connection import ConnectionPool
+from eventer.framing import read_frame, write_frame
+from eventer.messages import Message, MType, decode_message
+
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.connections = 0
+
+        async def handle(reader, writer):
+            self.connections += 1
+            try:
+                while True:
+                    request_id, buffer = await read_frame(reader)
+                    message = decode_message(buffer)
+                    await asyncio.sleep(message.data[1])
+                    write_frame(writer, request_id,
+                                str(message.data[0]).encode())
+                    await writer.drain()
+            except asyncio.IncompleteReadError:
+                writer.close()
+
+        self.server = await asyncio.start_server(handle, 'localhost', 9390)
+
+    async def asyncTearDown(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_multiplexed_requests(self):
+        pool = ConnectionPool(loop=asyncio.get_running_loop())
+
+        async def request(i: int, delay: float):
+            message = Message('node_1', MType.EVENT, (i, delay,))
+            return await pool.request('localhost', 9390, message, timeout=1)
+
+        results = await asyncio.gather(
+            request(1, 0.2), request(2, 0.1), request(3, 0.0))
+
+        self.assertEqual(results, [b'1', b'2', b'3'])
+        self.assertEqual(self.connections, 1, 'Connection is not reused')
+        pool.close()
+
+    async def test_idle_timeout(self):
+        pool = ConnectionPool(loop=asyncio.get_running_loop(),
+                              idle_timeout=0.1)
+        message = Message('node_1', MType.EVENT, (1, 0,))
+        await pool.request('localhost', 9390, message, timeout=1)
+        self.assertTrue(pool.get('localhost', 9390).connected)
+
+        await asyncio.sleep(0.2)
+        self.assertFalse(pool.get('localhost', 9390).connected)
+        pool.close()
+
+    async def test_backoff(self):
+        pool = ConnectionPool(loop=asyncio.get_running_loop(), backoff=10)
+        message = Message('node_1', MType.EVENT, (1, 0,))
+
+        with self.assertRaises(ConnectionRefusedError):
+            await pool.request('localhost', 9391, message, timeout=1)
+
+        with self.assertRaisesRegex(ConnectionRefusedError, 'backing off'):
+            await pool.request('localhost', 9391, message, timeout=1)
+        pool.close()
+
+    async def test_cancelled_connect(self):
+        pool = ConnectionPool(loop=asyncio.get_running_loop())
+        message = Message('node_1', MType.EVENT, (1, 0,))
+
+        async def open_connection(host: str, port: int):
+            await asyncio.sleep(10)
+
+        original = asyncio.open_connection
+        asyncio.open_connection = open_connection
+        try:
+            request = asyncio.create_task(
+                pool.request('localhost', 9390, message, timeout=5))
+            await asyncio.sleep(0.01)
+            send = asyncio.create_task(
+                pool.send('localhost', 9390, message, timeout=5))
+            await asyncio.sleep(0.05)
+            request.cancel()
+
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(send, 1)
+
+            with self.assertRaises(asyncio.TimeoutError):
+                await pool.send('localhost', 9390, message, timeout=0.1)
+
+        finally:
+            asyncio.open_connection = original
+            pool.close()
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+from eventer.dispatch import DEFAULT_TOPIC, Dispatcher, Overflow
+from eventer.messages import Event
+
+
+class TestDispatcher(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.handled = []
+        self.release = asyncio.Event()
+
+        async def handler(event: Event):
+            await self.release.wait()
+            self.handled.append(event.args['i'])
+
+        self.handler = handler
+
+    async def test_dispatch_does_not_wait_for_handler(self):
+        d = Dispatcher(self.handler, asyncio.get_running_loop())
+        for i in range(3):
+            await asyncio.wait_for(d.dispatch(Event('test', {'i': i})), 0.1)
+
+        self.release.set()
+        await d.join()
+        self.assertEqual(self.handled, [0, 1, 2])
+        d.close()
+
+    async def test_ordering_per_key(self):
+        self.release.set()
+        d = Dispatcher(self.handler, asyncio.get_running_loop())
+        d.configure('test', concurrency=4, key=lambda e: e.args['i'] % 2)
+        for i in range(10):
+            await d.dispatch(Event('test', {'i': i}))
+
+        await d.join()
+        self.assertEqual([i for i in self.handled if i % 2 == 0], [0, 2, 4, 6, 8])
+        self.assertEqual([i for i in self.handled if i % 2 == 1], [1, 3, 5, 7, 9])
+        d.close()
+
+    async def test_overflow(self):
+        loop = asyncio.get_running_loop()
+        for overflow, expected in ((Overflow.DROP_NEWEST, [0, 1, 2],),
+                                   (Overflow.DROP_OLDEST, [0, 3, 4],),):
+            self.handled.clear()
+            self.release.clear()
+            d = Dispatcher(self.handler, loop, queue_size=2, overflow=overflow)
+            for i in range(5):
+                await d.dispatch(Event('test', {'i': i}))
+                # Let the worker take the first event.
+                await asyncio.sleep(0)
+
+            self.assertEqual(d.stats()[DEFAULT_TOPIC]['dropped'], 2)
+            self.release.set()
+            await d.join()
+            self.assertEqual(self.handled, expected)
+            d.close()
+
+    async def test_block(self):
+        d = Dispatcher(self.handler, asyncio.get_running_loop(), queue_size=1)
+        await d.dispatch(Event('test', {'i': 0}))
+        await asyncio.sleep(0)
+        await d.dispatch(Event('test', {'i': 1}))
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(d.dispatch(Event('test', {'i': 2})), 0.05)
+        d.close()
+
+    async def test_topics_are_bounded(self):
+        self.release.set()
+        d = Dispatcher(self.handler, asyncio.get_running_loop())
+        d.configure('orders.#', concurrency=2)
+        d.configure('orders.created')
+        for i in range(100):
+            await d.dispatch(Event(f'test_{i}', {'i': i}))
+            await d.dispatch(Event(f'orders.{i}', {'i': i}))
+        await d.dispatch(Event('orders.created', {'i': 100}))
+
+        await d.join()
+        self.assertEqual(len(self.handled), 201)
+        self.assertEqual(set(d.stats()), {DEFAULT_TOPIC, 'orders.#', 'orders.created'})
+        self.assertEqual(d.topic_of('orders.eu.created'), 'orders.#')
+        d.close()
@@ -1,14 +1,20 @@
 
 import os
+import errno
 import shutil
+import time
+import asyncio
 import unittest
-from eventer.event_log import EventLog
+from eventer.codec import PickleCodec
+from eventer.event_log import Durability, EventLog
 from eventer.messages import Event
 
 TEST_APPEND_WORKDIR = 'test_appen'
 TEST_GET_AFTER_WORKDIR = 'test_get_after'
 TEST_STORE_RESTORE_WORKDIR = 'test_store_restore'
 TEST_MAX_SIZE_WORKDIR = 'test_max_size'
+TEST_SEGMENTS_WORKDIR = 'test_segments'
+TEST_GROUP_COMMIT_WORKDIR = 'test_group_commit'
 
 
 def _clear_log_db_files():
@@ -24,6 +30,12 @@ def _clear_log_db_files():
     if os.path.exists(TEST_MAX_SIZE_WORKDIR):
         shutil.rmtree(TEST_MAX_SIZE_WORKDIR)
 
+    if os.path.exists(TEST_SEGMENTS_WORKDIR):
+        shutil.rmtree(TEST_SEGMENTS_WORKDIR)
+
+    if os.path.exists(TEST_GROUP_COMMIT_WORKDIR):
+        shutil.rmtree(TEST_GROUP_COMMIT_WORKDIR)
+
 
 class TestEventLog(unittest.TestCase):
 
@@ -33,6 +45,7 @@ class TestEventLog(unittest.TestCase):
         os.makedirs(TEST_GET_AFTER_WORKDIR)
         os.makedirs(TEST_STORE_RESTORE_WORKDIR)
         os.makedirs(TEST_MAX_SIZE_WORKDIR)
+        os.makedirs(TEST_SEGMENTS_WORKDIR)
         return super().setUp()
 
     def tearDown(self) -> None:
@@ -42,13 +55,41 @@ class TestEventLog(unittest.TestCase):
     def test_append(self):
         e = Event('test', {'foo': 'data'})
         el = EventLog(TEST_APPEND_WORKDIR, 10)
-        ok = el.append('node_1', event=e)
+        ok = el.append(event=e)
         self.assertTrue(ok, 'Append result not ok')
 
+    def test_deduplicate(self):
+        el = EventLog(TEST_APPEND_WORKDIR, 10)
+        e1 = Event('test', {'foo': 'data'}, origin='node_1', counter=1)
+        e2 = Event('test', {'foo': 'data'}, origin='node_1', counter=2)
+        e3 = Event('test', {'foo': 'data'}, origin='node_2', counter=1)
+
+        self.assertEqual(el.append_batch([e2, e1, e3]), [e2, e1, e3])
+        self.assertEqual([e.seq for e in (e2, e1, e3,)], [0, 1, 2])
+        self.assertFalse(el.append(Event('test', {}, origin='node_1', counter=1)))
+        self.assertFalse(el.append(Event('test', {}, origin='node_1', counter=2)))
+        self.assertTrue(el.append(Event('test', {}, origin='node_1', counter=3)))
+
+    def test_extend(self):
+        el = EventLog(TEST_APPEND_WORKDIR, 10)
+        events = [Event('test', {'i': i}) for i in range(4)]
+        for i, e in enumerate(events):
+            e.seq = i
+
+        self.assertEqual(el.extend(events[:2]), events[:2])
+        self.assertEqual(el.extend(events[1:3]), events[2:3], 'Duplicate applied')
+        self.assertEqual(el.extend(events[3:]), events[3:])
+        self.assertEqual(el.extend([Event('test', {})]), [])
+
+        gap = Event('test', {})
+        gap.seq = 10
+        self.assertEqual(el.extend([gap]), [], 'Gap applied')
+        self.assertEqual(el.next_offset, 4)
+
     def test_store_restore(self):
         e = Event('test', {'foo': 'data'})
         el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
-        el.append('node_1', event=e)
+        el.append(event=e)
 
         del el
 
@@ -56,13 +97,274 @@ class TestEventLog(unittest.TestCase):
         self.assertEqual(e.name, el.pick.name, 'dosn\'t restore event')
         self.assertEqual(e.args, el.pick.args, 'dosn\'t restore event')
 
+    def test_restore_at_offset(self):
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        el.append(event=Event('test', {'i': 0}))
+        el.restore(versions={'node_2': [3]},
+                   log=[Event('test', {'i': 10}), Event('test', {'i': 11})],
+                   offset=10)
+        el.close()
+
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        self.assertEqual(el.first_offset, 10)
+        self.assertEqual([e.args['i'] for e in el.read(11)], [11])
+        self.assertEqual(el.versions, {'node_2': [3]})
+
     def test_max_size(self):
         e1 = Event('test', {'foo': 'data'})
         e2 = Event('test', {'foo': 'data'})
         e3 = Event('test', {'foo': 'data'})
         el = EventLog(TEST_MAX_SIZE_WORKDIR, 2)
-        el.append('node_1', event=e1)
-        el.append('node_1', event=e2)
-        el.append('node_1', event=e3)
+        el.append(event=e1)
+        el.append(event=e2)
+        el.append(event=e3)
+
+        self.assertEqual(len(el.log), 2, 'Wrong size of log')
+
+    def test_large_event(self):
+        e = Event('test', {'foo': 'x' * 100_000})
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        el.append(event=e)
+        el.close()
+
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        self.assertEqual(e.args, el.pick.args, 'dosn\'t restore event')
+
+    def test_torn_record(self):
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        el.append(event=Event('test', {'i': 1}))
+        el.append(event=Event('test', {'i': 2}))
+        el.close()
+
+        segment = os.path.join(TEST_STORE_RESTORE_WORKDIR, f'{0:020d}.log')
+        os.truncate(segment, os.path.getsize(segment) - 1)
+
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        self.assertEqual([e.args['i'] for e in el.log], [1])
+        el.append(event=Event('test', {'i': 3}))
+        el.close()
+
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        self.assertEqual([e.args['i'] for e in el.log], [1, 3])
+
+    def test_load_error(self):
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10, codec=PickleCodec())
+        el.append(event=Event('test', {'i': 1}))
+        el.close()
+
+        with self.assertRaises(Exception):
+            EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10, codec=PickleCodec())
+        self.assertEqual([e.args['i'] for e in el.log], [1], 'The log is kept')
+
+    def test_epochs(self):
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        el.append_encoded([Event('test', {'i': 0})], term=1)
+        el.append_encoded([Event('test', {'i': 1}), Event('test', {'i': 2})], term=3)
+        event = Event('test', {'i': 3})
+        event.seq = 3
+        el.extend([event], epochs=[(3, 0,)])
+        self.assertEqual(el.epochs(), [(1, 0,), (3, 1,)])
+        self.assertEqual(el.epochs(2), [(3, 1,)])
+        el.close()
+
+        el = EventLog(TEST_STORE_RESTORE_WORKDIR, 10)
+        self.assertEqual(el.term, 3)
+        self.assertTrue(el.matches(1, 1))
+        self.assertTrue(el.matches(3, 4))
+        # Events of a term this log never had, or past its end, diverged.
+        self.assertFalse(el.matches(1, 2))
+        self.assertFalse(el.matches(2, 2))
+        self.assertFalse(el.matches(3, 5))
+
+    def test_segments(self):
+        el = EventLog(TEST_SEGMENTS_WORKDIR, 3, segment_size=2,
+                      checkpoint_interval=4)
+        for i in range(7):
+            el.append(event=Event('test', {'i': i},
+                                  origin=f'node_{i}', counter=1))
+
+        segments = sorted(f for f in os.listdir(TEST_SEGMENTS_WORKDIR)
+                          if f.endswith('.log'))
+        self.assertEqual(len(segments), 2, 'Oldest segments not dropped')
+        self.assertEqual(el.first_offset, 4)
+        self.assertEqual(el.next_offset, 7)
+
+        el.close()
+        del el
+
+        el = EventLog(TEST_SEGMENTS_WORKDIR, 3, segment_size=2,
+                      checkpoint_interval=4)
+        self.assertEqual(el.next_offset, 7)
+        self.assertEqual([e.args['i'] for e in el.log], [4, 5, 6])
+        self.assertEqual(len(el.versions), 7, 'Versions not replayed')
+
+    def test_lazy_read(self):
+        el = EventLog(TEST_SEGMENTS_WORKDIR, 20, segment_size=4,
+                      cache_size=2, index_interval=2)
+        for i in range(10):
+            el.append(event=Event('test', {'i': i}))
+        self.assertEqual(len(el._tail), 2)
+        self.assertEqual(el.get(3).args['i'], 3)
+        self.assertEqual([e.args['i'] for e in el.read(6, 3)], [6, 7, 8])
+        el.close()
+
+        el = EventLog(TEST_SEGMENTS_WORKDIR, 20, segment_size=4,
+                      cache_size=2, index_interval=2)
+        self.assertEqual(len(el._tail), 0)
+        self.assertEqual([e.seq for e in el.log], list(range(10)))
+        self.assertEqual(el.pick.args['i'], 9)
+
+    def test_compaction(self):
+        def _open():
+            return EventLog(TEST_SEGMENTS_WORKDIR, 3, segment_size=2,
+                            compaction_keys={'set': 'k'}, snapshot_interval=4)
+
+        el = _open()
+        for i, k in enumerate('abacbd'):
+            el.append(event=Event('set', {'k': k, 'v': i}))
+        el.append(event=Event('other', {'k': 'a'}))
+
+        self.assertEqual(el.first_offset, 4)
+        self.assertEqual([e.args['v'] for e in el.compacted(el.first_offset)], [2, 3])
+        self.assertEqual(len(el.compacted()), 4)
+        el.close()
+
+        el = _open()
+        self.assertEqual([e.args['v'] for e in el.compacted()], [2, 3, 4, 5])
+
+        el.restore(versions={}, log=el.read(4), offset=4,
+                   compacted=el.compacted(4))
+        el.close()
+
+        el = _open()
+        self.assertEqual([e.args['v'] for e in el.compacted()], [2, 3, 4, 5])
+        self.assertEqual(el.first_offset, 4)
+
+    def test_unhashable_compaction_key(self):
+        el = EventLog(TEST_SEGMENTS_WORKDIR, 3, compaction_keys={'set': 'k'})
+        event = Event('set', {'k': ['a'], 'v': 1}, origin='n', counter=1)
+        with self.assertRaises(ValueError):
+            el.append(event=event)
+        self.assertEqual(el.next_offset, 0, 'The event is rejected')
+
+        # The rejected event is not taken for a duplicate.
+        event = Event('set', {'k': 'a', 'v': 1}, origin='n', counter=1)
+        self.assertTrue(el.append(event=event))
+        self.assertEqual([e.args['v'] for e in el.compacted()], [1])
+
+    def test_incremental_snapshot(self):
+        def _open(limit: int = 100):
+            return EventLog(TEST_SEGMENTS_WORKDIR, 3, segment_size=2,
+                            compaction_keys={'set': 'k'}, snapshot_interval=2,
+                            compaction_limit=limit)
+
+        el = _open()
+        rewrites = []
+        replace_file = el._replace_file
+
+        def count_rewrites(filepath: str, data: bytes):
+            if filepath.endswith('snapshot'):
+                rewrites.append(filepath)
+            replace_file(filepath, data)
+
+        el._replace_file = count_rewrites
+        for i, k in enumerate('abcdefgh'):
+            el.append(event=Event('set', {'k': k, 'v': i}))
+        self.assertEqual(len(rewrites), 0, 'New keys are appended')
+
+        # Once the deltas outgrow the snapshot it is rewritten.
+        for i, k in enumerate('abcd', start=8):
+            el.append(event=Event('set', {'k': k, 'v': i}))
+        self.assertEqual(len(rewrites), 1)
+        el.close()
+
+        # A torn append is cut on load.
+        with open(os.path.join(TEST_SEGMENTS_WORKDIR, 'snapshot.delta'), 'ab') as fp:
+            fp.write(b'\x00\x00\x01')
+
+        el = _open()
+        self.assertEqual([e.args['v'] for e in el.compacted()],
+                         [4, 5, 6, 7, 8, 9, 10, 11])
+        el.append(event=Event('set', {'k': 'e', 'v': 12}))
+        el.append(event=Event('set', {'k': 'i', 'v': 13}))
+        el.close()
+
+        # Beyond the limit the least recently updated keys are dropped.
+        el = _open(limit=4)
+        self.assertEqual([e.args['k'] for e in el.compacted()], ['c', 'd', 'e', 'i'])
+        el.append(event=Event('set', {'k': 'c', 'v': 14}))
+        el.append(event=Event('set', {'k': 'j', 'v': 15}))
+        el.close()
+
+        el = _open(limit=4)
+        self.assertEqual([e.args['k'] for e in el.compacted()], ['e', 'i', 'c', 'j'])
+
+class TestEventLogWriter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        _clear_log_db_files()
+        os.makedirs(TEST_GROUP_COMMIT_WORKDIR)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        _clear_log_db_files()
+        return super().tearDown()
+
+    async def test_group_commit(self):
+        el = EventLog(TEST_GROUP_COMMIT_WORKDIR, 10,
+                      durability=Durability.GROUP, group_size=3)
+        el.start()
+
+        for i in range(5):
+            el.append(event=Event('test', {'i': i},
+                                  origin=f'node_{i}', counter=1))
+        self.assertEqual(el.flushed_offset, 0, 'Append blocked on disk')
+
+        await el.flush()
+        self.assertEqual(el.flushed_offset, 5)
+        await el.stop()
+
+        el = EventLog(TEST_GROUP_COMMIT_WORKDIR, 10)
+        self.assertEqual([e.args['i'] for e in el.log], [0, 1, 2, 3, 4])
+
+    async def test_failed_commit(self):
+        el = EventLog(TEST_GROUP_COMMIT_WORKDIR, 10)
+        el.start()
+
+        def write(records: list[bytes]):
+            raise OSError(errno.ENOSPC, 'No space left on device')
+
+        el._write = write
+        el.append(event=Event('test', {'i': 0}))
+        with self.assertRaises(OSError):
+            await el.flush()
+
+        del el._write
+        el.append(event=Event('test', {'i': 1}))
+        with self.assertRaises(OSError):
+            await asyncio.wait_for(el.flush(), 1)
+        await el.stop()
+
+        el = EventLog(TEST_GROUP_COMMIT_WORKDIR, 10)
+        self.assertEqual(el.next_offset, 0, 'Records written past a failed batch')
+
+    async def test_restore_during_commit(self):
+        el = EventLog(TEST_GROUP_COMMIT_WORKDIR, 10)
+        el.start()
+        write = el._write
+
+        def slow_write(records: list[bytes]):
+            time.sleep(0.2)
+            write(records)
+
+        el._write = slow_write
+        el.append(event=Event('test', {'i': 0}))
+        await asyncio.sleep(0.05)
+        el.restore(versions={}, log=[Event('test', {'i': 10})], offset=10)
+        await el.flush()
+        await el.stop()
 
-        self.assertEqual(len(el._log), 2, 'Wrong size of log')
+        el = EventLog(TEST_GROUP_COMMIT_WORKDIR, 10)
+        self.assertEqual([(e.seq, e.args['i']) for e in el.log], [(10, 10)])
@@ -3,7 +3,10 @@ import os
 import unittest
 import shutil
 import asyncio
+from eventer.connection import ConnectionPool
 from eventer.eventer import Eventer
+from eventer.messages import Message, MType
+from eventer.metrics import Metrics
 
 ONE_NODE_TEST_DB = 'test_db'
 TWO_NODE_TEST_DB_N1 = 'two_node_test_db_n1'
@@ -16,6 +19,7 @@ THREE_NODE_TEST_DB_N3 = 'three_node_test_db_n3'
 class TestEventer(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self) -> None:
+        self.nodes: list[Eventer] = []
         os.makedirs(ONE_NODE_TEST_DB)
         os.makedirs(TWO_NODE_TEST_DB_N1)
         os.makedirs(TWO_NODE_TEST_DB_N2)
@@ -24,6 +28,10 @@ class TestEventer(unittest.IsolatedAsyncioTestCase):
         os.makedirs(THREE_NODE_TEST_DB_N3)
         return super().setUp()
 
+    async def asyncTearDown(self) -> None:
+        for n in self.nodes:
+            await n.close()
+
     def tearDown(self) -> None:
         shutil.rmtree(ONE_NODE_TEST_DB)
         shutil.rmtree(TWO_NODE_TEST_DB_N1)
@@ -38,6 +46,7 @@ class TestEventer(unittest.IsolatedAsyncioTestCase):
 
         n = Eventer(log_workdir=ONE_NODE_TEST_DB,
                     host='localhost', port=9090, nodes=[], loop=loop)
+        self.nodes.append(n)
         await n.serve()
 
         a = 'Hello'
@@ -55,6 +64,28 @@ class TestEventer(unittest.IsolatedAsyncioTestCase):
         await result
         self.assertEqual(check_result, result.result())
 
+    async def test_response_metrics(self):
+        loop = asyncio.get_running_loop()
+
+        n = Eventer(log_workdir=ONE_NODE_TEST_DB,
+                    host='localhost', port=9091, nodes=[], loop=loop)
+        self.nodes.append(n)
+        await n.serve()
+
+        metrics = Metrics()
+        pool = ConnectionPool(loop=loop, metrics=metrics)
+        message = Message('node_1', MType.NODE_INFO, None)
+        await pool.request('localhost', 9091, message, timeout=1)
+        pool.close()
+
+        # Responses are counted by the node and by the requesting peer.
+        sent = n.metrics.counter('eventer_messages_out_total', type='NODE_INFO_RESPONSE')
+        received = metrics.counter('eventer_messages_in_total', type='NODE_INFO_RESPONSE')
+        self.assertEqual(sent.value, 1)
+        self.assertEqual(received.value, 1)
+        self.assertGreater(
+            metrics.counter('eventer_bytes_in_total', type='NODE_INFO_RESPONSE').value, 0)
+
     async def test_two_node(self):
         loop = asyncio.get_running_loop()
 
@@ -65,6 +96,7 @@ class TestEventer(unittest.IsolatedAsyncioTestCase):
                      host='localhost', port=9191,
                      nodes=[('localhost', 9190,),], loop=loop)
 
+        self.nodes.extend((n1, n2,))
         await n1.serve()
         await n2.serve()
 
@@ -98,6 +130,7 @@ class TestEventer(unittest.IsolatedAsyncioTestCase):
                      host='localhost', port=9292,
                      nodes=[('localhost', 9290,), ('localhost', 9291,),], loop=loop)
 
+        self.nodes.extend((n1, n2, n3,))
         await n1.serve()
         await n2.serve()
         await n3.serve()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from eventer.executors import PooledHandler
+
+
+def square(i: int, results: list):
+    results.append((i * i, threading.get_ident(),))
+
+
+def cube(i: int, path: str):
+    with open(path, 'a') as fp:
+        fp.write(f'{i ** 3} {os.getpid()}\n')
+
+
+class TestPooledHandler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_runs_off_loop_in_batches(self):
+        loop = asyncio.get_running_loop()
+        batches = []
+
+        def handler(i: int, results: list):
+            square(i, results)
+
+        with ThreadPoolExecutor(1) as executor:
+            h = PooledHandler(handler, executor, loop, batch_size=4)
+            original = loop.run_in_executor
+
+            def run_in_executor(executor, fn, *args):
+                batches.append(len(args[1]))
+                return original(executor, fn, *args)
+
+            loop.run_in_executor = run_in_executor
+            results = []
+            try:
+                for i in range(10):
+                    await h(i=i, results=results)
+                await h.join()
+            finally:
+                del loop.run_in_executor
+                h.close()
+
+        self.assertEqual([r for r, _ in results], [i * i for i in range(10)])
+        self.assertNotIn(threading.get_ident(), {t for _, t in results})
+        self.assertEqual(sum(batches), 10)
+        self.assertTrue(all(size <= 4 for size in batches))
+        self.assertLess(len(batches), 10)
+
+    async def test_errors_reach_exception_handler(self):
+        loop = asyncio.get_running_loop()
+        errors = []
+        loop.set_exception_handler(lambda _, context: errors.append(context))
+
+        def handler(i: int):
+            if i == 1:
+                raise ValueError(i)
+
+        with ThreadPoolExecutor(1) as executor:
+            h = PooledHandler(handler, executor, loop)
+            for i in range(3):
+                await h(i=i)
+            await h.join()
+            h.close()
+
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0]['exception'], ValueError)
+
+    async def test_process_pool(self):
+        loop = asyncio.get_running_loop()
+        errors = []
+        loop.set_exception_handler(lambda _, context: errors.append(context))
+
+        with tempfile.TemporaryDirectory() as workdir, \
+                ProcessPoolExecutor(1) as executor:
+            path = os.path.join(workdir, 'results')
+            h = PooledHandler(cube, executor, loop)
+            for i in range(5):
+                await h(i=i, path=path)
+            await asyncio.wait_for(h.join(), 10)
+            h.close()
+
+            with open(path) as fp:
+                results = [line.split() for line in fp]
+
+        self.assertEqual(errors, [])
+        self.assertEqual([int(r) for r, _ in results], [i ** 3 for i in range(5)])
+        self.assertNotIn(str(os.getpid()), {pid for _, pid in results})
+
+if __name__ == '__main__':
+    unittest.main()
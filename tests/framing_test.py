@@ -0,0 +1,11 @@
+import unittest
+from eventer.framing import RECORD_HEADER, FrameError, encode_record
+
+
+class TestFraming(unittest.TestCase):
+
+    def test_encode_record(self):
+        self.assertEqual(encode_record(b'foo'), RECORD_HEADER.pack(3) + b'foo')
+
+        with self.assertRaises(FrameError):
+            encode_record(b'foo', max_size=2)
@@ -0,0 +1,49 @@
+import unittest
+from eventer.idempotency import IdempotencyIndex
+
+
+class TestIdempotencyIndex(unittest.TestCase):
+
+    def test_out_of_order(self):
+        index = IdempotencyIndex()
+        for counter in (1, 3, 4):
+            index.add('a', counter)
+
+        self.assertTrue(index.seen('a', 1))
+        self.assertFalse(index.seen('a', 2))
+        self.assertTrue(index.seen('a', 4))
+        self.assertFalse(index.seen('b', 1))
+        self.assertEqual(index.state(), {'a': [1, 3, 4]})
+
+        index.add('a', 2)
+        self.assertEqual(index.state(), {'a': [4]})
+
+    def test_window(self):
+        index = IdempotencyIndex(window=2)
+        for counter in (2, 4, 6):
+            index.add('a', counter)
+
+        # Counters that fell out of the window are treated as seen.
+        self.assertTrue(index.seen('a', 3))
+        self.assertFalse(index.seen('a', 5))
+
+    def test_max_origins(self):
+        index = IdempotencyIndex(max_origins=2)
+        index.add('a', 1)
+        index.add('b', 1)
+        index.add('a', 2)
+        index.add('c', 1)
+
+        self.assertEqual(len(index), 2)
+        self.assertFalse(index.seen('b', 1), 'Least recent origin kept')
+        self.assertTrue(index.seen('a', 2))
+
+    def test_restore(self):
+        index = IdempotencyIndex()
+        index.add('a', 1)
+        index.add('a', 3)
+
+        restored = IdempotencyIndex()
+        restored.restore(index.state())
+        self.assertTrue(restored.seen('a', 3))
+        self.assertFalse(restored.seen('a', 2))
@@ -12,10 +12,15 @@ LAG_TEST_DB_N2 = 'lag_test_db_n2'
 class TestLag(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self) -> None:
+        self.nodes: list[Eventer] = []
         os.makedirs(LAG_TEST_DB_N1)
         os.makedirs(LAG_TEST_DB_N2)
         return super().setUp()
 
+    async def asyncTearDown(self) -> None:
+        for n in self.nodes:
+            await n.close()
+
     def tearDown(self) -> None:
         shutil.rmtree(LAG_TEST_DB_N1)
         shutil.rmtree(LAG_TEST_DB_N2)
@@ -24,18 +29,27 @@ class TestLag(unittest.IsolatedAsyncioTestCase):
     async def test_lag(self):
         loop = asyncio.get_running_loop()
 
-        n1 = Eventer(log_workdir=LAG_TEST_DB_N1,
-                     host='localhost', port=9190,
-                     nodes=[('localhost', 9191,),], loop=loop)
-        n2 = Eventer(log_workdir=LAG_TEST_DB_N2,
-                     host='localhost', port=9191,
-                     nodes=[('localhost', 9190,),], loop=loop)
+        def node(workdir: str, port: int, peer: int) -> Eventer:
+            n = Eventer(log_workdir=workdir,
+                        host='localhost', port=port,
+                        nodes=[('localhost', peer,),], loop=loop,
+                        preferred_master=('localhost', 9190,))
+            self.nodes.append(n)
+            return n
 
+        n1 = node(LAG_TEST_DB_N1, 9190, 9191)
+        n2 = node(LAG_TEST_DB_N2, 9191, 9190)
         await n1.serve()
+        await n2.serve()
+        await asyncio.sleep(3)
+        self.assertTrue(n1.is_master)
 
+        # n2 goes down and misses the event, it is synced once back.
+        await n2.close()
         d = 'Hello World'
         await n1.emit('test_event', d=d)
 
+        n2 = node(LAG_TEST_DB_N2, 9191, 9190)
         await n2.serve()
         await asyncio.sleep(3)
 
@@ -0,0 +1,261 @@
+import os
+import shutil
+import asyncio
+import unittest
+from collections import OrderedDict
+from eventer.eventer import AckPolicy, Eventer, NoMaster
+from eventer.messages import Event, MType, NackReason, decode_message
+
+LEADERSHIP_TEST_DB_N1 = 'leadership_test_db_n1'
+LEADERSHIP_TEST_DB_N2 = 'leadership_test_db_n2'
+LEADERSHIP_TEST_DB_N3 = 'leadership_test_db_n3'
+
+
+class TestLeadership(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        os.makedirs(LEADERSHIP_TEST_DB_N1)
+        os.makedirs(LEADERSHIP_TEST_DB_N2)
+        os.makedirs(LEADERSHIP_TEST_DB_N3)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(LEADERSHIP_TEST_DB_N1)
+        shutil.rmtree(LEADERSHIP_TEST_DB_N2)
+        shutil.rmtree(LEADERSHIP_TEST_DB_N3)
+
+    async def test_stable_lease_and_failover(self):
+        loop = asyncio.get_running_loop()
+        addresses = [('localhost', 9990,), ('localhost', 9991,), ('localhost', 9993,)]
+        workdirs = [LEADERSHIP_TEST_DB_N1, LEADERSHIP_TEST_DB_N2, LEADERSHIP_TEST_DB_N3]
+        nodes = [
+            Eventer(log_workdir=workdir, host=host, port=port,
+                    nodes=[a for a in addresses if a != (host, port,)],
+                    loop=loop, lease_timeout=0.3)
+            for workdir, (host, port) in zip(workdirs, addresses)]
+
+        n1 = nodes[0]
+        await n1.serve()
+        # Alone, n1 has no quorum to elect itself.
+        await asyncio.sleep(0.5)
+        self.assertIsNone(n1.master)
+
+        for n in nodes[1:]:
+            await n.serve()
+        await asyncio.sleep(1)
+        master = nodes[0].master
+        self.assertIsNotNone(master)
+        term = nodes[0]._term
+
+        # Heartbeats keep the lease, nobody stands for election.
+        await asyncio.sleep(1)
+        for n in nodes:
+            self.assertEqual(n._term, term)
+            self.assertEqual(n.master, master)
+
+        # Emits never wait for the lease watch.
+        follower = next(n for n in nodes if (n._host, n._port,) != master)
+        started = loop.time()
+        await follower.emit('test_event', a=1)
+        self.assertLess(loop.time() - started, 0.2)
+
+        # The others still make a quorum and elect a new master.
+        leader = next(n for n in nodes if (n._host, n._port,) == master)
+        await leader.close()
+        await asyncio.sleep(1.5)
+        rest = [n for n in nodes if n is not leader]
+        self.assertIsNotNone(rest[0].master)
+        self.assertNotEqual(rest[0].master, master)
+        self.assertEqual(rest[0].master, rest[1].master)
+        self.assertGreater(rest[0]._term, term)
+        for n in rest:
+            await n.close()
+
+    async def test_master_without_quorum_steps_down(self):
+        loop = asyncio.get_running_loop()
+        n = Eventer(log_workdir=LEADERSHIP_TEST_DB_N1,
+                    host='localhost', port=9990,
+                    nodes=[('localhost', 9992,), ('localhost', 9994,),],
+                    loop=loop, lease_timeout=0.3)
+        n._event_log.start(loop)
+
+        # Both peers are down, no votes make no quorum.
+        await n._elect()
+        self.assertIsNone(n.master)
+
+        # A master whose heartbeats go unanswered loses its lease.
+        n._contacted[('localhost', 9992,)] = loop.time()
+        n._set_master(('localhost', 9990,))
+        await n._heartbeat()
+        self.assertTrue(n.is_master)
+        await asyncio.sleep(0.3)
+        await n._heartbeat()
+        self.assertFalse(n.is_master)
+        await n.close()
+
+    async def test_lost_election_without_refusals(self):
+        loop = asyncio.get_running_loop()
+        n = Eventer(log_workdir=LEADERSHIP_TEST_DB_N1,
+                    host='localhost', port=9990,
+                    nodes=[('localhost', 9992,),], loop=loop,
+                    lease_timeout=0.3)
+
+        request_vote = n._request_vote
+
+        async def master_appears(host, port, message):
+            # A master appeared while votes were requested.
+            n._set_master(('localhost', 9992,))
+            n._renew_lease()
+            return await request_vote(host, port, message)
+
+        n._request_vote = master_appears
+        await n._elect()
+        self.assertEqual(n._term, 0)
+        self.assertEqual(n._master, ('localhost', 9992,))
+        await n.close()
+
+    async def test_lease_watch_survives_errors(self):
+        loop = asyncio.get_running_loop()
+        errors = []
+        loop.set_exception_handler(lambda _, context: errors.append(context))
+        n = Eventer(log_workdir=LEADERSHIP_TEST_DB_N1,
+                    host='localhost', port=9990, nodes=[], loop=loop,
+                    lease_timeout=0.3)
+        elect = n._elect
+
+        async def failing_elect():
+            n._elect = elect
+            raise OSError('test')
+
+        n._elect = failing_elect
+        n._lease_task = loop.create_task(n._watch_lease())
+        await asyncio.sleep(0.5)
+
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0]['exception'], OSError)
+        self.assertEqual(n.master, ('localhost', 9990,))
+        await n.close()
+
+    async def test_emit_waits_for_master(self):
+        loop = asyncio.get_running_loop()
+        n = Eventer(log_workdir=LEADERSHIP_TEST_DB_N1,
+                    host='localhost', port=9990,
+                    nodes=[('localhost', 9992,),], loop=loop,
+                    ack_policy=AckPolicy.NONE, master_timeout=0.1)
+        n._event_log.start(loop)
+        self.assertFalse(n.is_master)
+
+        with self.assertRaises(NoMaster):
+            await n.emit('test_event', a=1)
+        self.assertEqual(n._event_log.next_offset, 0)
+
+        emit = loop.create_task(n.emit('test_event', a=1))
+        await asyncio.sleep(0.05)
+        n._contacted[('localhost', 9992,)] = loop.time()
+        n._set_master(('localhost', 9990,))
+        await emit
+        self.assertEqual(n._event_log.next_offset, 1)
+        await n.close()
+
+    async def test_stale_term_batch(self):
+        loop = asyncio.get_running_loop()
+        n = Eventer(log_workdir=LEADERSHIP_TEST_DB_N1,
+                    host='localhost', port=9990,
+                    nodes=[('localhost', 9992,),], loop=loop)
+        n._event_log.start(loop)
+        n._term = 2
+        n._synced_term = 2
+        event = Event('test_event', OrderedDict(a=1))
+        event.seq = 0
+
+        resp = decode_message(await n._on_event(events=[event], term=1))
+        self.assertEqual(resp.m_type, MType.NACK)
+        self.assertEqual(resp.data.reason, NackReason.STALE_TERM)
+        self.assertEqual(resp.data.term, 2, 'The deposed master learns the term')
+        self.assertEqual(n._event_log.next_offset, 0)
+
+        resp = decode_message(await n._on_event(events=[event], term=2))
+        self.assertEqual(resp.m_type, MType.ACK)
+        self.assertEqual(n._event_log.next_offset, 1)
+        await n.close()
+
+    async def test_newer_master_batch(self):
+        loop = asyncio.get_running_loop()
+        newer = ('localhost', 9992,)
+        n = Eventer(log_workdir=LEADERSHIP_TEST_DB_N1,
+                    host='localhost', port=9990, nodes=[newer], loop=loop)
+        n._event_log.start(loop)
+        n._term = 2
+        n._contacted[newer] = loop.time()
+        n._set_master(('localhost', 9990,))
+        event = Event('test_event', OrderedDict(a=1))
+        event.seq = 0
+
+        # A master does not take sequenced events of its own term.
+        resp = decode_message(
+            await n._on_event(events=[event], term=2, sender=newer))
+        self.assertEqual(resp.m_type, MType.NACK)
+        self.assertTrue(n.is_master)
+
+        # A newer master is followed, its events wait for the log check.
+        synced = []
+        n._resync = lambda: synced.append(n._term)
+        resp = decode_message(
+            await n._on_event(events=[event], term=3, sender=newer))
+        self.assertEqual(resp.m_type, MType.ACK)
+        self.assertEqual(n.master, newer)
+        self.assertEqual(n._term, 3)
+        self.assertEqual(synced, [3])
+        self.assertEqual(n._event_log.next_offset, 0)
+        await n.close()
+
+    async def test_hand_over_drains_writes(self):
+        loop = asyncio.get_running_loop()
+        preferred = ('localhost', 9992,)
+        n = Eventer(log_workdir=LEADERSHIP_TEST_DB_N1,
+                    host='localhost', port=9990, nodes=[preferred], loop=loop,
+                    ack_policy=AckPolicy.NONE, lease_timeout=0.3,
+                    preferred_master=preferred)
+        n._event_log.start(loop)
+        n._contacted[preferred] = loop.time()
+        n._set_master(('localhost', 9990,))
+        await n.emit('test_event', a=1)
+
+        def heartbeat(granted: set[tuple[str, int]]) -> bool:
+            # The preferred master answers, renewing the master's lease.
+            n._contacted[preferred] = loop.time()
+            return n._hand_over(granted)
+
+        # The preferred master is alive but behind, writes are held back.
+        self.assertFalse(heartbeat(set()))
+        emit = loop.create_task(n.emit('test_event', a=2))
+        await asyncio.sleep(0.05)
+        self.assertFalse(emit.done())
+        self.assertEqual(n._event_log.next_offset, 1)
+
+        # A drain not done in a lease is given up for another lease.
+        await asyncio.sleep(0.3)
+        self.assertFalse(heartbeat({preferred}))
+        await emit
+        self.assertEqual(n._event_log.next_offset, 2)
+        self.assertFalse(heartbeat({preferred}))
+        await n.emit('test_event', a=3)
+
+        await asyncio.sleep(0.3)
+        self.assertFalse(heartbeat({preferred}))
+        emit = loop.create_task(n.emit('test_event', a=4))
+        await asyncio.sleep(0.05)
+        self.assertFalse(emit.done())
+
+        # Caught up, the master steps down and held writes wait for the next.
+        n._ack_tracker(*preferred).ack(3)
+        self.assertTrue(heartbeat({preferred}))
+        n._set_master(None)
+        await asyncio.sleep(0.05)
+        self.assertFalse(emit.done())
+        self.assertEqual(n._event_log.next_offset, 3)
+        emit.cancel()
+        await n.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
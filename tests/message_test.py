@@ -1,7 +1,9 @@
 
 import os
+import pickle
 import unittest
-from eventer.messages import Message, MType, decode_message
+from collections import OrderedDict
+from eventer.messages import Args, Event, Message, MType, decode_message
 
 
 class TestEventLog(unittest.TestCase):
@@ -14,3 +16,32 @@ class TestEventLog(unittest.TestCase):
         self.assertEqual(m.node_id, m2.node_id)
         self.assertEqual(m.m_type, m2.m_type)
         self.assertEqual(m.data, m2.data)
+
+    def test_large_payload(self):
+        m = Message('node_1', MType.EVENT, b'x' * 100_000)
+        m2 = decode_message(data=m.encode())
+
+        self.assertEqual(m.data, m2.data)
+
+    def test_compact_event(self):
+        e1 = Event(''.join(['te', 'st']), OrderedDict(a=1, b='2'))
+        e2 = Event(''.join(['te', 'st']), {'a': 3, 'b': '4'})
+
+        self.assertFalse(hasattr(e1, '__dict__'))
+        self.assertIs(e1.name, e2.name)
+        self.assertIs(e1.args.keys(), e2.args.keys())
+        self.assertEqual(e1.args, {'a': 1, 'b': '2'})
+        self.assertEqual(dict(**e2.args), {'a': 3, 'b': '4'})
+        self.assertEqual(list(e1.args.items()), [('a', 1,), ('b', '2',)])
+        with self.assertRaises(KeyError):
+            e1.args['c']
+
+        self.assertEqual(pickle.loads(pickle.dumps(e1)), e1)
+
+        # Events pickled before they had slots.
+        state = {'timestamp': 1.0, 'name': 'test', 'args': OrderedDict(a=1),
+                 'origin': '', 'counter': 0, 'seq': 3}
+        e3 = Event.__new__(Event)
+        e3.__setstate__(state)
+        self.assertEqual(e3.args, Args(('a',), (1,)))
+        self.assertEqual(e3.seq, 3)
@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+from eventer.metrics import Metrics, Histogram, serve_metrics
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+
+    def test_registry(self):
+        metrics = Metrics()
+        metrics.counter('messages_total', type='PING').inc()
+        metrics.counter('messages_total', type='PING').inc(2)
+        metrics.gauge('lag').set(5)
+
+        self.assertIs(metrics.counter('messages_total', type='PING'),
+                      metrics.counter('messages_total', type='PING'))
+        self.assertEqual(metrics.counter('messages_total', type='PING').value, 3)
+        self.assertEqual(metrics.counter('messages_total', type='ACK').value, 0)
+
+        text = metrics.render()
+        self.assertIn('messages_total{type="PING"} 3\n', text)
+        self.assertIn('lag 5\n', text)
+
+    def test_histogram(self):
+        histogram = Histogram(bounds=(1.0, 2.0, 4.0,))
+        for value in (0.5, 0.5, 1.5, 3.0, 10.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.buckets, [2, 1, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.quantile(0.4), 1.0)
+        self.assertEqual(histogram.quantile(0.5), 2.0)
+        self.assertEqual(histogram.quantile(0.99), float('inf'))
+
+        metrics = Metrics()
+        metrics.histogram('append_seconds').observe(0.003)
+        text = metrics.render()
+        self.assertIn('append_seconds_bucket{le="0.0025"} 0\n', text)
+        self.assertIn('append_seconds_bucket{le="0.005"} 1\n', text)
+        self.assertIn('append_seconds_bucket{le="+Inf"} 1\n', text)
+        self.assertIn('append_seconds_count 1\n', text)
+
+    async def test_serve(self):
+        metrics = Metrics()
+        metrics.counter('emits_total').inc(7)
+        server = await serve_metrics(metrics, '127.0.0.1', 9890)
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', 9890)
+            writer.write(b'GET /metrics HTTP/1.0\r\n\r\n')
+            response = await asyncio.wait_for(reader.read(), 1)
+            writer.close()
+
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        self.assertTrue(response.startswith(b'HTTP/1.0 200 OK\r\n'))
+        self.assertTrue(response.endswith(b'\r\n\r\nemits_total 7\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import shutil
+import asyncio
+import unittest
+from eventer.connection import ConnectionPool
+from eventer.eventer import DeliveryError
+from eventer.messages import MType, NackReason, Event, Message, decode_message
+from eventer.partitions import PartitionedEventer
+
+PARTITIONS_TEST_DB_N1 = 'partitions_test_db_n1'
+PARTITIONS_TEST_DB_N2 = 'partitions_test_db_n2'
+
+
+class TestPartitions(unittest.IsolatedAsyncioTestCase):
+
+    def tearDown(self) -> None:
+        shutil.rmtree(PARTITIONS_TEST_DB_N1, ignore_errors=True)
+        shutil.rmtree(PARTITIONS_TEST_DB_N2, ignore_errors=True)
+
+    async def test_spread_masters(self):
+        loop = asyncio.get_running_loop()
+        n1 = PartitionedEventer(
+            log_workdir=PARTITIONS_TEST_DB_N1, host='localhost', port=9150,
+            nodes=[('localhost', 9160,),], partitions=2,
+            keys={'orders.created': 'order', 'orders.paid': 'order'},
+            loop=loop, lease_timeout=0.3)
+        n2 = PartitionedEventer(
+            log_workdir=PARTITIONS_TEST_DB_N2, host='localhost', port=9160,
+            nodes=[('localhost', 9150,),], partitions=2,
+            keys={'orders.created': 'order', 'orders.paid': 'order'},
+            loop=loop, lease_timeout=0.3)
+
+        # Each node leads the partitions it is preferred for.
+        await n1.serve()
+        await n2.serve()
+        await asyncio.sleep(2)
+        for node in (n1, n2,):
+            self.assertEqual(node.partition(0).master, ('localhost', 9150,))
+            self.assertEqual(node.partition(1).master, ('localhost', 9161,))
+
+        received = []
+
+        async def callback(order: int, step: int):
+            received.append((order, step,))
+
+        n2.on('orders.*', callback)
+        orders = range(6)
+        for order in orders:
+            await n1.emit('orders.created', order=order, step=0)
+        for order in orders:
+            await n2.emit('orders.paid', order=order, step=1)
+        await asyncio.sleep(0.5)
+
+        self.assertEqual({n1.partition_of('orders.paid', {'order': order})
+                          for order in orders}, {0, 1})
+        self.assertEqual(sorted(received), [
+            (order, step,) for order in orders for step in (0, 1,)])
+        for order in orders:
+            steps = [step for o, step in received if o == order]
+            self.assertEqual(steps, [0, 1])
+
+        await n1.close()
+        await n2.close()
+
+
+    async def test_ingress_replies(self):
+        loop = asyncio.get_running_loop()
+        # Partition 1 runs nowhere, its events are not taken.
+        n = PartitionedEventer(
+            log_workdir=PARTITIONS_TEST_DB_N1, host='localhost', port=9170,
+            nodes=[], partitions=2, owned=[0], ingress_port=9179,
+            loop=loop, lease_timeout=0.3)
+        await n.serve()
+        names = {n.partition_of(name, {}): name for name in 'abcdefgh'}
+
+        with self.assertRaises(DeliveryError):
+            await n.emit(names[1])
+
+        pool = ConnectionPool(loop=loop)
+
+        async def send(name: str):
+            message = Message('producer', MType.EVENT, Event(name, {}))
+            buffer = await pool.request('localhost', 9179, message, timeout=2)
+            return decode_message(buffer)
+
+        ack = await send(names[0])
+        self.assertEqual(ack.m_type, MType.ACK)
+        self.assertEqual(ack.data.next_offset, 1)
+
+        nack = await send(names[1])
+        self.assertEqual(nack.m_type, MType.NACK)
+        self.assertEqual(nack.data.reason, NackReason.UNDELIVERED)
+
+        pool.close()
+        await n.close()
+
+if __name__ == '__main__':
+    unittest.main()
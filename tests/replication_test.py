@@ -0,0 +1,143 @@
+import os
+import shutil
+import asyncio
+import unittest
+from collections import OrderedDict
+from eventer.framing import read_frame, write_frame
+from eventer.eventer import AckPolicy, DeliveryError, Eventer
+from eventer.messages import Ack, Event, Message, MType, Nack, NackReason, \
+    decode_message
+
+REPLICATION_TEST_DB = 'replication_test_db'
+
+
+class TestReplication(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        os.makedirs(REPLICATION_TEST_DB)
+
+        async def ack(reader, writer):
+            try:
+                while True:
+                    request_id, _ = await read_frame(reader)
+                    ack = Message('localhost:9490', MType.ACK, Ack(next_offset=1))
+                    write_frame(writer, request_id, ack.encode())
+            except asyncio.IncompleteReadError:
+                writer.close()
+
+        async def stall(reader, writer):
+            await reader.read()
+            writer.close()
+
+        async def nack(reader, writer):
+            try:
+                while True:
+                    request_id, _ = await read_frame(reader)
+                    nack = Message('localhost:9493', MType.NACK,
+                                   Nack(reason=int(NackReason.UNDELIVERED)))
+                    write_frame(writer, request_id, nack.encode())
+            except asyncio.IncompleteReadError:
+                writer.close()
+
+        self.dropped = 0
+
+        async def drop_first(reader, writer):
+            # The first batch is lost with its connection.
+            if self.dropped == 0:
+                self.dropped += 1
+                await read_frame(reader)
+                writer.close()
+                return
+            await ack(reader, writer)
+
+        self.ack_server = await asyncio.start_server(ack, 'localhost', 9490)
+        self.stall_server = await asyncio.start_server(
+            stall, 'localhost', 9491)
+        self.nack_server = await asyncio.start_server(nack, 'localhost', 9493)
+        self.drop_server = await asyncio.start_server(
+            drop_first, 'localhost', 9495)
+
+    async def asyncTearDown(self) -> None:
+        for server in (self.ack_server, self.stall_server, self.nack_server,
+                       self.drop_server,):
+            server.close()
+            await server.wait_closed()
+        shutil.rmtree(REPLICATION_TEST_DB)
+
+    def _eventer(self, ack_policy: AckPolicy) -> Eventer:
+        n = Eventer(log_workdir=REPLICATION_TEST_DB,
+                    host='localhost', port=9492,
+                    nodes=[('localhost', 9490,), ('localhost', 9491,),],
+                    loop=asyncio.get_running_loop(), ack_policy=ack_policy)
+        n._delay = 1.0
+        return n
+
+    async def _replicate_time(self, n: Eventer) -> float:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        event = Event('test', OrderedDict(a=1))
+        event.seq = 0
+        await n._replicate([event])
+        return loop.time() - started
+
+    async def test_quorum_skips_stalled_peer(self):
+        n = self._eventer(AckPolicy.QUORUM)
+        self.assertLess(await self._replicate_time(n), 0.5)
+        await n.close()
+
+    async def test_all_waits_for_every_peer(self):
+        n = self._eventer(AckPolicy.ALL)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with self.assertRaises(DeliveryError):
+            await self._replicate_time(n)
+        self.assertGreaterEqual(loop.time() - started, 0.9)
+        await n.close()
+
+    async def test_unconfirmed_forward(self):
+        n = self._eventer(AckPolicy.QUORUM)
+        n._master = ('localhost', 9493,)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with self.assertRaises(DeliveryError):
+            await n.emit('test', a=1)
+        # Answered, not timed out.
+        self.assertLess(loop.time() - started, 0.5)
+
+        n._master = ('localhost', 9491,)
+        n._delay = 0.1
+        with self.assertRaises(DeliveryError):
+            await n.emit('test', a=1)
+        await n.close()
+
+    async def test_failed_send(self):
+        n = self._eventer(AckPolicy.ALL)
+        # Nothing listens on 9494, the send fails without waiting.
+        n._nodes = [('localhost', 9490,), ('localhost', 9494,),]
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with self.assertRaises(DeliveryError):
+            await self._replicate_time(n)
+        self.assertLess(loop.time() - started, 0.5)
+
+        # A lost batch is sent again at once.
+        n._nodes = [('localhost', 9495,),]
+        self.assertLess(await self._replicate_time(n), 0.5)
+        self.assertEqual(self.dropped, 1)
+        await n.close()
+
+    async def test_fire_and_forget(self):
+        n = self._eventer(AckPolicy.NONE)
+        self.assertLess(await self._replicate_time(n), 0.1)
+        await n.close()
+
+    async def test_master_nacks_unconfirmed_forward(self):
+        n = self._eventer(AckPolicy.ALL)
+        n._delay = 0.1
+        n._master = ('localhost', 9492,)
+        n._event_log.start(asyncio.get_running_loop())
+        resp = decode_message(
+            await n._on_event(events=[Event('test', OrderedDict(a=1))]))
+        self.assertEqual(resp.m_type, MType.NACK)
+        self.assertEqual(resp.data.reason, NackReason.UNDELIVERED)
+        await n.close()
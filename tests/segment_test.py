@@ -0,0 +1,60 @@
+import os
+import shutil
+import unittest
+from eventer.framing import encode_record
+from eventer.segment import Segment
+
+SEGMENT_TEST_DB = 'segment_test_db'
+
+
+class TestSegment(unittest.TestCase):
+
+    def setUp(self) -> None:
+        os.makedirs(SEGMENT_TEST_DB)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(SEGMENT_TEST_DB)
+
+    def _write(self, count: int) -> Segment:
+        segment = Segment(SEGMENT_TEST_DB, 10, index_interval=4)
+        for i in range(count):
+            segment.append(encode_record(b'x' * i))
+        segment.sync()
+        return segment
+
+    def test_read(self):
+        segment = self._write(10)
+        self.assertEqual(len(segment._index), 2)
+        for i in range(10):
+            self.assertEqual(segment.read(10 + i), b'x' * i)
+
+        self.assertEqual(list(segment.records(17)), [b'x' * 7, b'x' * 8, b'x' * 9])
+        self.assertEqual(list(segment.records(12, 2)), [b'x' * 2, b'x' * 3])
+        self.assertEqual(list(segment.records(20)), [])
+        segment.close()
+
+    def test_load_validates_tail(self):
+        self._write(10).close()
+        filepath = os.path.join(SEGMENT_TEST_DB, f'{10:020d}.log')
+        os.truncate(filepath, os.path.getsize(filepath) - 1)
+
+        segment = Segment(SEGMENT_TEST_DB, 10, index_interval=4)
+        segment.load()
+        self.assertEqual(segment.next_offset, 19)
+        self.assertEqual(segment.read(18), b'x' * 8)
+
+        segment.append(encode_record(b'y'))
+        segment.sync()
+        self.assertEqual(segment.read(19), b'y')
+        segment.close()
+
+    def test_load_trusted(self):
+        self._write(10).close()
+        segment = Segment(SEGMENT_TEST_DB, 10, index_interval=4)
+        segment.load(count=10)
+        self.assertEqual(segment.read(15), b'x' * 5)
+        segment.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
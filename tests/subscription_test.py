@@ -0,0 +1,73 @@
+import asyncio
+import os
+import shutil
+import unittest
+from eventer.event_log import EventLog
+from eventer.messages import Event
+from eventer.subscription import Subscription
+
+
+class TestSubscription(unittest.IsolatedAsyncioTestCase):
+
+    workdir = './subscription_test_db'
+
+    async def asyncSetUp(self) -> None:
+        os.makedirs(self.workdir, exist_ok=True)
+        self.event_log = EventLog(self.workdir, max_size=10, segment_size=5)
+        self.event_log.start(asyncio.get_running_loop())
+
+    async def asyncTearDown(self) -> None:
+        await self.event_log.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def append(self, name: str, i: int):
+        self.event_log.append(Event(name, {'i': i}))
+
+    async def test_replay_then_live(self):
+        for i in range(3):
+            self.append('orders.created', i)
+        self.append('users.created', 3)
+
+        subscription = Subscription(self.event_log, 'orders.#', 1, buffer_size=2)
+        received = []
+
+        async def consume():
+            async for event in subscription:
+                received.append((event.seq, event.args['i'],))
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        self.assertEqual(received, [(1, 1,), (2, 2,)])
+
+        self.append('orders.paid', 4)
+        await asyncio.sleep(0.01)
+        self.assertEqual(received[-1], (4, 4,))
+        self.assertEqual(subscription.offset, 5)
+
+        await self.event_log.stop()
+        await asyncio.wait_for(task, 1)
+
+    async def test_skips_truncated(self):
+        for i in range(15):
+            self.append('test', i)
+
+        subscription = Subscription(self.event_log, 'test', 0)
+        event = await subscription.__anext__()
+        self.assertEqual(event.seq, 5)
+        self.assertEqual(subscription.skipped, 5)
+        subscription.close()
+
+
+    async def test_close_wakes_consumer(self):
+        subscription = Subscription(self.event_log, 'test', 0)
+
+        async def consume():
+            return [event async for event in subscription]
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        subscription.close()
+        self.assertEqual(await asyncio.wait_for(task, 1), [])
+
+if __name__ == '__main__':
+    unittest.main()
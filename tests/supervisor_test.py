@@ -0,0 +1,94 @@
+import os
+import shutil
+import asyncio
+import unittest
+from collections import OrderedDict
+from eventer.connection import ConnectionPool
+from eventer.messages import Event, EventBatch, Message, MType, encode_event
+from eventer.partitions import PartitionedEventer, partition_dirname
+from eventer.supervisor import Supervisor
+
+SUPERVISOR_TEST_DB = 'supervisor_test_db'
+
+
+def setup(eventer: PartitionedEventer):
+    filepath = os.path.join(SUPERVISOR_TEST_DB, f'received_{os.getpid()}')
+
+    async def callback(i: int):
+        with open(filepath, 'a') as fp:
+            fp.write(f'{i}\n')
+
+    eventer.on('test.*', callback)
+
+
+class TestSupervisor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        os.makedirs(SUPERVISOR_TEST_DB)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(SUPERVISOR_TEST_DB)
+
+    async def _wait_port(self, port: int):
+        for _ in range(100):
+            try:
+                _, writer = await asyncio.open_connection('localhost', port)
+                writer.close()
+                return
+
+            except OSError:
+                await asyncio.sleep(0.1)
+
+        self.fail(f'Port {port} is not served')
+
+    def _received(self) -> dict[str, list[int]]:
+        return {
+            filename: [int(line) for line in open(
+                os.path.join(SUPERVISOR_TEST_DB, filename))]
+            for filename in os.listdir(SUPERVISOR_TEST_DB)
+            if filename.startswith('received_')}
+
+    async def test_route_to_owning_worker(self):
+        supervisor = Supervisor(
+            SUPERVISOR_TEST_DB, 'localhost', 9250, [], partitions=2, workers=2,
+            setup=setup, ingress_port=9249, keys={'test.a': 'i', 'test.b': 'i'})
+        supervisor.start()
+        try:
+            for port in (9249, 9250, 9251,):
+                await self._wait_port(port)
+
+            loop = asyncio.get_running_loop()
+            events = [
+                Event(name='test.a' if i % 2 else 'test.b',
+                      args=OrderedDict(i=i), origin='producer', counter=i + 1)
+                for i in range(10)]
+            message = Message(node_id='producer', m_type=MType.EVENT_BATCH,
+                              data=EventBatch(records=[
+                                  encode_event(e) for e in events]))
+            pool = ConnectionPool(loop=loop)
+            await pool.request('localhost', 9249, message, timeout=5)
+            # A retried batch is de-duplicated by its partition.
+            await pool.request('localhost', 9249, message, timeout=5)
+            pool.close()
+            await asyncio.sleep(0.5)
+
+        finally:
+            supervisor.stop()
+
+        received = self._received()
+        self.assertEqual(len(received), 2, 'Both workers handle events')
+        self.assertEqual(
+            sorted(i for values in received.values() for i in values),
+            list(range(10)))
+        for values in received.values():
+            for parity in (0, 1,):
+                ordered = [i for i in values if i % 2 == parity]
+                self.assertEqual(ordered, sorted(ordered))
+
+        for p in range(2):
+            self.assertTrue(os.path.isdir(
+                os.path.join(SUPERVISOR_TEST_DB, partition_dirname(p))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import unittest
+import shutil
+import asyncio
+from eventer.event_log import EventLog
+from eventer.eventer import Eventer
+from eventer.messages import Event, Heartbeat
+
+SYNC_TEST_DB_N1 = 'sync_test_db_n1'
+SYNC_TEST_DB_N2 = 'sync_test_db_n2'
+
+
+class TestSync(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        os.makedirs(SYNC_TEST_DB_N1)
+        os.makedirs(SYNC_TEST_DB_N2)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(SYNC_TEST_DB_N1)
+        shutil.rmtree(SYNC_TEST_DB_N2)
+        return super().tearDown()
+
+    def _follower(self) -> Eventer:
+        return Eventer(log_workdir=SYNC_TEST_DB_N2,
+                       host='localhost', port=9691,
+                       nodes=[('localhost', 9690,),],
+                       loop=asyncio.get_running_loop(), sync_chunk_size=2)
+
+    async def test_incremental_sync(self):
+        n1 = Eventer(log_workdir=SYNC_TEST_DB_N1,
+                     host='localhost', port=9690, nodes=[],
+                     loop=asyncio.get_running_loop())
+        await n1.serve()
+
+        requests = []
+        on_sync = n1._on_sync
+
+        async def _on_sync(request):
+            requests.append(request.offset)
+            return await on_sync(request)
+
+        n1._on_sync = _on_sync
+
+        for i in range(3):
+            await n1.emit('test_event', i=i)
+
+        n2 = self._follower()
+        await n2.serve()
+        await n2.close()
+        self.assertEqual([e.args['i'] for e in n2._event_log.log], [0, 1, 2])
+        self.assertEqual(requests, [0, 2])
+
+        for i in range(3, 5):
+            await n1.emit('test_event', i=i)
+
+        requests.clear()
+        n2 = self._follower()
+        await n2.serve()
+        await n2.close()
+        await n1.close()
+
+        self.assertEqual(requests, [3], 'Sync is not incremental')
+        self.assertEqual([e.args['i'] for e in n2._event_log.log],
+                         [0, 1, 2, 3, 4])
+        self.assertEqual(n2._event_log.next_offset, n1._event_log.next_offset)
+
+    async def test_bootstrap_from_compacted(self):
+        loop = asyncio.get_running_loop()
+        n1 = Eventer(log_workdir=SYNC_TEST_DB_N1,
+                     host='localhost', port=9690, nodes=[], loop=loop,
+                     log_size=2, compaction_keys={'set': 'k'})
+        await n1.serve()
+        for i, k in enumerate('abacb'):
+            await n1.emit('set', k=k, v=i)
+
+        n2 = Eventer(log_workdir=SYNC_TEST_DB_N2,
+                     host='localhost', port=9691, nodes=[('localhost', 9690,),],
+                     loop=loop, log_size=2, compaction_keys={'set': 'k'})
+        await n2.serve()
+        await n2.close()
+        await n1.close()
+
+        self.assertEqual([e.args['v'] for e in n2._event_log.log], [3, 4])
+        self.assertEqual([e.args['v'] for e in n2._event_log.compacted()], [2, 3, 4])
+
+    async def test_resync_runs_callbacks(self):
+        loop = asyncio.get_running_loop()
+        n1 = Eventer(log_workdir=SYNC_TEST_DB_N1,
+                     host='localhost', port=9690, nodes=[], loop=loop)
+        await n1.serve()
+        await n1.emit('test_event', i=0)
+
+        n2 = self._follower()
+        await n2.serve()
+        received = []
+        done = loop.create_future()
+
+        async def callback(i: int):
+            received.append(i)
+            if i == 2:
+                done.set_result(None)
+
+        n2.on('test_event', callback)
+
+        # n1 has no peers, n2 learns of the gap from a heartbeat only.
+        for i in range(1, 3):
+            await n1.emit('test_event', i=i)
+        await n2._on_heartbeat(Heartbeat(
+            term=n1._term, host='localhost', port=9690,
+            next_offset=n1._event_log.next_offset))
+
+        await asyncio.wait_for(done, 1)
+        await n2.close()
+        await n1.close()
+        self.assertEqual(received, [1, 2])
+
+    async def test_divergent_log(self):
+        def write(workdir: str, terms: list[tuple[int, list[str]]]):
+            el = EventLog(workdir)
+            for term, names in terms:
+                el.append_encoded([Event(name, {}) for name in names], term=term)
+            el.close()
+
+        # n2 was master in term 2 and took events nobody else has, n1 was
+        # elected in term 3 without them.
+        write(SYNC_TEST_DB_N1, [(1, ['a', 'b'],), (3, ['c', 'd', 'e'],)])
+        write(SYNC_TEST_DB_N2, [(1, ['a', 'b'],), (2, ['x', 'y'],)])
+
+        loop = asyncio.get_running_loop()
+        n1 = Eventer(log_workdir=SYNC_TEST_DB_N1,
+                     host='localhost', port=9690, nodes=[], loop=loop)
+        await n1.serve()
+        n2 = self._follower()
+        await n2.serve()
+        await n2.close()
+        await n1.close()
+
+        self.assertEqual([e.name for e in n2._event_log.log], ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(n2._event_log.epochs(), [(1, 0,), (3, 2,)])
@@ -0,0 +1,45 @@
+import unittest
+from eventer.topics import TopicTrie
+
+
+class TestTopicTrie(unittest.TestCase):
+
+    def test_match(self):
+        trie = TopicTrie()
+        trie.add('orders.created', 1, 'exact')
+        trie.add('orders.*.created', 2, 'star')
+        trie.add('orders.#', 3, 'hash')
+        trie.add('#.created', 4, 'suffix')
+
+        self.assertEqual(trie.match('orders.created'), ('exact', 'hash', 'suffix',))
+        self.assertEqual(trie.match('orders.eu.created'), ('star', 'hash', 'suffix',))
+        self.assertEqual(trie.match('orders'), ('hash',))
+        self.assertEqual(trie.match('orders.eu.de.created'), ('hash', 'suffix',))
+        self.assertEqual(trie.match('users.created'), ('suffix',))
+        self.assertEqual(trie.match('users'), ())
+
+    def test_remove(self):
+        trie = TopicTrie()
+        trie.add('a.*', 1, 'one')
+        trie.add('a.*', 2, 'two')
+        self.assertEqual(trie.match('a.b'), ('one', 'two',))
+
+        self.assertEqual(trie.remove('a.*', 1), 'one')
+        self.assertEqual(trie.match('a.b'), ('two',))
+        self.assertIsNone(trie.remove('a.*', 1))
+        self.assertIsNone(trie.remove('a.b.c', 2))
+
+        trie.remove('a.*', 2)
+        self.assertEqual(trie.match('a.b'), ())
+        self.assertEqual(len(trie), 0)
+        self.assertEqual(trie._root.children, {})
+
+    def test_iter(self):
+        trie = TopicTrie()
+        trie.add('a', 1, 'one')
+        trie.add('a.#', 2, 'two')
+        self.assertEqual(sorted(trie), ['one', 'two'])
+
+
+if __name__ == '__main__':
+    unittest.main()